@@ -9,15 +9,40 @@ import os
 import json
 import uuid
 import sqlite3
+from collections import Counter
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Any
+from typing import TYPE_CHECKING, Dict, List, Optional, Any
 from fastapi import HTTPException, WebSocket, WebSocketDisconnect
 from pydantic import BaseModel
 import logging
-from emergentintegrations.llm.chat import LlmChat, UserMessage
+from db_pool import get_db_pool
+from keyword_router import KeywordRouter
+from migrations import run_migrations
+
+if TYPE_CHECKING:
+    # Import lourd, chargé à la première session (voir _new_llm_chat)
+    from emergentintegrations.llm.chat import LlmChat
 
 logger = logging.getLogger('siports_ai_chatbot')
 
+# Intentions dans l'ordre de priorité : la première touchée l'emporte
+INTENT_KEYWORDS = {
+    "info_packages": ["forfait", "package", "prix", "tarif", "coût"],
+    "info_event": ["salon", "événement", "programme", "horaires", "lieu"],
+    "networking": ["rdv", "rendez-vous", "rencontre", "contact", "réseau"],
+    "technical_help": ["problème", "bug", "aide", "support", "erreur"],
+    "matching": ["partenaire", "match", "recherche", "recommandation"],
+    "navigation": ["comment", "où", "naviguer", "utiliser", "fonctionner"],
+    "greeting": ["bonjour", "salut", "hello", "bonsoir", "coucou"],
+    "goodbye": ["au revoir", "bye", "salut", "à bientôt"]
+}
+SENTIMENT_KEYWORDS = {
+    "positive": ['merci', 'excellent', 'parfait', 'super', 'génial', 'bravo', 'formidable'],
+    "negative": ['problème', 'erreur', 'bug', 'cassé', 'mauvais', 'nul', 'horrible']
+}
+# Un seul parcours du message pour l'intention et le sentiment
+MESSAGE_ROUTER = KeywordRouter({**INTENT_KEYWORDS, **SENTIMENT_KEYWORDS})
+
 class ChatMessage(BaseModel):
     id: str
     session_id: str
@@ -42,12 +67,19 @@ class ChatSession(BaseModel):
     status: str = "active"  # active, paused, ended
 
 class MaritimeChatBot:
-    """Chatbot IA spécialisé maritime avec Claude"""
+    """Chatbot IA spécialisé maritime avec Claude
+
+    Non branché sur les serveurs (le chatbot servi est chatbot_service) :
+    ses tables chat_sessions / chat_messages / chat_intents / chat_feedback
+    restent dans son propre fichier SQLite, hors de la couche repositories,
+    quel que soit DATABASE_URL.
+    """
     
     def __init__(self, claude_api_key: str):
         self.claude_api_key = claude_api_key
         self.db_path = "/app/instance/siports_production.db"
-        self.active_sessions: Dict[str, LlmChat] = {}
+        self.db = get_db_pool(self.db_path)
+        self.active_sessions: Dict[str, "LlmChat"] = {}
         
         # Système prompt spécialisé maritime
         self.maritime_system_prompt = """
@@ -162,35 +194,35 @@ Si une question n'est pas liée au maritime, redirige poliment vers le contexte
         """)
         
         conn.commit()
+        
+        # Index d'historique et autres migrations versionnées
+        run_migrations(conn, 'chatbot')
         conn.close()
         logger.info("✅ Base de données chatbot initialisée")
     
-    def create_session(self, user_id: Optional[int] = None, language: str = "fr") -> str:
-        """Créer une nouvelle session de chat"""
-        session_id = str(uuid.uuid4())
-        
-        # Créer l'instance LlmChat avec Claude
-        llm_chat = LlmChat(
+    def _new_llm_chat(self, session_id: str) -> "LlmChat":
+        """Créer l'instance LlmChat avec Claude (import différé du SDK)"""
+        from emergentintegrations.llm.chat import LlmChat
+        return LlmChat(
             api_key=self.claude_api_key,
             session_id=session_id,
             system_message=self.maritime_system_prompt
         ).with_model("anthropic", "claude-sonnet-4-20250514").with_max_tokens(4096)
+    
+    def create_session(self, user_id: Optional[int] = None, language: str = "fr") -> str:
+        """Créer une nouvelle session de chat"""
+        session_id = str(uuid.uuid4())
         
-        self.active_sessions[session_id] = llm_chat
-        
-        # Sauvegarder en base
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        self.active_sessions[session_id] = self._new_llm_chat(session_id)
         
-        cursor.execute("""
+        # Sauvegarder en base (écriture asynchrone via le writer, ordonnée avant les messages)
+        future = self.db.writer.submit(lambda conn: conn.execute("""
             INSERT INTO chat_sessions (id, user_id, language, context)
             VALUES (?, ?, ?, ?)
-        """, (session_id, user_id, language, json.dumps({})))
-        
-        conn.commit()
-        conn.close()
+        """, (session_id, user_id, language, json.dumps({}))))
+        future.add_done_callback(self._log_write_error)
         
-        logger.info(f"💬 Nouvelle session chat créée: {session_id}")
+        logger.info("💬 Nouvelle session chat créée: %s", session_id)
         return session_id
     
     async def send_message(self, session_id: str, message: str, user_id: Optional[int] = None, 
@@ -200,11 +232,7 @@ Si une question n'est pas liée au maritime, redirige poliment vers le contexte
             # Récupérer l'instance LlmChat
             if session_id not in self.active_sessions:
                 # Recréer la session si elle n'existe pas
-                self.active_sessions[session_id] = LlmChat(
-                    api_key=self.claude_api_key,
-                    session_id=session_id,
-                    system_message=self.maritime_system_prompt
-                ).with_model("anthropic", "claude-sonnet-4-20250514").with_max_tokens(4096)
+                self.active_sessions[session_id] = self._new_llm_chat(session_id)
             
             llm_chat = self.active_sessions[session_id]
             
@@ -212,12 +240,14 @@ Si une question n'est pas liée au maritime, redirige poliment vers le contexte
             enriched_message = await self.enrich_message_with_context(message, user_id, session_id)
             
             # Envoyer le message à Claude
+            from emergentintegrations.llm.chat import UserMessage
             user_message = UserMessage(text=enriched_message)
             response = await llm_chat.send_message(user_message)
             
-            # Analyser le sentiment et l'intent
-            sentiment_score = await self.analyze_sentiment(message)
-            intent = await self.detect_intent(message)
+            # Analyser le sentiment et l'intent (un seul parcours du message)
+            hits = MESSAGE_ROUTER.scan(message.lower())
+            sentiment_score = await self.analyze_sentiment(message, hits)
+            intent = await self.detect_intent(message, hits)
             
             # Sauvegarder le message et la réponse
             message_id = str(uuid.uuid4())
@@ -241,7 +271,7 @@ Si une question n'est pas liée au maritime, redirige poliment vers le contexte
             }
             
         except Exception as e:
-            logger.error(f"❌ Erreur chatbot: {e}")
+            logger.error("❌ Erreur chatbot: %s", e)
             return {
                 "error": "Désolé, je rencontre un problème technique. Veuillez réessayer.",
                 "session_id": session_id,
@@ -265,22 +295,20 @@ Si une question n'est pas liée au maritime, redirige poliment vers le contexte
         
         return "\n".join(context_parts)
     
+    def _log_write_error(self, future):
+        """Journaliser l'échec d'une écriture lancée sans attente"""
+        if not future.cancelled() and future.exception() is not None:
+            logger.error("Erreur écriture chatbot: %s", future.exception())
+    
     async def get_user_context(self, user_id: int) -> str:
         """Récupérer le contexte utilisateur pour personnaliser les réponses"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            conn.row_factory = sqlite3.Row
-            cursor = conn.cursor()
-            
-            cursor.execute("""
+            user = await self.db.fetchone("""
                 SELECT user_type, visitor_package, partnership_package, company, 
                        first_name, last_name, profile_completion
                 FROM users WHERE id = ?
             """, (user_id,))
             
-            user = cursor.fetchone()
-            conn.close()
-            
             if not user:
                 return ""
             
@@ -302,16 +330,13 @@ Si une question n'est pas liée au maritime, redirige poliment vers le contexte
             return " | ".join(context_info)
             
         except Exception as e:
-            logger.error(f"Erreur contexte utilisateur: {e}")
+            logger.error("Erreur contexte utilisateur: %s", e)
             return ""
     
     async def get_session_context(self, session_id: str, limit: int = 3) -> str:
         """Récupérer l'historique récent de la session"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            cursor.execute("""
+            messages = await self.db.fetchall("""
                 SELECT message, response
                 FROM chat_messages 
                 WHERE session_id = ?
@@ -319,65 +344,42 @@ Si une question n'est pas liée au maritime, redirige poliment vers le contexte
                 LIMIT ?
             """, (session_id, limit))
             
-            messages = cursor.fetchall()
-            conn.close()
-            
             if not messages:
                 return ""
             
             history = []
             for msg in reversed(messages):  # Remettre dans l'ordre chronologique
-                history.append(f"User: {msg[0][:100]}...")
-                history.append(f"AI: {msg[1][:100]}...")
+                history.append(f"User: {msg['message'][:100]}...")
+                history.append(f"AI: {msg['response'][:100]}...")
             
             return " | ".join(history[-4:])  # Derniers 2 échanges
             
         except Exception as e:
-            logger.error(f"Erreur historique session: {e}")
+            logger.error("Erreur historique session: %s", e)
             return ""
     
-    async def analyze_sentiment(self, message: str) -> float:
+    async def analyze_sentiment(self, message: str, hits: Optional[Counter] = None) -> float:
         """Analyser le sentiment du message (simple heuristique)"""
-        positive_words = ['merci', 'excellent', 'parfait', 'super', 'génial', 'bravo', 'formidable']
-        negative_words = ['problème', 'erreur', 'bug', 'cassé', 'mauvais', 'nul', 'horrible']
-        neutral_words = ['question', 'comment', 'pourquoi', 'quand', 'où', 'info']
-        
-        message_lower = message.lower()
+        if hits is None:
+            hits = MESSAGE_ROUTER.scan(message.lower())
         
-        score = 0.0
+        # +1 par mot positif présent, -1 par mot négatif
+        score = float(hits["positive"] - hits["negative"])
         word_count = len(message.split())
         
-        for word in positive_words:
-            if word in message_lower:
-                score += 1.0
-        
-        for word in negative_words:
-            if word in message_lower:
-                score -= 1.0
-        
         # Normaliser entre -1 et 1
         if word_count > 0:
             score = max(-1.0, min(1.0, score / word_count * 10))
         
         return score
     
-    async def detect_intent(self, message: str) -> Optional[str]:
+    async def detect_intent(self, message: str, hits: Optional[Counter] = None) -> Optional[str]:
         """Détecter l'intention du message"""
-        message_lower = message.lower()
-        
-        intent_patterns = {
-            "info_packages": ["forfait", "package", "prix", "tarif", "coût"],
-            "info_event": ["salon", "événement", "programme", "horaires", "lieu"],
-            "networking": ["rdv", "rendez-vous", "rencontre", "contact", "réseau"],
-            "technical_help": ["problème", "bug", "aide", "support", "erreur"],
-            "matching": ["partenaire", "match", "recherche", "recommandation"],
-            "navigation": ["comment", "où", "naviguer", "utiliser", "fonctionner"],
-            "greeting": ["bonjour", "salut", "hello", "bonsoir", "coucou"],
-            "goodbye": ["au revoir", "bye", "salut", "à bientôt"]
-        }
+        if hits is None:
+            hits = MESSAGE_ROUTER.scan(message.lower())
         
-        for intent, keywords in intent_patterns.items():
-            if any(keyword in message_lower for keyword in keywords):
+        for intent in INTENT_KEYWORDS:
+            if hits[intent]:
                 return intent
         
         return "general_inquiry"
@@ -439,11 +441,8 @@ Si une question n'est pas liée au maritime, redirige poliment vers le contexte
                           message: str, response: str, message_type: str, language: str,
                           sentiment_score: float, intent: Optional[str]):
         """Sauvegarder le message et la réponse en base"""
-        try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            cursor.execute("""
+        def _save(conn):
+            conn.execute("""
                 INSERT INTO chat_messages 
                 (id, session_id, user_id, message, response, message_type, 
                  language, sentiment_score, intent)
@@ -453,35 +452,29 @@ Si une question n'est pas liée au maritime, redirige poliment vers le contexte
             
             # Sauvegarder l'intent avec confiance
             if intent:
-                cursor.execute("""
+                conn.execute("""
                     INSERT INTO chat_intents (session_id, intent, confidence, context)
                     VALUES (?, ?, ?, ?)
                 """, (session_id, intent, 0.8, json.dumps({"message_length": len(message)})))
-            
-            conn.commit()
-            conn.close()
+        
+        try:
+            await self.db.write(_save)
             
         except Exception as e:
-            logger.error(f"Erreur sauvegarde message: {e}")
+            logger.error("Erreur sauvegarde message: %s", e)
     
     async def update_session_activity(self, session_id: str):
         """Mettre à jour l'activité de la session"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            cursor.execute("""
+            await self.db.execute("""
                 UPDATE chat_sessions 
                 SET last_activity = CURRENT_TIMESTAMP,
                     message_count = message_count + 1
                 WHERE id = ?
             """, (session_id,))
             
-            conn.commit()
-            conn.close()
-            
         except Exception as e:
-            logger.error(f"Erreur mise à jour session: {e}")
+            logger.error("Erreur mise à jour session: %s", e)
     
     def get_session_stats(self, session_id: str) -> Dict[str, Any]:
         """Récupérer les statistiques d'une session"""
@@ -522,7 +515,7 @@ Si une question n'est pas liée au maritime, redirige poliment vers le contexte
             }
             
         except Exception as e:
-            logger.error(f"Erreur stats session: {e}")
+            logger.error("Erreur stats session: %s", e)
             return {}
     
     def end_session(self, session_id: str):
@@ -533,22 +526,17 @@ Si une question n'est pas liée au maritime, redirige poliment vers le contexte
                 del self.active_sessions[session_id]
             
             # Marquer comme terminée en base
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            cursor.execute("""
+            future = self.db.writer.submit(lambda conn: conn.execute("""
                 UPDATE chat_sessions 
                 SET status = 'ended', last_activity = CURRENT_TIMESTAMP
                 WHERE id = ?
-            """, (session_id,))
-            
-            conn.commit()
-            conn.close()
+            """, (session_id,)))
+            future.add_done_callback(self._log_write_error)
             
-            logger.info(f"🔚 Session terminée: {session_id}")
+            logger.info("🔚 Session terminée: %s", session_id)
             
         except Exception as e:
-            logger.error(f"Erreur fin session: {e}")
+            logger.error("Erreur fin session: %s", e)
 
 # Instance globale du chatbot (à initialiser avec la clé API)
 maritime_chatbot: Optional[MaritimeChatBot] = None
@@ -0,0 +1,363 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+SIPORTS v2.0 - API load test and benchmark suite
+Charge l'API en concurrence (application ASGI en processus via httpx, ou
+uvicorn lancé localement) sur une base temporaire, avec WordPress remplacé
+par un stand-in SQLite local. Mesure débit et latences p50/p95/p99 par
+scénario (plus le TTFB des réponses en flux, significatif en mode uvicorn),
+écrit un JSON de résultats et échoue si un scénario régresse
+au-delà de la tolérance par rapport à la baseline.
+
+Usage:
+    python benchmarks/bench_api.py [--mode inprocess|uvicorn] [--concurrency 16]
+        [--requests 400] [--scenarios login,chat,...] [--wordpress]
+        [--baseline benchmarks/baseline.json] [--save-baseline] [--tolerance 0.25]
+"""
+
+import argparse
+import asyncio
+import importlib
+import json
+import logging
+import os
+import platform
+import secrets
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCH_DIR = os.path.join(BACKEND_DIR, 'benchmarks')
+sys.path.insert(0, BACKEND_DIR)
+
+import httpx  # noqa: E402
+
+DEFAULT_BASELINE = os.path.join(BENCH_DIR, 'baseline.json')
+ADMIN = {'email': 'admin@siportevent.com', 'password': 'admin123'}
+BENCH_PASSWORD = 'bench-password'
+
+
+class Scenario:
+    """One request shape; heavy scenarios (password hashing) run fewer requests"""
+
+    def __init__(self, name: str, call: Callable[[httpx.AsyncClient, int, Dict[str, Any]], Awaitable[httpx.Response]],
+                 weight: float = 1.0, wordpress: bool = False, expected: int = 200, stream: bool = False):
+        self.name = name
+        self.call = call
+        self.weight = weight
+        self.wordpress = wordpress
+        self.expected = expected
+        # call renvoie un httpx.Request envoyé en flux : le TTFB est mesuré en plus
+        self.stream = stream
+
+
+def _auth(ctx) -> Dict[str, str]:
+    return {'Authorization': f"Bearer {ctx['admin_token']}"}
+
+
+SCENARIOS = [
+    Scenario('login', lambda c, i, ctx: c.post('/api/auth/login', json={
+        'email': ctx['users'][i % len(ctx['users'])], 'password': BENCH_PASSWORD}), weight=0.25),
+    Scenario('register', lambda c, i, ctx: c.post('/api/auth/register', json={
+        'email': f"bench-{ctx['run']}-{i}@example.com", 'password': BENCH_PASSWORD,
+        'first_name': 'Bench', 'last_name': f'User{i}', 'company': 'SIPORTS'}), weight=0.25),
+    Scenario('visitor_packages', lambda c, i, ctx: c.get('/api/visitor-packages')),
+    Scenario('partnership_packages', lambda c, i, ctx: c.get('/api/partnership-packages')),
+    Scenario('chat', lambda c, i, ctx: c.post('/api/chat', json={
+        'message': ('Quels sont les prix des forfaits ?', 'Quels exposants pour la logistique portuaire ?',
+                    'Programme des conférences demain')[i % 3],
+        'session_id': f'bench-{i % 50}'})),
+    Scenario('chat_stream', lambda c, i, ctx: c.build_request('POST', '/api/chat/stream', json={
+        'message': 'Quels sont les prix des forfaits ?', 'context_type': 'package',
+        'session_id': f'bench-stream-{i % 50}'}), stream=True),
+    Scenario('admin_stats', lambda c, i, ctx: c.get('/api/admin/dashboard/stats', headers=_auth(ctx))),
+    Scenario('pending_users', lambda c, i, ctx: c.get('/api/admin/users/pending?limit=50', headers=_auth(ctx))),
+    Scenario('wp_login', lambda c, i, ctx: c.post('/api/wordpress/login', json={
+        'username': f'wpuser{i % 50 + 1}', 'password': 'wp-password'}), weight=0.5, wordpress=True),
+    Scenario('wp_events', lambda c, i, ctx: c.get('/api/wordpress/events'), wordpress=True),
+    Scenario('wp_exhibitors', lambda c, i, ctx: c.get('/api/wordpress/exhibitors'), wordpress=True),
+    Scenario('wp_webhook', lambda c, i, ctx: c.post('/api/wordpress/webhook', json={
+        'action': 'user_meta_update', 'user_id': i % 50 + 1,
+        'meta_key': 'siports_visitor_package', 'meta_value': ('Basic', 'Premium', 'VIP')[i % 3]}),
+        wordpress=True),
+]
+SCENARIOS_BY_NAME = {scenario.name: scenario for scenario in SCENARIOS}
+
+
+def percentile(ordered: List[float], p: float) -> float:
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(p * len(ordered)))]
+
+
+async def run_scenario(client: httpx.AsyncClient, scenario: Scenario, requests: int,
+                       concurrency: int, ctx: Dict[str, Any], warmup: int) -> Dict[str, Any]:
+    """Fire `requests` calls with `concurrency` workers; latencies in ms"""
+    ttfb: List[float] = []
+
+    async def issue(i: int) -> httpx.Response:
+        if not scenario.stream:
+            return await scenario.call(client, i, ctx)
+        # Premier octet du corps (en mode inprocess, ASGITransport livre tout d'un bloc)
+        started = time.perf_counter()
+        response = await client.send(scenario.call(client, i, ctx), stream=True)
+        first = None
+        try:
+            async for _ in response.aiter_raw():
+                if first is None:
+                    first = (time.perf_counter() - started) * 1000
+        finally:
+            await response.aclose()
+        if i >= 0 and first is not None:
+            ttfb.append(first)
+        return response
+
+    for i in range(warmup):
+        await issue(-1 - i)
+
+    latencies: List[float] = []
+    errors: Dict[str, int] = {}
+    counter = iter(range(requests))
+
+    async def worker():
+        for i in counter:
+            started = time.perf_counter()
+            try:
+                response = await issue(i)
+                outcome = None if response.status_code == scenario.expected else str(response.status_code)
+            except httpx.HTTPError as e:
+                outcome = type(e).__name__
+            latencies.append((time.perf_counter() - started) * 1000)
+            if outcome:
+                errors[outcome] = errors.get(outcome, 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    result = {
+        "requests": requests,
+        "concurrency": concurrency,
+        "errors": errors,
+        "throughput_rps": round(requests / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 0.50), 2),
+        "p95_ms": round(percentile(latencies, 0.95), 2),
+        "p99_ms": round(percentile(latencies, 0.99), 2),
+        "max_ms": round(latencies[-1], 2) if latencies else 0.0
+    }
+    if ttfb:
+        ttfb.sort()
+        result.update(ttfb_p50_ms=round(percentile(ttfb, 0.50), 2), ttfb_p95_ms=round(percentile(ttfb, 0.95), 2),
+                      ttfb_p99_ms=round(percentile(ttfb, 0.99), 2))
+    return result
+
+
+async def prepare(client: httpx.AsyncClient, ctx: Dict[str, Any], users: int):
+    """Admin token and a set of validated accounts for the login scenario"""
+    response = await client.post('/api/auth/login', json=ADMIN)
+    response.raise_for_status()
+    ctx['admin_token'] = response.json()['access_token']
+    ctx['users'] = []
+    user_ids = []
+    for i in range(users):
+        email = f"bench-login-{ctx['run']}-{i}@example.com"
+        response = await client.post('/api/auth/register', json={
+            'email': email, 'password': BENCH_PASSWORD, 'first_name': 'Bench', 'last_name': 'Login'})
+        response.raise_for_status()
+        ctx['users'].append(email)
+        user_ids.append(response.json()['user_id'])
+    # Comptes en attente : connexion refusée tant qu'ils ne sont pas validés
+    response = await client.post('/api/admin/users/bulk', headers=_auth(ctx),
+                                 json={'action': 'validate', 'user_ids': user_ids})
+    response.raise_for_status()
+
+
+async def run_suite(client: httpx.AsyncClient, scenarios: List[Scenario], args) -> Dict[str, Any]:
+    ctx: Dict[str, Any] = {'run': int(time.time())}
+    await prepare(client, ctx, users=8)
+    results = {}
+    for scenario in scenarios:
+        requests = max(args.concurrency, int(args.requests * scenario.weight))
+        result = await run_scenario(client, scenario, requests, args.concurrency, ctx, args.warmup)
+        results[scenario.name] = result
+        print(f"{scenario.name:<22} {result['throughput_rps']:>9.1f} req/s   p50 {result['p50_ms']:>8.2f} ms   "
+              f"p95 {result['p95_ms']:>8.2f} ms   p99 {result['p99_ms']:>8.2f} ms"
+              + (f"   ttfb p50 {result['ttfb_p50_ms']:.2f} ms p95 {result['ttfb_p95_ms']:.2f} ms"
+                 if 'ttfb_p50_ms' in result else '')
+              + (f"   errors {result['errors']}" if result['errors'] else ''))
+    return results
+
+
+def _prepare_environment(args, workdir: str):
+    os.environ['DATABASE_URL'] = os.path.join(workdir, 'bench.db')
+    os.environ['WORDPRESS_ENABLED'] = 'true' if args.wordpress else 'false'
+    os.environ.setdefault('JWT_SECRET_KEY', secrets.token_hex(32))
+    # Toutes les requêtes viennent de 127.0.0.1 : pas de plafond par IP
+    os.environ.setdefault('LOGIN_IP_BURST', '1000000')
+    # Avant l'import du serveur : son basicConfig(INFO) devient sans effet
+    logging.basicConfig(level=logging.WARNING)
+
+
+async def bench_inprocess(args, scenarios: List[Scenario], workdir: str) -> Dict[str, Any]:
+    _prepare_environment(args, workdir)
+    if args.wordpress:
+        from wordpress_standin import install_wordpress_standin
+        install_wordpress_standin(os.path.join(workdir, 'wordpress.db'), args.wp_latency_ms)
+    server = importlib.import_module(args.server)
+
+    transport = httpx.ASGITransport(app=server.app)
+    async with server.app.router.lifespan_context(server.app):
+        if args.wordpress:
+            while server.wp_sync is None:
+                await asyncio.sleep(0.05)
+        async with httpx.AsyncClient(transport=transport, base_url='http://bench') as client:
+            return await run_suite(client, scenarios, args)
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+async def bench_uvicorn(args, scenarios: List[Scenario], workdir: str) -> Dict[str, Any]:
+    _prepare_environment(args, workdir)
+    port = _free_port()
+    command = [sys.executable, os.path.abspath(__file__), '--serve', '--server', args.server,
+               '--port', str(port), '--wp-latency-ms', str(args.wp_latency_ms)]
+    if args.wordpress:
+        command.append('--wordpress')
+    process = subprocess.Popen(command, cwd=workdir, env=os.environ.copy())
+    base_url = f'http://127.0.0.1:{port}'
+    try:
+        limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+        async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+            deadline = time.monotonic() + 30
+            while True:
+                try:
+                    if (await client.get('/health')).status_code == 200:
+                        break
+                except httpx.TransportError:
+                    pass
+                if time.monotonic() > deadline or process.poll() is not None:
+                    raise RuntimeError("uvicorn did not become ready")
+                await asyncio.sleep(0.1)
+            return await run_suite(client, scenarios, args)
+    finally:
+        process.terminate()
+        process.wait(timeout=10)
+
+
+def serve(args):
+    """Child process of --mode uvicorn: stand-in WordPress + uvicorn on one worker"""
+    import uvicorn
+    logging.basicConfig(level=logging.WARNING)
+    if args.wordpress:
+        from wordpress_standin import install_wordpress_standin
+        install_wordpress_standin(os.path.join(os.getcwd(), 'wordpress.db'), args.wp_latency_ms)
+    server = importlib.import_module(args.server)
+    uvicorn.run(server.app, host='127.0.0.1', port=args.port, log_level='warning', access_log=False)
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """Regressions: p95 above or throughput below baseline by more than tolerance"""
+    regressions = []
+    for name, result in results.items():
+        reference = baseline.get('scenarios', {}).get(name)
+        if reference is None:
+            continue
+        if result['p95_ms'] > reference['p95_ms'] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {result['p95_ms']} ms > baseline {reference['p95_ms']} ms")
+        if result['throughput_rps'] < reference['throughput_rps'] / (1 + tolerance):
+            regressions.append(
+                f"{name}: {result['throughput_rps']} req/s < baseline {reference['throughput_rps']} req/s")
+        if result['errors'] and not reference.get('errors'):
+            regressions.append(f"{name}: errors {result['errors']}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--mode', choices=('inprocess', 'uvicorn'), default='inprocess')
+    parser.add_argument('--server', default='server_production',
+                        help='server module (server_production or server_production_wp)')
+    parser.add_argument('--wordpress', action='store_true',
+                        help='run the WordPress scenarios against the local stand-in (implies server_production_wp)')
+    parser.add_argument('--wp-latency-ms', type=float, default=2.0,
+                        help='simulated MySQL round trip of the WordPress stand-in')
+    parser.add_argument('--scenarios', help='comma-separated subset (default: all applicable)')
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--requests', type=int, default=400, help='requests per scenario (scaled by weight)')
+    parser.add_argument('--warmup', type=int, default=5)
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--save-baseline', action='store_true', help='write the results as the new baseline')
+    parser.add_argument('--output', help='also write the results to this JSON file')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed regression (0.25 = 25%%)')
+    parser.add_argument('--serve', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--port', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.wordpress:
+        args.server = 'server_production_wp'
+    if args.serve:
+        serve(args)
+        return
+
+    names = args.scenarios.split(',') if args.scenarios else [
+        scenario.name for scenario in SCENARIOS if args.wordpress or not scenario.wordpress]
+    unknown = [name for name in names if name not in SCENARIOS_BY_NAME]
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(unknown)}")
+    scenarios = [SCENARIOS_BY_NAME[name] for name in names]
+    if any(scenario.wordpress for scenario in scenarios) and not args.wordpress:
+        parser.error("WordPress scenarios need --wordpress")
+
+    with tempfile.TemporaryDirectory(prefix='siports-bench-') as workdir:
+        runner = bench_inprocess if args.mode == 'inprocess' else bench_uvicorn
+        results = asyncio.run(runner(args, scenarios, workdir))
+
+    report = {
+        "mode": args.mode,
+        "server": args.server,
+        "concurrency": args.concurrency,
+        "python": platform.python_version(),
+        "cpus": os.cpu_count(),
+        "created_at": time.strftime('%Y-%m-%dT%H:%M:%S'),
+        "scenarios": results
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    baseline: Optional[Dict[str, Any]] = None
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Baseline written to {args.baseline}")
+        return
+    if baseline is None:
+        print(f"No baseline at {args.baseline} (run with --save-baseline to create one)")
+        return
+
+    for key in ('mode', 'server', 'concurrency'):
+        if baseline.get(key) != report[key]:
+            print(f"Warning: baseline {key} is {baseline.get(key)!r}, this run used {report[key]!r}")
+    regressions = compare(results, baseline, args.tolerance)
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) beyond {args.tolerance:.0%}:")
+        for line in regressions:
+            print(f"  - {line}")
+        sys.exit(1)
+    print(f"\nNo regression beyond {args.tolerance:.0%} against {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
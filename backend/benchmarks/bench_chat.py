@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+SIPORTS v2.0 - Chatbot generation benchmark
+Lance le faux serveur Ollama (fake_ollama.py) et l'API sous uvicorn, passe
+le chatbot en mode Ollama et envoie des conversations concurrentes à
+/api/chat et /api/chat/stream pendant qu'une sonde appelle /health en boucle.
+Mesure le temps jusqu'au premier octet (TTFB), la durée totale des réponses
+et la latence de la sonde : tant que les générations ne bloquent pas la
+boucle d'événements, /health reste à quelques millisecondes. --blocking
+rejoue l'ancien appel synchrone ollama.chat pour comparaison.
+--same-question envoie la même question partout (rafale après une annonce),
+cache de réponses désactivé : seules la coalescence des requêtes en cours
+et --no-coalescing font varier le nombre de générations.
+
+Usage:
+    python benchmarks/bench_chat.py [--chats 16] [--concurrency 8]
+        [--endpoints chat,stream] [--latency 0.5] [--tokens-per-second 40]
+        [--tokens 40] [--mock] [--blocking] [--same-question [--no-coalescing]]
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import secrets
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, os.path.join(BACKEND_DIR, 'benchmarks'))
+
+import httpx  # noqa: E402
+
+from fake_ollama import FakeOllama, serve_in_thread, stop_server  # noqa: E402
+
+
+def percentile(ordered: List[float], p: float) -> float:
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(p * len(ordered)))]
+
+
+def summary(name: str, values: List[float]) -> str:
+    values = sorted(values)
+    return (f"  {name:<10} {len(values):>6} {percentile(values, 0.50) * 1000:>9.1f} "
+            f"{percentile(values, 0.95) * 1000:>9.1f} {percentile(values, 0.99) * 1000:>9.1f} "
+            f"{(values[-1] if values else 0) * 1000:>9.1f}")
+
+
+ENDPOINTS = {'chat': '/api/chat', 'stream': '/api/chat/stream'}
+
+
+async def run_endpoint(args, url: str, path: str) -> Dict[str, List[float]]:
+    """Concurrent conversations on one endpoint while a probe polls /health"""
+    latencies: Dict[str, List[float]] = {'ttfb': [], 'total': [], 'health': []}
+    limits = httpx.Limits(max_connections=args.concurrency + 1)
+    async with httpx.AsyncClient(base_url=url, timeout=120, limits=limits) as http:
+        counter = iter(range(args.chats))
+
+        async def chatter():
+            for i in counter:
+                started = time.perf_counter()
+                first = None
+                message = 'Où est le salon ?' if args.same_question else f'Question {i} sur le salon'
+                async with http.stream('POST', path, json={'message': message}) as response:
+                    response.raise_for_status()
+                    async for _ in response.aiter_raw():
+                        if first is None:
+                            first = time.perf_counter() - started
+                latencies['ttfb'].append(first)
+                latencies['total'].append(time.perf_counter() - started)
+
+        async def probe(done: asyncio.Event):
+            # Latence mesurée depuis l'instant prévu : une boucle bloquée retarde aussi le départ
+            while not done.is_set():
+                due = time.perf_counter() + args.probe_interval
+                await asyncio.sleep(args.probe_interval)
+                (await http.get('/health')).raise_for_status()
+                latencies['health'].append(time.perf_counter() - due)
+
+        done = asyncio.Event()
+        prober = asyncio.ensure_future(probe(done))
+        await asyncio.gather(*(chatter() for _ in range(args.concurrency)))
+        done.set()
+        await prober
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--chats', type=int, default=16)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--ollama-concurrency', type=int, default=4, help='OLLAMA_MAX_CONCURRENCY')
+    parser.add_argument('--latency', type=float, default=0.5, help='fake Ollama time to first token (s)')
+    parser.add_argument('--tokens-per-second', type=float, default=40.0)
+    parser.add_argument('--tokens', type=int, default=40)
+    parser.add_argument('--probe-interval', type=float, default=0.02)
+    parser.add_argument('--endpoints', default='chat,stream', help='comma-separated: chat, stream')
+    parser.add_argument('--mock', action='store_true', help='mock mode instead of the fake Ollama server')
+    parser.add_argument('--blocking', action='store_true', help='replay the old synchronous ollama.chat call')
+    parser.add_argument('--same-question', action='store_true', help='every chat asks the same question, no cache')
+    parser.add_argument('--no-coalescing', action='store_true', help='one generation per request')
+    args = parser.parse_args()
+
+    endpoints = args.endpoints.split(',')
+    if args.blocking and 'stream' in endpoints:
+        parser.error("--blocking only applies to the chat endpoint")
+
+    with tempfile.TemporaryDirectory(prefix='siports-bench-') as workdir:
+        os.environ['DATABASE_URL'] = os.path.join(workdir, 'bench.db')
+        os.environ.setdefault('JWT_SECRET_KEY', secrets.token_hex(32))
+        logging.basicConfig(level=logging.WARNING)
+        import chatbot_service
+        import llm_client
+        import server_production
+
+        with FakeOllama(args.latency, args.tokens_per_second, args.tokens) as fake:
+            client = llm_client.OllamaClient(host=fake.url, max_concurrency=args.ollama_concurrency)
+            if args.blocking:
+                import ollama
+
+                async def blocking_chat(model, messages, options=None):
+                    # Ancien comportement : appel synchrone dans une coroutine
+                    return ollama.Client(host=fake.url).chat(model=model, messages=messages)['message']['content']
+                client.chat = blocking_chat
+            chatbot_service.ollama_client = client
+            chatbot_service.siports_ai_service.mock_mode = args.mock
+            if args.same_question:
+                chatbot_service.siports_ai_service.response_cache.max_size = 0
+            chatbot_service.siports_ai_service.single_flight.enabled = not args.no_coalescing
+
+            # Vrai serveur HTTP : avec httpx.ASGITransport la réponse arrive d'un bloc (pas de TTFB)
+            server, thread, url = serve_in_thread(server_production.app)
+            try:
+                for endpoint in endpoints:
+                    fake.max_active = 0
+                    generations = fake.requests
+                    started = time.perf_counter()
+                    latencies = asyncio.run(run_endpoint(args, url, ENDPOINTS[endpoint]))
+                    elapsed = time.perf_counter() - started
+
+                    mode = 'mock' if args.mock else ('blocking ollama.chat' if args.blocking else 'async client')
+                    print(f"\n{ENDPOINTS[endpoint]} ({mode}): {args.chats} chats, concurrency {args.concurrency}, "
+                          f"fake Ollama {args.latency}s + {args.tokens} tokens at {args.tokens_per_second:g}/s, "
+                          f"max in flight {fake.max_active}, {fake.requests - generations} generations, "
+                          f"{elapsed:.1f}s total")
+                    print(f"  {'request':<10} {'count':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+                    print(summary('ttfb', latencies['ttfb']))
+                    print(summary('total', latencies['total']))
+                    print(summary('health', latencies['health']))
+            finally:
+                stop_server(server, thread)
+
+
+if __name__ == "__main__":
+    main()
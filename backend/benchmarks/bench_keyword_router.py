@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+SIPORTS v2.0 - Keyword routing micro-benchmark
+Compare, sur des messages de visiteurs réalistes, l'ancienne détection
+d'intention et de sentiment de ai_chatbot_system (suites de
+any(mot in message ...), recopiées ci-dessous) au KeywordRouter, qui
+cherche une seule fois chaque mot distinct des deux tables. Les deux
+versions sont des coroutines, comme les méthodes d'origine. Vérifie
+d'abord qu'elles donnent exactement les mêmes résultats. Une seconde partie
+classe un message dans toutes les catégories à la fois, avec des tables
+agrandies artificiellement (--scales).
+
+Usage:
+    python benchmarks/bench_keyword_router.py [--rounds 2000] [--scales 1,4,16]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ai_chatbot_system import INTENT_KEYWORDS, MESSAGE_ROUTER, SENTIMENT_KEYWORDS, MaritimeChatBot  # noqa: E402
+from keyword_router import KeywordRouter  # noqa: E402
+
+MESSAGES = [
+    "Bonjour",
+    "Quel est le prix des forfaits ?",
+    "Le forfait premium inclut-il les déjeuners networking ?",
+    "Est-ce que l'entrée est gratuite pour les étudiants ?",
+    "Quels sont les horaires du salon demain ?",
+    "Où se trouve la conférence sur la décarbonation du transport maritime ?",
+    "Je cherche un exposant en technologie portuaire et smart ports",
+    "Quelles entreprises de logistique et shipping seront présentes ?",
+    "Merci, c'est parfait !",
+    "J'ai un problème pour prendre rendez-vous avec un partenaire, erreur 500",
+    "Comment utiliser l'application pour naviguer dans le salon ?",
+    "Pouvez-vous me recommander des fournisseurs d'équipements navals pour notre flotte de remorqueurs ?",
+]
+
+
+# --- Ancienne implémentation (avant KeywordRouter), pour comparaison ---------
+
+async def legacy_sentiment(message: str) -> float:
+    positive_words = ['merci', 'excellent', 'parfait', 'super', 'génial', 'bravo', 'formidable']
+    negative_words = ['problème', 'erreur', 'bug', 'cassé', 'mauvais', 'nul', 'horrible']
+    message_lower = message.lower()
+    score = 0.0
+    word_count = len(message.split())
+    for word in positive_words:
+        if word in message_lower:
+            score += 1.0
+    for word in negative_words:
+        if word in message_lower:
+            score -= 1.0
+    if word_count > 0:
+        score = max(-1.0, min(1.0, score / word_count * 10))
+    return score
+
+
+async def legacy_intent(message: str) -> str:
+    message_lower = message.lower()
+    intent_patterns = {
+        "info_packages": ["forfait", "package", "prix", "tarif", "coût"],
+        "info_event": ["salon", "événement", "programme", "horaires", "lieu"],
+        "networking": ["rdv", "rendez-vous", "rencontre", "contact", "réseau"],
+        "technical_help": ["problème", "bug", "aide", "support", "erreur"],
+        "matching": ["partenaire", "match", "recherche", "recommandation"],
+        "navigation": ["comment", "où", "naviguer", "utiliser", "fonctionner"],
+        "greeting": ["bonjour", "salut", "hello", "bonsoir", "coucou"],
+        "goodbye": ["au revoir", "bye", "salut", "à bientôt"]
+    }
+    for intent, keywords in intent_patterns.items():
+        if any(keyword in message_lower for keyword in keywords):
+            return intent
+    return "general_inquiry"
+
+
+# -----------------------------------------------------------------------------
+
+def run(coro):
+    """Result of a coroutine that never suspends, without an event loop"""
+    try:
+        coro.send(None)
+    except StopIteration as done:
+        return done.value
+    raise RuntimeError("coroutine suspended")
+
+
+def timed(fn, rounds: int, repeats: int = 5) -> float:
+    """Mean microseconds per message over every sample message, best of `repeats` runs"""
+    best = float('inf')
+    for _ in range(repeats):
+        started = time.perf_counter()
+        for _ in range(rounds):
+            for message in MESSAGES:
+                fn(message)
+        best = min(best, time.perf_counter() - started)
+    return best / (rounds * len(MESSAGES)) * 1e6
+
+
+def scaled_tables(scale: int):
+    """Every keyword table, repeated `scale` times with distinct keywords"""
+    base = {**INTENT_KEYWORDS, **SENTIMENT_KEYWORDS}
+    return {f'{category}_{i}': [word + (str(i) if i else '') for word in words]
+            for i in range(scale) for category, words in base.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rounds', type=int, default=2000)
+    parser.add_argument('--scales', default='1,4,16', help='table size multipliers for the all-categories run')
+    args = parser.parse_args()
+
+    # detect_intent / analyze_sentiment n'utilisent pas la base du chatbot Claude
+    bot = MaritimeChatBot.__new__(MaritimeChatBot)
+
+    def intent_and_sentiment(message):
+        hits = MESSAGE_ROUTER.scan(message.lower())
+        return run(bot.detect_intent(message, hits)), run(bot.analyze_sentiment(message, hits))
+
+    def legacy_intent_and_sentiment(message):
+        return run(legacy_intent(message)), run(legacy_sentiment(message))
+
+    # Mêmes résultats avant de comparer les temps
+    for message in MESSAGES:
+        assert intent_and_sentiment(message) == legacy_intent_and_sentiment(message), message
+
+    results = {
+        'intent + sentiment, legacy any() scans': timed(legacy_intent_and_sentiment, args.rounds),
+        'intent + sentiment, KeywordRouter': timed(intent_and_sentiment, args.rounds),
+    }
+
+    print(f"\n{len(MESSAGES)} messages x {args.rounds} rounds (mean per message, best of 5 runs)")
+    for name, micros in results.items():
+        print(f"  {name:<40} {micros:>7.2f} µs")
+
+    print("\nEvery category at once (mean per message)")
+    print(f"  {'keywords':>8} {'any() per table':>16} {'KeywordRouter':>14}")
+    for scale in (int(value) for value in args.scales.split(',')):
+        tables = scaled_tables(scale)
+        router = KeywordRouter(tables)
+
+        def every_table(message, tables=tables):
+            message = message.lower()
+            return {category: any(word in message for word in words) for category, words in tables.items()}
+
+        legacy = timed(every_table, max(1, args.rounds // scale))
+        single = timed(lambda message: router.scan(message.lower()), max(1, args.rounds // scale))
+        print(f"  {sum(len(words) for words in tables.values()):>8} {legacy:>13.2f} µs {single:>11.2f} µs")
+
+
+if __name__ == "__main__":
+    main()
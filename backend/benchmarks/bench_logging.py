@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+SIPORTS v2.0 - Logging benchmark
+Coût par appel logger.info() vu du thread appelant : handler synchrone
+(l'ancien basicConfig) contre log_pipeline (file + QueueListener), avec et
+sans l'échantillonnage du logger siports.chat. La sortie va dans un fichier
+temporaire ; --write-latency-us simule un stdout lent (pipe vers le
+collecteur de logs du conteneur) en ajoutant une attente à chaque écriture.
+
+Usage:
+    python benchmarks/bench_logging.py [--records 50000] [--threads 4] [--write-latency-us 50]
+"""
+
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import log_pipeline  # noqa: E402
+
+
+class SlowStream:
+    """File stream whose writes block for a fixed time, like a saturated pipe"""
+
+    def __init__(self, stream, latency: float):
+        self.stream = stream
+        self.latency = latency
+
+    def write(self, data: str):
+        if self.latency:
+            time.sleep(self.latency)
+        return self.stream.write(data)
+
+    def flush(self):
+        self.stream.flush()
+
+
+def reset_root():
+    log_pipeline.log_pipeline.stop()
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+        handler.close()
+
+
+def run(logger_name: str, records: int, threads: int) -> float:
+    """Mean microseconds per call in the calling threads"""
+    logger = logging.getLogger(logger_name)
+    per_thread = records // threads
+
+    def emit():
+        for i in range(per_thread):
+            logger.info("Chatbot response generated for context: %s (%d)", 'general', i)
+
+    workers = [threading.Thread(target=emit) for _ in range(threads)]
+    started = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return (time.perf_counter() - started) / (per_thread * threads) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--records', type=int, default=50000)
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--write-latency-us', type=float, default=50)
+    args = parser.parse_args()
+    # Le plafond de débit fausserait la comparaison : on le retire
+    log_pipeline.LOG_MAX_PER_SECOND = 0
+    log_pipeline.LOG_QUEUE_SIZE = args.records * 2
+
+    with tempfile.TemporaryDirectory(prefix='siports-bench-') as workdir:
+        results = {}
+        latency = args.write_latency_us / 1e6
+        with open(os.path.join(workdir, 'sync.log'), 'w') as file:
+            stream = SlowStream(file, latency)
+            reset_root()
+            logging.basicConfig(level=logging.INFO, stream=stream,
+                                format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+            results['sync basicConfig'] = run('server_production', args.records, args.threads)
+            reset_root()
+
+        with open(os.path.join(workdir, 'queue.log'), 'w') as file:
+            stream = SlowStream(file, latency)
+            log_pipeline.log_pipeline.configure(level='INFO', fmt='json', stream=stream, force=True)
+            results['queue, json'] = run('server_production', args.records, args.threads)
+            results['queue, json, siports.chat sampled'] = run('siports.chat', args.records, args.threads)
+            reset_root()
+        metrics = log_pipeline.log_pipeline.metrics()
+
+    print(f"\n{args.records:,} records, {args.threads} threads, "
+          f"{args.write_latency_us:g} µs per write (calling-thread cost)")
+    for name, micros in results.items():
+        print(f"  {name:<38} {micros:>7.2f} µs/call")
+    print(f"  sampled out: {metrics['sampled_out']:,}, dropped (queue full): {metrics['dropped_queue_full']:,}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+SIPORTS v2.0 - Metrics middleware overhead benchmark
+Appelle directement l'application ASGI (sans réseau) avec et sans
+MetricsMiddleware et mesure le surcoût par requête.
+
+Usage: python benchmarks/bench_metrics_overhead.py [--requests 20000] [--rounds 5]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi import FastAPI  # noqa: E402
+
+from metrics import HTTPMetrics, MetricsMiddleware  # noqa: E402
+
+
+def build_app(with_metrics: bool) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/health")
+    async def health():
+        return {"status": "healthy"}
+
+    @app.get("/api/items/{item_id}")
+    async def item(item_id: int):
+        return {"id": item_id}
+
+    if with_metrics:
+        app.add_middleware(MetricsMiddleware, metrics=HTTPMetrics())
+    return app
+
+
+def http_scope(path: str) -> dict:
+    return {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1',
+        'method': 'GET', 'scheme': 'http', 'path': path, 'raw_path': path.encode(),
+        'query_string': b'', 'root_path': '', 'headers': [(b'host', b'bench')],
+        'client': ('127.0.0.1', 1234), 'server': ('bench', 80),
+    }
+
+
+async def drive(app, requests: int) -> float:
+    async def receive():
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    async def send(message):
+        pass
+
+    paths = ['/health', '/api/items/42']
+    started = time.perf_counter()
+    for i in range(requests):
+        await app(http_scope(paths[i & 1]), receive, send)
+    return time.perf_counter() - started
+
+
+async def run(requests: int, rounds: int):
+    plain, instrumented = build_app(False), build_app(True)
+    # Échauffement (construction des routes, pré-liaison des labels)
+    await drive(plain, 500)
+    await drive(instrumented, 500)
+
+    best_plain = best_instrumented = float('inf')
+    for _ in range(rounds):
+        best_plain = min(best_plain, await drive(plain, requests))
+        best_instrumented = min(best_instrumented, await drive(instrumented, requests))
+
+    plain_us = best_plain / requests * 1e6
+    instrumented_us = best_instrumented / requests * 1e6
+    print(f"requests per round:      {requests} (best of {rounds})")
+    print(f"without middleware:      {plain_us:8.2f} us/request")
+    print(f"with MetricsMiddleware:  {instrumented_us:8.2f} us/request")
+    print(f"overhead:                {instrumented_us - plain_us:8.2f} us/request "
+          f"({(instrumented_us / plain_us - 1) * 100:.1f}%)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--requests', type=int, default=20000)
+    parser.add_argument('--rounds', type=int, default=5)
+    args = parser.parse_args()
+    asyncio.run(run(args.requests, args.rounds))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+SIPORTS v2.0 - Write path benchmark
+Compare l'ancien chemin d'écriture (connexion + commit par requête, journal
+rollback) au writer unique WAL + group commit de db_pool.
+
+Usage: python benchmarks/bench_write_path.py [--writes 5000] [--concurrency 64]
+"""
+
+import argparse
+import asyncio
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db_pool import SQLitePool  # noqa: E402
+
+SCHEMA = '''
+    CREATE TABLE users (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        email TEXT UNIQUE NOT NULL,
+        password_hash TEXT NOT NULL,
+        user_type TEXT DEFAULT 'visitor',
+        first_name TEXT,
+        last_name TEXT,
+        status TEXT DEFAULT 'pending',
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+'''
+INSERT = 'INSERT INTO users (email, password_hash, first_name, last_name) VALUES (?, ?, ?, ?)'
+
+
+def create_database(path: str):
+    conn = sqlite3.connect(path)
+    conn.execute(SCHEMA)
+    conn.commit()
+    conn.close()
+
+
+def bench_baseline(path: str, writes: int, concurrency: int):
+    """One connection and one commit per write, as in the original handlers"""
+    errors = 0
+
+    def register(i):
+        nonlocal errors
+        try:
+            conn = sqlite3.connect(path)
+            conn.execute(INSERT, (f'user{i}@example.com', 'hash', 'Jean', 'Martin'))
+            conn.commit()
+            conn.close()
+        except sqlite3.OperationalError:
+            errors += 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(register, range(writes)))
+    return time.perf_counter() - started, errors
+
+
+def bench_group_commit(path: str, writes: int, concurrency: int):
+    """All writes through the single WAL writer of SQLitePool"""
+    pool = SQLitePool(path)
+    errors = 0
+
+    async def main():
+        nonlocal errors
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def register(i):
+            nonlocal errors
+            async with semaphore:
+                try:
+                    await pool.execute(INSERT, (f'user{i}@example.com', 'hash', 'Jean', 'Martin'))
+                except sqlite3.OperationalError:
+                    errors += 1
+
+        await asyncio.gather(*(register(i) for i in range(writes)))
+
+    started = time.perf_counter()
+    asyncio.run(main())
+    elapsed = time.perf_counter() - started
+    batches = pool.writer.metrics()['avg_batch_size']
+    pool.close()
+    return elapsed, errors, batches
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--writes', type=int, default=5000)
+    parser.add_argument('--concurrency', type=int, default=64)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        baseline_db = os.path.join(tmp, 'baseline.db')
+        wal_db = os.path.join(tmp, 'wal.db')
+        create_database(baseline_db)
+        create_database(wal_db)
+
+        elapsed, errors = bench_baseline(baseline_db, args.writes, args.concurrency)
+        print(f"baseline     : {args.writes / elapsed:10.0f} writes/s  ({elapsed:.2f}s, {errors} locked errors)")
+
+        elapsed, errors, avg_batch = bench_group_commit(wal_db, args.writes, args.concurrency)
+        print(f"group commit : {args.writes / elapsed:10.0f} writes/s  ({elapsed:.2f}s, {errors} errors, "
+              f"avg batch {avg_batch})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+SIPORTS v2.0 - Local fake Ollama server for tests and benchmarks
+Petit serveur HTTP qui imite POST /api/chat d'Ollama (réponse complète ou
+flux NDJSON) sans modèle : une latence avant le premier token, puis un débit
+de tokens fixe. Il compte les générations en cours (pic compris) et celles
+abandonnées par le client, pour vérifier le sémaphore et l'annulation.
+
+Usage:
+    python benchmarks/fake_ollama.py [--port 11434] [--latency 0.5]
+        [--tokens-per-second 20] [--tokens 40]
+"""
+
+import argparse
+import asyncio
+import json
+import socket
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional, Tuple
+
+WORDS = ('Le', 'salon', 'SIPORTS', 'réunit', 'les', 'acteurs', 'du', 'transport', 'maritime', 'et',
+         'de', 'la', 'logistique', 'portuaire', 'autour', 'de', 'conférences', 'et', 'ateliers.')
+
+
+def serve_in_thread(app, lifespan: str = 'auto') -> Tuple[Any, threading.Thread, str]:
+    """uvicorn on a free 127.0.0.1 port in a daemon thread; returns (server, thread, url)"""
+    import uvicorn
+    sock = socket.socket()
+    # Hérité par les connexions acceptées : sans lui, Nagle + ACK retardé ajoutent ~40 ms par réponse
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    sock.bind(('127.0.0.1', 0))
+    url = f'http://127.0.0.1:{sock.getsockname()[1]}'
+    config = uvicorn.Config(app, log_level='warning', access_log=False, lifespan=lifespan, log_config=None)
+    server = uvicorn.Server(config)
+    thread = threading.Thread(target=server.run, kwargs={'sockets': [sock]}, daemon=True)
+    thread.start()
+    deadline = time.monotonic() + 30
+    while not server.started:
+        if time.monotonic() > deadline or not thread.is_alive():
+            raise RuntimeError("uvicorn did not start")
+        time.sleep(0.01)
+    return server, thread, url
+
+
+def stop_server(server, thread: threading.Thread):
+    server.should_exit = True
+    thread.join(timeout=10)
+
+
+class FakeOllama:
+    """ASGI app answering /api/chat with a fixed latency and token rate"""
+
+    def __init__(self, latency: float = 0.5, tokens_per_second: float = 20.0, tokens: int = 40):
+        self.latency = latency
+        self.tokens_per_second = tokens_per_second
+        self.tokens = tokens
+        self.requests = 0
+        self.active = 0
+        self.max_active = 0
+        self.completed = 0
+        self.cancelled = 0
+        self._server = None
+        self._thread: Optional[threading.Thread] = None
+        self.url: Optional[str] = None
+
+    def _token(self, i: int) -> str:
+        return ('' if i == 0 else ' ') + WORDS[i % len(WORDS)]
+
+    def _part(self, model: str, content: str, done: bool) -> Dict[str, Any]:
+        part = {
+            "model": model,
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "message": {"role": "assistant", "content": content},
+            "done": done,
+        }
+        if done:
+            part.update(done_reason="stop", eval_count=self.tokens)
+        return part
+
+    async def _generate(self, send, model: str, stream: bool):
+        await asyncio.sleep(self.latency)
+        interval = 1 / self.tokens_per_second if self.tokens_per_second > 0 else 0
+        if not stream:
+            await asyncio.sleep(interval * self.tokens)
+            content = ''.join(self._token(i) for i in range(self.tokens))
+            body = json.dumps(self._part(model, content, True)).encode()
+            await send({'type': 'http.response.start', 'status': 200,
+                        'headers': [(b'content-type', b'application/json')]})
+            await send({'type': 'http.response.body', 'body': body})
+            return
+        await send({'type': 'http.response.start', 'status': 200,
+                    'headers': [(b'content-type', b'application/x-ndjson')]})
+        for i in range(self.tokens):
+            if i:
+                await asyncio.sleep(interval)
+            line = json.dumps(self._part(model, self._token(i), False)) + '\n'
+            await send({'type': 'http.response.body', 'body': line.encode(), 'more_body': True})
+        line = json.dumps(self._part(model, '', True)) + '\n'
+        await send({'type': 'http.response.body', 'body': line.encode()})
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            return
+        if scope['path'] != '/api/chat':
+            await send({'type': 'http.response.start', 'status': 200, 'headers': [(b'content-type', b'text/plain')]})
+            await send({'type': 'http.response.body', 'body': b'Ollama is running'})
+            return
+
+        body = b''
+        while True:
+            message = await receive()
+            body += message.get('body', b'')
+            if not message.get('more_body'):
+                break
+        payload = json.loads(body or b'{}')
+
+        self.requests += 1
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        generation = asyncio.ensure_future(self._generate(send, payload.get('model', ''), payload.get('stream', True)))
+
+        async def wait_disconnect():
+            while (await receive())['type'] != 'http.disconnect':
+                pass
+
+        watcher = asyncio.ensure_future(wait_disconnect())
+        try:
+            await asyncio.wait({generation, watcher}, return_when=asyncio.FIRST_COMPLETED)
+            if generation.done():
+                generation.result()
+                self.completed += 1
+            else:
+                generation.cancel()
+                self.cancelled += 1
+        finally:
+            watcher.cancel()
+            self.active -= 1
+
+    def start(self) -> str:
+        """Serve on a free local port in a background thread; returns the base URL"""
+        self._server, self._thread, self.url = serve_in_thread(self, lifespan='off')
+        return self.url
+
+    def stop(self):
+        if self._server is not None:
+            stop_server(self._server, self._thread)
+            self._server = None
+
+    def __enter__(self) -> 'FakeOllama':
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--port', type=int, default=11434)
+    parser.add_argument('--latency', type=float, default=0.5, help='seconds before the first token')
+    parser.add_argument('--tokens-per-second', type=float, default=20.0)
+    parser.add_argument('--tokens', type=int, default=40, help='tokens per reply')
+    args = parser.parse_args()
+    import uvicorn
+    fake = FakeOllama(args.latency, args.tokens_per_second, args.tokens)
+    uvicorn.run(fake, host='127.0.0.1', port=args.port, log_level='info', lifespan='off')
+
+
+if __name__ == "__main__":
+    main()
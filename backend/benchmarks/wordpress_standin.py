@@ -0,0 +1,143 @@
+"""
+SIPORTS v2.0 - Local WordPress stand-in for benchmarks
+Remplace la base MySQL WordPress par un fichier SQLite local avec le même
+schéma (wp_users, wp_usermeta, wp_posts, wp_postmeta) et un minimum de
+l'API mysql.connector, pour que WordPressSyncService tourne sans serveur.
+Une latence par connexion peut simuler l'aller-retour réseau vers MySQL.
+"""
+
+import os
+import sqlite3
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import wordpress_config  # noqa: E402
+from wordpress_config import WordPressConfig  # noqa: E402
+
+WP_USERS = 50
+WP_EVENTS = 30
+WP_EXHIBITORS = 120
+
+SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS wp_users (
+        ID INTEGER PRIMARY KEY, user_login TEXT UNIQUE, user_email TEXT UNIQUE,
+        user_pass TEXT, display_name TEXT
+    );
+    CREATE TABLE IF NOT EXISTS wp_usermeta (
+        umeta_id INTEGER PRIMARY KEY, user_id INTEGER, meta_key TEXT, meta_value TEXT,
+        UNIQUE (user_id, meta_key)
+    );
+    CREATE TABLE IF NOT EXISTS wp_posts (
+        ID INTEGER PRIMARY KEY, post_title TEXT, post_content TEXT, post_excerpt TEXT,
+        post_date TEXT, post_status TEXT, post_type TEXT
+    );
+    CREATE TABLE IF NOT EXISTS wp_postmeta (
+        meta_id INTEGER PRIMARY KEY, post_id INTEGER, meta_key TEXT, meta_value TEXT
+    );
+'''
+
+
+def wp_user_login(i: int) -> str:
+    return f'wpuser{i}'
+
+
+def create_wordpress_database(path: str):
+    """Seed users, capabilities, packages, events and exhibitors"""
+    conn = sqlite3.connect(path)
+    conn.executescript(SCHEMA)
+    if conn.execute('SELECT COUNT(*) FROM wp_users').fetchone()[0]:
+        conn.close()
+        return
+    for i in range(1, WP_USERS + 1):
+        conn.execute('INSERT INTO wp_users VALUES (?, ?, ?, ?, ?)',
+                     (i, wp_user_login(i), f'wpuser{i}@example.com', '$P$Bstandinhash', f'Wp User{i}'))
+        conn.executemany('INSERT INTO wp_usermeta (user_id, meta_key, meta_value) VALUES (?, ?, ?)', [
+            (i, 'wp_capabilities', 'a:1:{s:10:"subscriber";b:1;}'),
+            (i, 'siports_visitor_package', 'Premium' if i % 3 == 0 else 'Basic'),
+        ])
+    post_id = 0
+    for post_type, count, metas in (
+        ('siports_event', WP_EVENTS, ('event_date', 'event_location', 'event_type')),
+        ('siports_exhibitor', WP_EXHIBITORS, ('company_website', 'company_sector', 'company_logo', 'booth_number')),
+    ):
+        for i in range(count):
+            post_id += 1
+            conn.execute('INSERT INTO wp_posts VALUES (?, ?, ?, ?, ?, ?, ?)',
+                         (post_id, f'{post_type} {i}', 'Contenu ' * 40, 'Résumé', '2026-06-01 09:00:00',
+                          'publish', post_type))
+            conn.executemany('INSERT INTO wp_postmeta (post_id, meta_key, meta_value) VALUES (?, ?, ?)',
+                             [(post_id, key, f'{key}-{i}') for key in metas])
+    conn.commit()
+    conn.close()
+
+
+class StandInCursor:
+    """The part of a mysql.connector cursor the WordPress code uses"""
+
+    def __init__(self, conn: sqlite3.Connection, dictionary: bool):
+        self._cursor = conn.cursor()
+        self._dictionary = dictionary
+
+    def execute(self, sql, params=()):
+        # MySQL -> SQLite : paramètres %s et upsert ON DUPLICATE KEY
+        sql = sql.replace('%s', '?')
+        if 'ON DUPLICATE KEY UPDATE' in sql:
+            sql = sql.replace('INSERT INTO', 'INSERT OR REPLACE INTO').split('ON DUPLICATE KEY UPDATE')[0]
+        self._cursor.execute(sql, params)
+
+    def _row(self, row):
+        if row is None or not self._dictionary:
+            return row
+        return {column[0]: value for column, value in zip(self._cursor.description, row)}
+
+    def fetchone(self):
+        return self._row(self._cursor.fetchone())
+
+    def fetchall(self):
+        return [self._row(row) for row in self._cursor.fetchall()]
+
+    def close(self):
+        self._cursor.close()
+
+
+class StandInConnection:
+    def __init__(self, path: str):
+        self._conn = sqlite3.connect(path, timeout=10)
+        self._open = True
+
+    def cursor(self, dictionary: bool = False):
+        return StandInCursor(self._conn, dictionary)
+
+    def is_connected(self):
+        return self._open
+
+    def commit(self):
+        self._conn.commit()
+
+    def close(self):
+        self._open = False
+        self._conn.close()
+
+
+class StandInWordPressConfig(WordPressConfig):
+    """WordPressConfig whose MySQL connections go to the local stand-in"""
+
+    def __init__(self, path: str, latency_ms: float = 0.0):
+        super().__init__()
+        self.standin_path = path
+        self.latency = latency_ms / 1000
+
+    def get_wp_connection(self):
+        if self.latency:
+            time.sleep(self.latency)
+        return StandInConnection(self.standin_path)
+
+
+def install_wordpress_standin(path: str, latency_ms: float = 0.0) -> StandInWordPressConfig:
+    """Seed the stand-in database and make get_wp_config() return it"""
+    create_wordpress_database(path)
+    config = StandInWordPressConfig(path, latency_ms)
+    wordpress_config._wp_config = config
+    return config
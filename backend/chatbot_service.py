@@ -3,15 +3,44 @@ SIPORTS v2.0 AI Chatbot Service
 Service pour chatbot IA gratuit avec support Ollama et simulation pour développement
 """
 
+import asyncio
+import hashlib
+import json
+import os
+import re
 import time
 import random
+from contextlib import aclosing
 import logging
-from typing import Dict, List, Optional, Any
+import secrets
+from typing import AsyncIterator, Dict, List, Optional, Any
 from pydantic import BaseModel, Field
 from enum import Enum
 
+from llm_client import LLMBusy, ollama_client
+from response_cache import CHAT_CACHE_CHECK_INTERVAL, normalize_prompt, response_cache
+from session_store import SESSION_SWEEP_INTERVAL, MemorySessionStore
+from singleflight import SingleFlight
+
 logger = logging.getLogger(__name__)
 
+# Mode simulation par défaut; CHATBOT_MOCK_MODE=false pour passer par Ollama
+CHATBOT_MOCK_MODE = os.environ.get('CHATBOT_MOCK_MODE', 'true').lower() == 'true'
+OLLAMA_MODEL = os.environ.get('OLLAMA_MODEL', 'tinyllama:1.1b')
+# num_predict : nombre maximal de tokens générés (max_tokens n'existe pas côté Ollama)
+OLLAMA_OPTIONS = {"temperature": 0.7, "num_predict": 500, "top_p": 0.9}
+# Mots par événement quand la réponse simulée est envoyée en flux
+MOCK_STREAM_WORDS = int(os.environ.get('MOCK_STREAM_WORDS', 4))
+
+# Pas de mise en cache ni de tampon proxy (nginx) sur le flux SSE
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+
+def format_sse(event: Dict[str, Any]) -> str:
+    """One server-sent event: event name and JSON data"""
+    return f"event: {event['event']}\ndata: {json.dumps(event['data'], ensure_ascii=False)}\n\n"
+
+
 class ContextType(str, Enum):
     GENERAL = "general"
     EXHIBITOR = "exhibitor" 
@@ -23,6 +52,7 @@ class ChatRequest(BaseModel):
     context_type: ContextType = Field(default=ContextType.GENERAL, description="Type de contexte pour le chatbot")
     user_id: Optional[str] = Field(default=None, description="Identifiant utilisateur pour suivi session")
     session_id: Optional[str] = Field(default=None, description="ID de session de conversation")
+    bypass_cache: bool = Field(default=False, description="Réponse personnalisée : ne pas utiliser le cache de réponses")
 
 class ChatResponse(BaseModel):
     response: str = Field(..., description="Réponse IA générée")
@@ -38,7 +68,16 @@ class SiportsAIService:
     def __init__(self, mock_mode: bool = True, model_name: str = "tinyllama:1.1b"):
         self.mock_mode = mock_mode
         self.model_name = model_name
-        self.conversation_history: Dict[str, List[Dict[str, str]]] = {}
+        # Historique par session (mémoire, ou SQLite partagé en multi-workers)
+        self.sessions = MemorySessionStore()
+        self._sweep_task: Optional[asyncio.Task] = None
+        # Cache des réponses LLM, vidé quand la connaissance ou les catalogues changent
+        self.response_cache = response_cache
+        self._package_catalog = None
+        self._knowledge_fingerprint: Optional[str] = None
+        self._knowledge_checked_at = 0.0
+        # Questions identiques simultanées : une seule génération partagée
+        self.single_flight = SingleFlight()
         
         # Templates de contexte pour réponses spécialisées
         self.context_templates = {
@@ -81,8 +120,8 @@ class SiportsAIService:
     def get_session_id(self, user_id: str = None) -> str:
         """Génère ou récupère un ID de session"""
         if user_id:
-            return f"session_{user_id}_{int(time.time())}"
-        return f"session_anonymous_{int(time.time())}"
+            return f"session_{user_id}_{int(time.time())}_{secrets.token_hex(4)}"
+        return f"session_anonymous_{int(time.time())}_{secrets.token_hex(4)}"
 
     async def generate_response_mock(self, message: str, context_type: ContextType, session_id: str) -> str:
         """Génère une réponse simulée intelligente basée sur le contexte"""
@@ -173,36 +212,20 @@ class SiportsAIService:
         try:
             session_id = request.session_id or self.get_session_id(request.user_id)
             
-            # Gestion historique conversation
-            if session_id not in self.conversation_history:
-                self.conversation_history[session_id] = []
-            
-            # Ajouter message utilisateur à l'historique
-            self.conversation_history[session_id].append({
-                "role": "user",
-                "content": request.message,
-                "timestamp": time.time()
-            })
-            
-            # Limiter historique à 20 derniers échanges
-            if len(self.conversation_history[session_id]) > 20:
-                self.conversation_history[session_id] = self.conversation_history[session_id][-20:]
+            # Ajouter message utilisateur à l'historique (limité aux 20 derniers messages)
+            await self.sessions.append(session_id, "user", request.message)
 
             if self.mock_mode:
                 # Mode simulation pour développement
                 ai_response = await self.generate_response_mock(request.message, request.context_type, session_id)
                 confidence = round(random.uniform(0.8, 0.95), 2)
             else:
-                # Mode Ollama (à implémenter en production)
+                # Mode Ollama
                 ai_response = await self.generate_response_ollama(request, session_id)
                 confidence = 0.85
 
             # Ajouter réponse IA à l'historique
-            self.conversation_history[session_id].append({
-                "role": "assistant", 
-                "content": ai_response,
-                "timestamp": time.time()
-            })
+            await self.sessions.append(session_id, "assistant", ai_response)
             
             # Générer actions suggérées
             suggested_actions = self._generate_suggested_actions(request.context_type, request.message)
@@ -216,7 +239,7 @@ class SiportsAIService:
             )
             
         except Exception as e:
-            logger.error(f"Erreur génération réponse chatbot: {str(e)}")
+            logger.error("Erreur génération réponse chatbot: %s", e)
             return ChatResponse(
                 response="Désolé, je rencontre une difficulté technique. Pouvez-vous reformuler votre question ?",
                 response_type=request.context_type.value if hasattr(request.context_type, 'value') else request.context_type,
@@ -225,53 +248,223 @@ class SiportsAIService:
                 session_id=session_id or "error_session"
             )
 
+    async def _ollama_messages(self, request: ChatRequest, session_id: str) -> List[Dict[str, str]]:
+        """Prompt système du contexte + historique récent (dont le message courant)"""
+        # Préparer le contexte système
+        system_prompt = self.context_templates[request.context_type]
+        
+        # Préparer l'historique pour le contexte
+        messages = [{"role": "system", "content": system_prompt}]
+        
+        # Ajouter historique récent (5 derniers échanges)
+        recent_history = await self.sessions.recent(session_id, 10)
+        for msg in recent_history:
+            messages.append({"role": msg["role"], "content": msg["content"]})
+        return messages
+
+    def _knowledge_version(self) -> str:
+        """Empreinte de siports_knowledge et des prompts, recalculée au plus toutes les CHAT_CACHE_CHECK_INTERVAL s"""
+        now = time.monotonic()
+        if self._knowledge_fingerprint is None or now - self._knowledge_checked_at >= CHAT_CACHE_CHECK_INTERVAL:
+            templates = {getattr(k, 'value', k): v for k, v in self.context_templates.items()}
+            payload = json.dumps([self.siports_knowledge, templates], sort_keys=True, ensure_ascii=False)
+            self._knowledge_fingerprint = hashlib.sha256(payload.encode('utf-8')).hexdigest()
+            self._knowledge_checked_at = now
+        return self._knowledge_fingerprint
+
+    async def _shared_key(self, request: ChatRequest, session_id: str) -> Optional[tuple]:
+        """Clé des requêtes interchangeables (cache de réponses, coalescence), None sinon"""
+        try:
+            # Demande personnalisée ou suite de conversation : la réponse dépend de l'historique
+            if request.bypass_cache or len(await self.sessions.recent(session_id, 2)) > 1:
+                self.response_cache.bypass()
+                return None
+            if self.response_cache.enabled:
+                catalogs = await self._package_catalog.versions() if self._package_catalog is not None else ()
+                self.response_cache.sync_version((self._knowledge_version(), catalogs))
+        except Exception as e:
+            logger.warning("Cache de réponses ignoré: %s", e)
+            return None
+        context_type = request.context_type.value if hasattr(request.context_type, 'value') else request.context_type
+        return (self.model_name, context_type, normalize_prompt(request.message))
+
+    async def _generate_shared(self, request: ChatRequest, session_id: str, key: tuple) -> str:
+        """Génération partagée par les requêtes de même clé, mise en cache"""
+        generation = self.response_cache.generation
+        messages = await self._ollama_messages(request, session_id)
+        reply = await ollama_client.chat(self.model_name, messages, OLLAMA_OPTIONS)
+        self.response_cache.put(key, reply, generation)
+        return reply
+
     async def generate_response_ollama(self, request: ChatRequest, session_id: str) -> str:
-        """Génération réponse avec Ollama (implémentation future)"""
-        # TODO: Implémenter l'intégration Ollama réelle
+        """Génération réponse avec Ollama, via le client asynchrone partagé et le cache de réponses"""
         try:
-            import ollama
-            
-            # Préparer le contexte système
-            system_prompt = self.context_templates[request.context_type]
-            
-            # Préparer l'historique pour le contexte
-            messages = [{"role": "system", "content": system_prompt}]
-            
-            # Ajouter historique récent (5 derniers échanges)
-            recent_history = self.conversation_history[session_id][-10:] if session_id in self.conversation_history else []
-            for msg in recent_history:
-                messages.append({"role": msg["role"], "content": msg["content"]})
-            
-            # Générer réponse avec Ollama
-            response = ollama.chat(
-                model=self.model_name,
-                messages=messages,
-                options={
-                    "temperature": 0.7,
-                    "max_tokens": 500,
-                    "top_p": 0.9
-                }
-            )
-            
-            return response['message']['content']
+            key = await self._shared_key(request, session_id)
+            if key is None:
+                messages = await self._ollama_messages(request, session_id)
+                
+                # Générer réponse avec Ollama (ne bloque pas la boucle d'événements)
+                return await ollama_client.chat(self.model_name, messages, OLLAMA_OPTIONS)
+
+            cached = self.response_cache.get(key)
+            if cached is not None:
+                return cached
+            # Même question déjà en cours de génération : on attend sa réponse
+            return await self.single_flight.do(key, lambda: self._generate_shared(request, session_id, key))
             
         except ImportError:
             logger.warning("Ollama non disponible, utilisation du mode mock")
             return await self.generate_response_mock(request.message, request.context_type, session_id)
+        except LLMBusy as e:
+            logger.warning("Ollama saturé (%s), utilisation du mode mock", e)
+            return await self.generate_response_mock(request.message, request.context_type, session_id)
+        except asyncio.TimeoutError:
+            logger.error("Ollama timeout après %ss", ollama_client.timeout)
+            return await self.generate_response_mock(request.message, request.context_type, session_id)
         except Exception as e:
-            logger.error(f"Erreur Ollama: {str(e)}")
+            logger.error("Erreur Ollama: %s", e)
             return await self.generate_response_mock(request.message, request.context_type, session_id)
 
-    def get_conversation_history(self, session_id: str) -> List[Dict[str, Any]]:
+    async def _stream_text(self, text: str) -> AsyncIterator[str]:
+        """Texte déjà complet découpé en morceaux de quelques mots"""
+        words = re.findall(r'\S+\s*', text)
+        for i in range(0, len(words), MOCK_STREAM_WORDS):
+            yield ''.join(words[i:i + MOCK_STREAM_WORDS])
+            # Rend la main : chaque morceau part avant le suivant
+            await asyncio.sleep(0)
+
+    async def _stream_mock(self, request: ChatRequest, session_id: str) -> AsyncIterator[str]:
+        """Réponse simulée découpée en morceaux de quelques mots"""
+        text = await self.generate_response_mock(request.message, request.context_type, session_id)
+        async with aclosing(self._stream_text(text)) as chunks:
+            async for chunk in chunks:
+                yield chunk
+
+    async def stream_response_ollama(self, request: ChatRequest, session_id: str) -> AsyncIterator[str]:
+        """Morceaux de réponse Ollama au fil de la génération; mock si Ollama échoue avant le premier"""
+        started = False
+        try:
+            key = await self._shared_key(request, session_id)
+            cached = self.response_cache.get(key) if key is not None else None
+            if cached is not None:
+                async with aclosing(self._stream_text(cached)) as chunks:
+                    async for chunk in chunks:
+                        yield chunk
+                return
+            generation = self.response_cache.generation
+            parts: List[str] = []
+            messages = await self._ollama_messages(request, session_id)
+            async with aclosing(ollama_client.stream_chat(self.model_name, messages, OLLAMA_OPTIONS)) as chunks:
+                async for chunk in chunks:
+                    started = True
+                    parts.append(chunk)
+                    yield chunk
+            if key is not None:
+                self.response_cache.put(key, ''.join(parts), generation)
+            return
+        except ImportError:
+            logger.warning("Ollama non disponible, utilisation du mode mock")
+        except LLMBusy as e:
+            logger.warning("Ollama saturé (%s), utilisation du mode mock", e)
+        except asyncio.TimeoutError:
+            if started:
+                raise
+            logger.error("Ollama timeout après %ss", ollama_client.timeout)
+        except Exception as e:
+            if started:
+                raise
+            logger.error("Erreur Ollama: %s", e)
+        async with aclosing(self._stream_mock(request, session_id)) as chunks:
+            async for chunk in chunks:
+                yield chunk
+
+    async def stream_response(self, request: ChatRequest) -> AsyncIterator[Dict[str, Any]]:
+        """Événements de réponse en flux : token (morceau de texte) puis done.
+
+        done porte les mêmes champs que ChatResponse hors texte; la réponse
+        complète est ajoutée à l'historique avant d'être émise. Une erreur
+        après le premier morceau donne un événement error.
+        """
+        session_id = request.session_id or self.get_session_id(request.user_id)
+        response_type = request.context_type.value if hasattr(request.context_type, 'value') else request.context_type
+        chunks: List[str] = []
+        try:
+            await self.sessions.append(session_id, "user", request.message)
+            if self.mock_mode:
+                source = self._stream_mock(request, session_id)
+                confidence = round(random.uniform(0.8, 0.95), 2)
+            else:
+                source = self.stream_response_ollama(request, session_id)
+                confidence = 0.85
+            # aclosing : un client parti ferme toute la chaîne de générateurs dans l'ordre
+            async with aclosing(source):
+                async for chunk in source:
+                    chunks.append(chunk)
+                    yield {"event": "token", "data": {"content": chunk}}
+
+            await self.sessions.append(session_id, "assistant", ''.join(chunks))
+            suggested_actions = self._generate_suggested_actions(request.context_type, request.message)
+        except Exception as e:
+            logger.error("Erreur génération réponse chatbot (flux): %s", str(e) or type(e).__name__)
+            if chunks:
+                yield {"event": "error", "data": {"detail": "Génération interrompue", "session_id": session_id}}
+                return
+            yield {"event": "token", "data": {"content": "Désolé, je rencontre une difficulté technique. Pouvez-vous reformuler votre question ?"}}
+            confidence = 0.0
+            suggested_actions = ["🔄 Réessayer", "📞 Contact support"]
+
+        yield {"event": "done", "data": {
+            "response_type": response_type,
+            "confidence": confidence,
+            "suggested_actions": suggested_actions,
+            "session_id": session_id,
+            "timestamp": time.time(),
+        }}
+
+    def use_session_store(self, store):
+        """Replace the history store (SQLite shared store in multi-worker mode)"""
+        self.sessions = store
+
+    def use_package_catalog(self, catalog):
+        """Invalidate cached replies whenever a package catalog changes version"""
+        self._package_catalog = catalog
+
+    def start_session_sweeper(self, interval: float = SESSION_SWEEP_INTERVAL):
+        """Periodic removal of idle sessions, whatever the store"""
+        if self._sweep_task is None or self._sweep_task.done():
+            self._sweep_task = asyncio.create_task(self._sweep_sessions(interval))
+
+    def stop_session_sweeper(self):
+        if self._sweep_task is not None:
+            self._sweep_task.cancel()
+            self._sweep_task = None
+
+    async def _sweep_sessions(self, interval: float):
+        while True:
+            try:
+                removed = await self.sessions.sweep()
+                if removed:
+                    logger.info("Idle chat sessions removed: %s", removed)
+            except Exception as e:
+                logger.warning("Chat session sweep failed: %s", e)
+            await asyncio.sleep(interval)
+
+    def session_metrics(self) -> Dict[str, Any]:
+        return self.sessions.metrics()
+
+    def response_cache_metrics(self) -> Dict[str, Any]:
+        return self.response_cache.metrics()
+
+    def coalescing_metrics(self) -> Dict[str, Any]:
+        return self.single_flight.metrics()
+
+    async def get_conversation_history(self, session_id: str) -> List[Dict[str, Any]]:
         """Récupère l'historique de conversation pour une session"""
-        return self.conversation_history.get(session_id, [])
+        return await self.sessions.recent(session_id)
 
-    def clear_conversation_history(self, session_id: str) -> bool:
+    async def clear_conversation_history(self, session_id: str) -> bool:
         """Efface l'historique d'une session"""
-        if session_id in self.conversation_history:
-            del self.conversation_history[session_id]
-            return True
-        return False
+        return await self.sessions.clear(session_id)
 
 # Instance globale du service chatbot
-siports_ai_service = SiportsAIService(mock_mode=True)
\ No newline at end of file
+siports_ai_service = SiportsAIService(mock_mode=CHATBOT_MOCK_MODE, model_name=OLLAMA_MODEL)
\ No newline at end of file
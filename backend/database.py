@@ -25,14 +25,14 @@ elif DATABASE_URL.startswith("sqlite:///"):
 else:
     ASYNC_DATABASE_URL = DATABASE_URL
 
-logger.info(f"Using database URL: {DATABASE_URL}")
+logger.info("Using database URL: %s", DATABASE_URL)
 
 # Create async engine with proper configuration
 if "sqlite" in ASYNC_DATABASE_URL:
-    engine = create_async_engine(ASYNC_DATABASE_URL, echo=True, connect_args={"check_same_thread": False})
+    engine = create_async_engine(ASYNC_DATABASE_URL, connect_args={"check_same_thread": False})
     database = Database(ASYNC_DATABASE_URL)
 else:
-    engine = create_async_engine(ASYNC_DATABASE_URL, echo=True, pool_pre_ping=True)
+    engine = create_async_engine(ASYNC_DATABASE_URL, pool_pre_ping=True)
     database = Database(ASYNC_DATABASE_URL)
 
 # Create base class for models
@@ -59,7 +59,7 @@ async def connect_db():
         await database.connect()
         logger.info("Database connected successfully")
     except Exception as e:
-        logger.error(f"Database connection failed: {e}")
+        logger.error("Database connection failed: %s", e)
         raise
 
 async def disconnect_db():
@@ -68,7 +68,7 @@ async def disconnect_db():
         await database.disconnect()
         logger.info("Database disconnected successfully")
     except Exception as e:
-        logger.error(f"Database disconnection failed: {e}")
+        logger.error("Database disconnection failed: %s", e)
         raise
 
 async def create_tables():
@@ -78,5 +78,5 @@ async def create_tables():
             await conn.run_sync(Base.metadata.create_all)
         logger.info("Database tables created successfully")
     except Exception as e:
-        logger.error(f"Table creation failed: {e}")
+        logger.error("Table creation failed: %s", e)
         raise
\ No newline at end of file
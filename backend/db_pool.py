@@ -0,0 +1,502 @@
+"""
+SIPORTS v2.0 - SQLite Access Layer
+Pool borné de connexions SQLite réutilisables; les requêtes tournent sur un
+executor dédié pour ne jamais bloquer la boucle d'événements.
+Toutes les écritures passent par un writer unique (WAL + group commit).
+"""
+
+import asyncio
+import logging
+import os
+import queue
+import re
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
+
+from query_profiler import ProfiledConnection
+
+logger = logging.getLogger(__name__)
+
+DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 8))
+DB_POOL_TIMEOUT = float(os.environ.get('DB_POOL_TIMEOUT', 10))
+DB_BUSY_TIMEOUT_MS = int(os.environ.get('DB_BUSY_TIMEOUT_MS', 5000))
+DB_SYNCHRONOUS = os.environ.get('DB_SYNCHRONOUS', 'NORMAL')
+DB_WRITE_BATCH_SIZE = int(os.environ.get('DB_WRITE_BATCH_SIZE', 256))
+DB_CHECKPOINT_INTERVAL = float(os.environ.get('DB_CHECKPOINT_INTERVAL', 30))
+
+ExecuteResult = namedtuple('ExecuteResult', ['lastrowid', 'rowcount'])
+
+
+class PoolTimeout(Exception):
+    """No connection became available within the pool timeout"""
+
+
+class TimingStat:
+    """Thread-safe count/total/max accumulator for durations in seconds"""
+
+    __slots__ = ('_lock', 'count', 'total', 'max')
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds: float):
+        with self._lock:
+            self.count += 1
+            self.total += seconds
+            if seconds > self.max:
+                self.max = seconds
+
+    def snapshot(self) -> Dict[str, float]:
+        with self._lock:
+            avg = self.total / self.count if self.count else 0.0
+            return {
+                "count": self.count,
+                "total_ms": round(self.total * 1000, 3),
+                "avg_ms": round(avg * 1000, 3),
+                "max_ms": round(self.max * 1000, 3)
+            }
+
+
+def configure_connection(conn: sqlite3.Connection, query_only: bool = False):
+    """Apply the production pragmas to a connection"""
+    conn.execute(f'PRAGMA busy_timeout = {DB_BUSY_TIMEOUT_MS}')
+    conn.execute(f'PRAGMA synchronous = {DB_SYNCHRONOUS}')
+    if query_only:
+        conn.execute('PRAGMA query_only = 1')
+
+
+# Contrôle de transaction réservé au writer : un job ne peut que se servir de son savepoint
+_TRANSACTION_CONTROL = re.compile(r'\s*(BEGIN|COMMIT|END|ROLLBACK|SAVEPOINT|RELEASE)\b', re.IGNORECASE)
+
+
+class _JobConnection:
+    """Connection handed to a write job running inside a group commit.
+
+    commit() is a no-op because the writer commits the whole batch, and
+    rollback() only undoes the job's own savepoint, so code written against
+    a plain sqlite3 connection runs unchanged inside the batch. Statements
+    that would end or nest the writer's transaction (BEGIN, COMMIT,
+    ROLLBACK, SAVEPOINT..., executescript) are refused.
+    """
+
+    __slots__ = ('_conn',)
+
+    def __init__(self, conn: sqlite3.Connection):
+        self._conn = conn
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    @staticmethod
+    def _check(sql: str):
+        if _TRANSACTION_CONTROL.match(sql):
+            raise sqlite3.ProgrammingError(f"transaction control not allowed in a write job: {sql.strip()[:40]}")
+
+    def execute(self, sql: str, *args):
+        self._check(sql)
+        return self._conn.execute(sql, *args)
+
+    def executemany(self, sql: str, *args):
+        self._check(sql)
+        return self._conn.executemany(sql, *args)
+
+    def executescript(self, script: str):
+        # executescript() valide d'abord la transaction en cours
+        raise sqlite3.ProgrammingError("executescript() not allowed in a write job")
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        self._conn.execute('ROLLBACK TO write_job')
+
+    def close(self):
+        pass
+
+
+_STOP = object()
+
+
+class SQLiteWriter:
+    """Single serialized writer grouping queued write jobs into one commit"""
+
+    def __init__(self, database: str, max_batch: int = DB_WRITE_BATCH_SIZE,
+                 checkpoint_interval: float = DB_CHECKPOINT_INTERVAL):
+        self.database = database
+        self.max_batch = max_batch
+        self.checkpoint_interval = checkpoint_interval
+        self._queue: "queue.Queue" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.jobs = 0
+        self.failed_jobs = 0
+        self.checkpoints = 0
+        self.commit_time = TimingStat()
+
+    def _ensure_started(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._loop, name='sqlite-writer', daemon=True)
+                    self._thread.start()
+
+    def submit(self, fn: Callable, *args) -> Future:
+        """Queue fn(conn, *args) for the next group commit"""
+        future: Future = Future()
+        self._ensure_started()
+        self._queue.put((fn, args, future))
+        return future
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.database, timeout=DB_BUSY_TIMEOUT_MS / 1000, isolation_level=None,
+                               factory=ProfiledConnection)
+        conn.row_factory = sqlite3.Row
+        mode = conn.execute('PRAGMA journal_mode = WAL').fetchone()[0]
+        if mode.lower() != 'wal':
+            logger.warning("WAL journaling unavailable for %s (mode=%s)", self.database, mode)
+        configure_connection(conn)
+        return conn
+
+    def _loop(self):
+        try:
+            conn = self._connect()
+        except sqlite3.Error as e:
+            logger.error("SQLite writer could not open %s: %s", self.database, e)
+            with self._lock:
+                self._thread = None
+            self._fail_pending(e)
+            return
+        try:
+            last_checkpoint = time.monotonic()
+            stopping = False
+            while not stopping:
+                wait = max(0.0, self.checkpoint_interval - (time.monotonic() - last_checkpoint))
+                try:
+                    job = self._queue.get(timeout=wait)
+                except queue.Empty:
+                    self._checkpoint(conn, 'PASSIVE')
+                    last_checkpoint = time.monotonic()
+                    continue
+                if job is _STOP:
+                    break
+
+                batch = [job]
+                while len(batch) < self.max_batch:
+                    try:
+                        job = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if job is _STOP:
+                        stopping = True
+                        break
+                    batch.append(job)
+                self._commit_batch(conn, batch)
+        except BaseException as e:
+            # Le thread ne doit jamais mourir en laissant _thread positionné :
+            # les futurs suivants attendraient indéfiniment
+            logger.exception("SQLite writer stopped unexpectedly: %s", e)
+            with self._lock:
+                self._thread = None
+            self._fail_pending(e)
+            conn.close()
+            return
+
+        self._checkpoint(conn, 'TRUNCATE')
+        conn.close()
+
+    def _commit_batch(self, conn: sqlite3.Connection, batch: list):
+        started = time.perf_counter()
+        outcomes = []
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            job_conn = _JobConnection(conn)
+            for fn, args, future in batch:
+                if not future.set_running_or_notify_cancel():
+                    continue
+                conn.execute('SAVEPOINT write_job')
+                try:
+                    result = fn(job_conn, *args)
+                except BaseException as e:
+                    conn.execute('ROLLBACK TO write_job')
+                    conn.execute('RELEASE write_job')
+                    outcomes.append((future, None, e))
+                else:
+                    conn.execute('RELEASE write_job')
+                    outcomes.append((future, result, None))
+            conn.execute('COMMIT')
+        except BaseException as e:
+            # BEGIN, savepoint ou COMMIT en échec, ou transaction annulée par
+            # SQLite (SQLITE_FULL, IOERR) : rien du lot n'est écrit
+            logger.error("Group commit failed (%s jobs): %s", len(batch), e)
+            try:
+                if conn.in_transaction:
+                    conn.execute('ROLLBACK')
+            except sqlite3.Error as rollback_error:
+                logger.error("Rollback after failed group commit failed: %s", rollback_error)
+            outcomes = [(future, None, e) for _, _, future in batch
+                        if future.running() or future.set_running_or_notify_cancel()]
+
+        self.batches += 1
+        self.commit_time.observe(time.perf_counter() - started)
+        for future, result, error in outcomes:
+            self.jobs += 1
+            if error is not None:
+                self.failed_jobs += 1
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+    def _fail_pending(self, error: Exception):
+        while True:
+            try:
+                job = self._queue.get_nowait()
+            except queue.Empty:
+                return
+            if job is not _STOP and job[2].set_running_or_notify_cancel():
+                self.failed_jobs += 1
+                job[2].set_exception(error)
+
+    def _checkpoint(self, conn: sqlite3.Connection, mode: str):
+        try:
+            conn.execute(f'PRAGMA wal_checkpoint({mode})')
+            self.checkpoints += 1
+        except sqlite3.Error as e:
+            logger.warning("WAL checkpoint failed: %s", e)
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "queue_depth": self._queue.qsize(),
+            "batches": self.batches,
+            "jobs": self.jobs,
+            "failed_jobs": self.failed_jobs,
+            "avg_batch_size": round(self.jobs / self.batches, 2) if self.batches else 0.0,
+            "checkpoints": self.checkpoints,
+            "commit_time": self.commit_time.snapshot()
+        }
+
+    def close(self):
+        """Flush pending jobs, checkpoint the WAL and stop the writer thread"""
+        if self._thread is not None:
+            self._queue.put(_STOP)
+            self._thread.join()
+            self._thread = None
+
+
+class SQLitePool:
+    """Bounded pool of read connections plus the database's single writer"""
+
+    def __init__(self, database: str, size: int = DB_POOL_SIZE, timeout: float = DB_POOL_TIMEOUT):
+        self.database = database
+        self.size = size
+        self.timeout = timeout
+        self._idle: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self.pool_wait = TimingStat()
+        self.query_time = TimingStat()
+        self.errors = 0
+        self.writer = SQLiteWriter(database)
+
+    def connect(self) -> sqlite3.Connection:
+        """Open a new read-only connection configured for use from pool threads"""
+        conn = sqlite3.connect(self.database, timeout=self.timeout, check_same_thread=False,
+                               factory=ProfiledConnection)
+        conn.row_factory = sqlite3.Row
+        configure_connection(conn, query_only=True)
+        return conn
+
+    def _acquire(self) -> sqlite3.Connection:
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            can_create = self._created < self.size
+            if can_create:
+                self._created += 1
+        if can_create:
+            try:
+                return self.connect()
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                raise
+
+        try:
+            return self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            raise PoolTimeout(f"No SQLite connection available after {self.timeout}s")
+
+    def _release(self, conn: sqlite3.Connection, broken: bool = False):
+        if broken:
+            with self._lock:
+                self._created -= 1
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+            return
+        self._idle.put(conn)
+
+    def _run(self, submitted_at: float, fn: Callable, args: tuple):
+        conn = self._acquire()
+        self.pool_wait.observe(time.perf_counter() - submitted_at)
+        started = time.perf_counter()
+        broken = False
+        try:
+            result = fn(conn, *args)
+            conn.commit()
+            return result
+        except BaseException as e:
+            self.errors += 1
+            try:
+                conn.rollback()
+            except sqlite3.Error:
+                broken = True
+            if isinstance(e, sqlite3.ProgrammingError):
+                broken = True
+            raise
+        finally:
+            self.query_time.observe(time.perf_counter() - started)
+            self._release(conn, broken)
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self.size, thread_name_prefix='sqlite-pool')
+        return self._executor
+
+    async def run(self, fn: Callable, *args) -> Any:
+        """Run the read-only fn(conn, *args) on a pooled connection off the event loop"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._get_executor(), self._run, time.perf_counter(), fn, args)
+
+    async def iterate(self, sql: str, params: tuple = (), batch_size: int = 500) -> AsyncIterator[List[Dict[str, Any]]]:
+        """Yield result rows in fetchmany() batches.
+
+        The pooled connection is held until the iterator is exhausted or
+        closed, so memory stays bounded by batch_size whatever the result size.
+        """
+        loop = asyncio.get_running_loop()
+        executor = self._get_executor()
+        submitted_at = time.perf_counter()
+        conn = await loop.run_in_executor(executor, self._acquire)
+        self.pool_wait.observe(time.perf_counter() - submitted_at)
+        started = time.perf_counter()
+        cursor = None
+
+        def _fetch_batch():
+            return [dict(row) for row in cursor.fetchmany(batch_size)]
+
+        try:
+            cursor = await loop.run_in_executor(executor, conn.execute, sql, params)
+            while True:
+                batch = await loop.run_in_executor(executor, _fetch_batch)
+                if not batch:
+                    break
+                yield batch
+        finally:
+            if cursor is not None:
+                cursor.close()
+            self.query_time.observe(time.perf_counter() - started)
+            self._release(conn)
+
+    async def fetchone(self, sql: str, params: tuple = ()) -> Optional[Dict[str, Any]]:
+        def _fetchone(conn):
+            row = conn.execute(sql, params).fetchone()
+            return dict(row) if row else None
+        return await self.run(_fetchone)
+
+    async def fetchall(self, sql: str, params: tuple = ()) -> List[Dict[str, Any]]:
+        def _fetchall(conn):
+            return [dict(row) for row in conn.execute(sql, params).fetchall()]
+        return await self.run(_fetchall)
+
+    async def scalar(self, sql: str, params: tuple = ()) -> Any:
+        def _scalar(conn):
+            row = conn.execute(sql, params).fetchone()
+            return row[0] if row else None
+        return await self.run(_scalar)
+
+    async def write(self, fn: Callable, *args) -> Any:
+        """Run fn(conn, *args) through the serialized group-commit writer"""
+        return await asyncio.wrap_future(self.writer.submit(fn, *args))
+
+    def write_sync(self, fn: Callable, *args) -> Any:
+        """Blocking variant of write() for synchronous callers (never from the event loop)"""
+        return self.writer.submit(fn, *args).result()
+
+    async def execute(self, sql: str, params: tuple = ()) -> ExecuteResult:
+        def _execute(conn):
+            cursor = conn.execute(sql, params)
+            return ExecuteResult(cursor.lastrowid, cursor.rowcount)
+        return await self.write(_execute)
+
+    async def executemany(self, sql: str, seq_of_params) -> int:
+        def _executemany(conn):
+            return conn.executemany(sql, seq_of_params).rowcount
+        return await self.write(_executemany)
+
+    def metrics(self) -> Dict[str, Any]:
+        """Pool occupancy plus pool-wait and query-time statistics"""
+        return {
+            "database": self.database,
+            "pool_size": self.size,
+            "connections_open": self._created,
+            "connections_idle": self._idle.qsize(),
+            "errors": self.errors,
+            "pool_wait": self.pool_wait.snapshot(),
+            "query_time": self.query_time.snapshot(),
+            "writer": self.writer.metrics()
+        }
+
+    def close(self):
+        """Close idle connections, stop the executor and flush the writer.
+
+        The pool stays usable: the executor and writer restart on demand.
+        """
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+        self.writer.close()
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            conn.close()
+            with self._lock:
+                self._created -= 1
+
+
+# Pools partagés par chemin de base de données
+_pools: Dict[str, SQLitePool] = {}
+_pools_lock = threading.Lock()
+
+def get_db_pool(database: str) -> SQLitePool:
+    """Get the shared pool for a database path"""
+    with _pools_lock:
+        pool = _pools.get(database)
+        if pool is None:
+            pool = SQLitePool(database)
+            _pools[database] = pool
+            logger.info("SQLite pool created for %s (size=%s)", database, pool.size)
+        return pool
+
+def close_db_pools():
+    """Close every shared pool (application shutdown)"""
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.close()
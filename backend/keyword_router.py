@@ -0,0 +1,54 @@
+"""
+SIPORTS v2.0 - Keyword Router
+Routage par mots-clés des chatbots en une seule passe : les tables de
+mots-clés (catégorie -> mots) sont fusionnées au démarrage, chaque mot
+distinct n'est cherché qu'une fois dans le message et le résultat donne
+toutes les catégories touchées.
+"""
+
+from collections import Counter
+from functools import lru_cache
+from types import MappingProxyType
+from typing import Dict, Iterable, List, Mapping, Tuple
+
+# Résultats mémorisés par ensemble de mots-clés trouvés (peu de combinaisons en pratique)
+RESULT_CACHE_SIZE = 4096
+
+
+class KeywordRouter:
+    """One pass over the distinct keywords of several tables.
+
+    scan() behaves like running `any(word in text for word in table)` for
+    every table, but counts instead of stopping: the result maps each
+    category to the number of distinct keywords of that table found in the
+    text (substring semantics). Each keyword is tested once with a plain
+    `in`, whatever the number of tables sharing it; on tables of a few
+    dozen words this beats a compiled regex, which pays per character.
+    Results are memoized per set of matched keywords and returned as
+    read-only mappings (missing category -> 0).
+    """
+
+    def __init__(self, tables: Dict[str, Iterable[str]]):
+        self.tables: Dict[str, Tuple[str, ...]] = {category: tuple(words) for category, words in tables.items()}
+        owners: Dict[str, List[str]] = {}
+        for category, words in self.tables.items():
+            for word in words:
+                categories = owners.setdefault(word, [])
+                if word and category not in categories:
+                    categories.append(category)
+        owners.pop('', None)
+        self.words: Tuple[str, ...] = tuple(owners)
+        self._owners: Dict[str, Tuple[str, ...]] = {word: tuple(categories) for word, categories in owners.items()}
+        self._results = lru_cache(maxsize=RESULT_CACHE_SIZE)(self._count)
+
+    def _count(self, matched: Tuple[str, ...]) -> Mapping[str, int]:
+        # Toutes les catégories présentes (0 compris) : la lecture ne passe pas par __missing__
+        counts = Counter(dict.fromkeys(self.tables, 0))
+        for word in matched:
+            for category in self._owners[word]:
+                counts[category] += 1
+        return MappingProxyType(counts)
+
+    def scan(self, text: str) -> Mapping[str, int]:
+        """Category -> distinct keywords found; text is matched as given (lowercase it first)"""
+        return self._results(tuple([word for word in self.words if word in text]))
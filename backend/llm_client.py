@@ -0,0 +1,206 @@
+"""
+SIPORTS v2.0 - Ollama Client
+Client asynchrone partagé pour les générations du chatbot : un seul
+ollama.AsyncClient (connexions httpx réutilisées), un timeout par appel et
+un sémaphore global sur les générations en cours, pour que le serveur
+Ollama ne soit jamais noyé et que la boucle d'événements reste libre.
+Une génération est annulée si le client HTTP se déconnecte.
+"""
+
+import asyncio
+import os
+import time
+from typing import Any, AsyncIterator, Awaitable, Dict, List, Optional, TypeVar
+
+# Hôte Ollama (None : variable OLLAMA_HOST lue par la librairie, sinon localhost:11434)
+OLLAMA_HOST = os.environ.get('OLLAMA_HOST') or None
+# Durée maximale d'une génération, attente de place comprise
+OLLAMA_TIMEOUT = float(os.environ.get('OLLAMA_TIMEOUT', 60))
+OLLAMA_CONNECT_TIMEOUT = float(os.environ.get('OLLAMA_CONNECT_TIMEOUT', 5))
+# Générations simultanées envoyées à Ollama (par worker)
+OLLAMA_MAX_CONCURRENCY = int(os.environ.get('OLLAMA_MAX_CONCURRENCY', 4))
+# Attente maximale d'une place avant de renoncer (LLMBusy)
+OLLAMA_QUEUE_TIMEOUT = float(os.environ.get('OLLAMA_QUEUE_TIMEOUT', 10))
+
+T = TypeVar('T')
+
+
+class LLMBusy(Exception):
+    """No generation slot freed up within OLLAMA_QUEUE_TIMEOUT"""
+
+
+class ClientDisconnected(Exception):
+    """The HTTP client went away before the generation finished"""
+
+
+class OllamaClient:
+    """Shared AsyncClient with per-call timeout and a cap on in-flight generations"""
+
+    def __init__(self, host: Optional[str] = OLLAMA_HOST, timeout: float = OLLAMA_TIMEOUT,
+                 max_concurrency: int = OLLAMA_MAX_CONCURRENCY, queue_timeout: float = OLLAMA_QUEUE_TIMEOUT):
+        self.host = host
+        self.timeout = timeout
+        self.max_concurrency = max_concurrency
+        self.queue_timeout = queue_timeout
+        self._client = None
+        self._transport = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self.in_flight = 0
+        self.waiting = 0
+        self.requests = 0
+        self.timeouts = 0
+        self.rejected = 0
+        self.cancelled = 0
+        self.errors = 0
+        self.generation_seconds = 0.0
+
+    def _get_client(self):
+        if self._client is None:
+            # Import différé : ollama / httpx ne sont chargés qu'au premier appel
+            import httpx
+            import ollama
+            # Transport (pool de connexions) créé ici et passé à httpx via ollama :
+            # close() ferme ce que ce client possède, sans attribut privé d'ollama
+            self._transport = httpx.AsyncHTTPTransport(
+                limits=httpx.Limits(max_connections=self.max_concurrency,
+                                    max_keepalive_connections=self.max_concurrency),
+            )
+            self._client = ollama.AsyncClient(
+                host=self.host,
+                timeout=httpx.Timeout(self.timeout, connect=OLLAMA_CONNECT_TIMEOUT),
+                transport=self._transport,
+            )
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._client
+
+    async def _acquire(self) -> asyncio.Semaphore:
+        """Slot of the current client; the caller releases the semaphore returned here"""
+        # Référence locale : close() puis un nouveau client ne changent pas la place à rendre
+        semaphore = self._semaphore
+        self.waiting += 1
+        try:
+            # asyncio.timeout plutôt que wait_for : pas de tâche intermédiaire qui
+            # pourrait encore prendre une place après une annulation
+            async with asyncio.timeout(self.queue_timeout):
+                await semaphore.acquire()
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise LLMBusy(f"{self.max_concurrency} generations already running") from None
+        finally:
+            self.waiting -= 1
+        return semaphore
+
+    async def chat(self, model: str, messages: List[Dict[str, str]],
+                   options: Optional[Dict[str, Any]] = None) -> str:
+        """Full reply of one chat generation; raises LLMBusy or asyncio.TimeoutError"""
+        client = self._get_client()
+        started = time.perf_counter()
+        semaphore = await self._acquire()
+        self.requests += 1
+        self.in_flight += 1
+        try:
+            async with asyncio.timeout(max(0.0, self.timeout - (time.perf_counter() - started))):
+                response = await client.chat(model=model, messages=messages, options=options)
+            return response['message']['content']
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            raise
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        except Exception:
+            self.errors += 1
+            raise
+        finally:
+            self.in_flight -= 1
+            semaphore.release()
+            self.generation_seconds += time.perf_counter() - started
+
+    async def stream_chat(self, model: str, messages: List[Dict[str, str]],
+                          options: Optional[Dict[str, Any]] = None) -> AsyncIterator[str]:
+        """Reply chunks as Ollama produces them; same slot, timeout and counters as chat()"""
+        client = self._get_client()
+        started = time.perf_counter()
+        semaphore = await self._acquire()
+        self.requests += 1
+        self.in_flight += 1
+        stream = None
+        try:
+            deadline = asyncio.get_running_loop().time() + self.timeout - (time.perf_counter() - started)
+            stream = await client.chat(model=model, messages=messages, options=options, stream=True)
+            while True:
+                # Délai appliqué aux attentes seulement, jamais pendant un yield
+                try:
+                    async with asyncio.timeout_at(deadline):
+                        part = await stream.__anext__()
+                except StopAsyncIteration:
+                    return
+                if part['message']['content']:
+                    yield part['message']['content']
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            raise
+        except (asyncio.CancelledError, GeneratorExit):
+            # Client parti : la fermeture du flux coupe la connexion vers Ollama
+            self.cancelled += 1
+            raise
+        except Exception:
+            self.errors += 1
+            raise
+        finally:
+            if stream is not None:
+                await stream.aclose()
+            self.in_flight -= 1
+            semaphore.release()
+            self.generation_seconds += time.perf_counter() - started
+
+    async def close(self):
+        if self._client is not None:
+            # ollama 0.5 n'expose pas de close() : on ferme notre transport httpx.
+            # Le sémaphore reste : les appels en cours rendent la place qu'ils ont prise
+            await self._transport.aclose()
+            self._client = None
+            self._transport = None
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "max_concurrency": self.max_concurrency,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "requests": self.requests,
+            "timeouts": self.timeouts,
+            "rejected": self.rejected,
+            "cancelled": self.cancelled,
+            "errors": self.errors,
+            "generation_seconds": round(self.generation_seconds, 3),
+        }
+
+
+async def cancel_on_disconnect(http_request, awaitable: Awaitable[T]) -> T:
+    """Run awaitable, cancelling it if the client disconnects first.
+
+    The request body has already been read by FastAPI, so the next ASGI
+    receive() only returns once the client goes away (http.disconnect).
+    """
+    task = asyncio.ensure_future(awaitable)
+
+    async def wait_disconnect():
+        while (await http_request.receive())['type'] != 'http.disconnect':
+            pass
+
+    watcher = asyncio.ensure_future(wait_disconnect())
+    try:
+        await asyncio.wait({task, watcher}, return_when=asyncio.FIRST_COMPLETED)
+    except asyncio.CancelledError:
+        task.cancel()
+        raise
+    finally:
+        watcher.cancel()
+    if not task.done():
+        task.cancel()
+        raise ClientDisconnected()
+    return task.result()
+
+
+# Instance globale
+ollama_client = OllamaClient()
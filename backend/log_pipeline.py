@@ -0,0 +1,240 @@
+"""
+SIPORTS v2.0 - Logging Pipeline
+Les handlers du module logging écrivent de façon synchrone dans le thread
+appelant : sous charge, chaque ligne de log coûte de la latence à la requête.
+Ici le chemin de la requête se contente de filtrer (échantillonnage par
+logger, plafond de débit) et de déposer le LogRecord dans une file bornée ;
+le formatage JSON et l'écriture se font dans le thread d'un QueueListener.
+Si la file est pleine, l'enregistrement est abandonné plutôt que d'attendre.
+"""
+
+import atexit
+import datetime
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+import time
+from typing import Any, Dict, Optional
+
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO').upper()
+# json | text
+LOG_FORMAT = os.environ.get('LOG_FORMAT', 'json').lower()
+LOG_QUEUE_SIZE = int(os.environ.get('LOG_QUEUE_SIZE', 10000))
+# Enregistrements par seconde au-delà desquels on abandonne (0 = pas de plafond)
+LOG_MAX_PER_SECOND = float(os.environ.get('LOG_MAX_PER_SECOND', 2000))
+# logger=taux : on garde 1 message sur round(1/taux) sous le niveau WARNING
+LOG_SAMPLING = os.environ.get('LOG_SAMPLING', 'siports.chat=0.1,sqlalchemy.engine=0.01')
+# Réactive l'écho SQL de SQLAlchemy (échantillonné via LOG_SAMPLING)
+LOG_SQL_ECHO = os.environ.get('LOG_SQL_ECHO', 'false').lower() == 'true'
+
+TEXT_FORMAT = '%(asctime)s %(levelname)s %(name)s: %(message)s'
+UVICORN_LOGGERS = ('uvicorn', 'uvicorn.error', 'uvicorn.access')
+
+# Attributs standard d'un LogRecord : tout le reste vient de extra={...}
+_RECORD_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime', 'taskName'}
+
+
+def parse_sampling(spec: str) -> Dict[str, float]:
+    """'siports.chat=0.1,sqlalchemy.engine=0.01' -> {logger: rate}"""
+    rates = {}
+    for item in spec.split(','):
+        name, _, rate = item.strip().partition('=')
+        if not name or not rate:
+            continue
+        try:
+            rates[name.strip()] = min(1.0, max(0.0, float(rate)))
+        except ValueError:
+            continue
+    return rates
+
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per line: ts, level, logger, message and any extra fields"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry: Dict[str, Any] = {
+            'ts': datetime.datetime.fromtimestamp(record.created, datetime.timezone.utc)
+                  .isoformat(timespec='milliseconds').replace('+00:00', 'Z'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS and not key.startswith('_'):
+                entry[key] = value
+        if record.exc_info:
+            entry['exc_info'] = self.formatException(record.exc_info)
+        if record.stack_info:
+            entry['stack_info'] = self.formatStack(record.stack_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """Keeps 1 record in round(1/rate) below WARNING for the configured logger subtrees"""
+
+    def __init__(self, rates: Dict[str, float]):
+        super().__init__()
+        self.rates = rates
+        self._every: Dict[str, int] = {}
+        self._counters: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.sampled_out = 0
+
+    def _rate_for(self, name: str) -> int:
+        every = self._every.get(name)
+        if every is None:
+            # Le taux le plus spécifique de la hiérarchie (a.b.c, a.b, a)
+            every = 1
+            candidate = name
+            while candidate:
+                if candidate in self.rates:
+                    rate = self.rates[candidate]
+                    every = 0 if rate <= 0 else max(1, round(1 / rate))
+                    break
+                candidate = candidate.rpartition('.')[0]
+            self._every[name] = every
+        return every
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING or not self.rates:
+            return True
+        every = self._rate_for(record.name)
+        if every == 1:
+            return True
+        with self._lock:
+            if every == 0:
+                self.sampled_out += 1
+                return False
+            count = self._counters.get(record.name, 0)
+            self._counters[record.name] = count + 1
+            if count % every:
+                self.sampled_out += 1
+                return False
+        record.sampled = every
+        return True
+
+
+class RateLimitFilter(logging.Filter):
+    """Token bucket over all records; the next record that passes carries the drop count"""
+
+    def __init__(self, per_second: float):
+        super().__init__()
+        self.per_second = per_second
+        self.tokens = per_second
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+        self._pending_drops = 0
+        self.dropped = 0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if self.per_second <= 0:
+            return True
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.per_second, self.tokens + (now - self.updated) * self.per_second)
+            self.updated = now
+            if self.tokens < 1:
+                self._pending_drops += 1
+                self.dropped += 1
+                return False
+            self.tokens -= 1
+            if self._pending_drops:
+                record.dropped = self._pending_drops
+                self._pending_drops = 0
+        return True
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that never blocks and leaves formatting to the listener thread"""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Le record part tel quel : getMessage() et json.dumps se font côté listener
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class LogPipeline:
+    """Root logger -> filters -> bounded queue -> QueueListener -> stdout"""
+
+    def __init__(self):
+        self.handler: Optional[NonBlockingQueueHandler] = None
+        self.listener: Optional[logging.handlers.QueueListener] = None
+        self.sampling: Optional[SamplingFilter] = None
+        self.rate_limit: Optional[RateLimitFilter] = None
+        self._lock = threading.Lock()
+
+    def configure(self, level: str = LOG_LEVEL, fmt: str = LOG_FORMAT, stream=None, force: bool = False):
+        """Install the pipeline on the root logger; like basicConfig, a no-op if root already has handlers"""
+        with self._lock:
+            root = logging.getLogger()
+            if self.listener is not None and not force:
+                return
+            if root.handlers and not force:
+                return
+            self.stop()
+            for handler in list(root.handlers):
+                root.removeHandler(handler)
+
+            output = logging.StreamHandler(stream or sys.stdout)
+            output.setFormatter(JSONFormatter() if fmt == 'json' else logging.Formatter(TEXT_FORMAT))
+
+            self.sampling = SamplingFilter(parse_sampling(LOG_SAMPLING))
+            self.rate_limit = RateLimitFilter(LOG_MAX_PER_SECOND)
+            self.handler = NonBlockingQueueHandler(queue.Queue(LOG_QUEUE_SIZE))
+            # Échantillonnage d'abord : les messages écartés ne consomment pas de jetons
+            self.handler.addFilter(self.sampling)
+            self.handler.addFilter(self.rate_limit)
+            root.addHandler(self.handler)
+            root.setLevel(level)
+
+            # Les handlers synchrones d'uvicorn passent aussi par la file
+            for name in UVICORN_LOGGERS:
+                uvicorn_logger = logging.getLogger(name)
+                uvicorn_logger.handlers.clear()
+                uvicorn_logger.propagate = True
+            if LOG_SQL_ECHO:
+                logging.getLogger('sqlalchemy.engine').setLevel(logging.INFO)
+
+            self.listener = logging.handlers.QueueListener(self.handler.queue, output, respect_handler_level=True)
+            self.listener.start()
+        atexit.register(self.stop)
+
+    def stop(self):
+        """Flush the queue and stop the listener thread"""
+        if self.listener is not None:
+            self.listener.stop()
+            self.listener = None
+
+    def metrics(self) -> Dict[str, Any]:
+        if self.handler is None:
+            return {"enabled": False}
+        return {
+            "enabled": self.listener is not None,
+            "queue_depth": self.handler.queue.qsize(),
+            "queue_size": LOG_QUEUE_SIZE,
+            "max_per_second": LOG_MAX_PER_SECOND,
+            "dropped_queue_full": self.handler.dropped,
+            "dropped_rate_limited": self.rate_limit.dropped,
+            "sampled_out": self.sampling.sampled_out,
+        }
+
+
+# Instance globale
+log_pipeline = LogPipeline()
+
+
+def configure_logging(**kwargs):
+    log_pipeline.configure(**kwargs)
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+SIPORTS v2.0 - Administration CLI
+Commandes de maintenance de la base de production.
+
+Usage:
+    python manage.py migrate [--component core] [--database PATH]
+    python manage.py repair-counters [--database PATH]
+    python manage.py import-users FILE [--format csv|ndjson] [--status pending] [--database PATH]
+"""
+
+import argparse
+import asyncio
+import os
+import sqlite3
+import sys
+
+from log_pipeline import configure_logging
+from migrations import current_version, run_migrations, MIGRATIONS
+from repositories import create_repositories, is_postgres_url, sqlite_database
+from user_counters import rebuild_user_counters, read_dashboard_counters
+from user_import import IMPORT_BATCH_SIZE, IMPORT_FORMATS, import_users
+
+DATABASE_URL = os.environ.get('DATABASE_URL', 'instance/siports_production.db')
+
+
+def connect(database: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(database)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def sqlite_only(args) -> bool:
+    """False (with an error) when --database is not a SQLite file"""
+    if is_postgres_url(args.database):
+        # Ne pas retomber en silence sur le fichier SQLite local : le résultat serait trompeur
+        print(f"{args.command} only works on a SQLite database; pass --database PATH "
+              "(the PostgreSQL schema and counters are maintained by the server at startup)", file=sys.stderr)
+        return False
+    return True
+
+
+def cmd_migrate(args) -> int:
+    if not sqlite_only(args):
+        return 2
+    conn = connect(args.database)
+    applied = run_migrations(conn, args.component)
+    print(f"{args.component}: version {current_version(conn, args.component)} ({len(applied)} applied)")
+    conn.close()
+    return 0
+
+
+def cmd_repair_counters(args) -> int:
+    if not sqlite_only(args):
+        return 2
+    conn = connect(args.database)
+    with conn:
+        rebuild_user_counters(conn)
+    counters = read_dashboard_counters(conn)
+    print(", ".join(f"{key}={value}" for key, value in counters.items()))
+    conn.close()
+    return 0
+
+
+async def _read_chunks(stream, size: int = 64 * 1024):
+    while True:
+        chunk = stream.read(size)
+        if not chunk:
+            return
+        yield chunk
+
+
+async def _import_file(args, stream) -> dict:
+    from db_pool import get_db_pool, close_db_pools
+    from password_hashing import password_hasher
+    repos = create_repositories(args.database, get_db_pool(sqlite_database(args.database)))
+    try:
+        await repos.init()
+        return await import_users(
+            _read_chunks(stream), args.format, repos.users, password_hasher,
+            default_status=args.status, batch_size=args.batch_size
+        )
+    finally:
+        await repos.close()
+        close_db_pools()
+        password_hasher.close()
+
+
+def cmd_import_users(args) -> int:
+    if args.format is None:
+        extension = os.path.splitext(args.file)[1].lower()
+        args.format = 'csv' if extension == '.csv' else 'ndjson' if extension in ('.ndjson', '.jsonl') else None
+    if args.format is None:
+        print("Cannot guess the format, use --format csv|ndjson", file=sys.stderr)
+        return 2
+
+    if args.file == '-':
+        report = asyncio.run(_import_file(args, sys.stdin.buffer))
+    else:
+        with open(args.file, 'rb') as stream:
+            report = asyncio.run(_import_file(args, stream))
+
+    for error in report['errors']:
+        print(f"line {error['line']}: {error['email'] or '-'}: {error['error']}", file=sys.stderr)
+    if report['errors_truncated']:
+        print(f"... {report['failed'] - len(report['errors'])} more errors", file=sys.stderr)
+    print(f"{report['rows']} rows: {report['created']} created, {report['updated']} updated, "
+          f"{report['failed']} failed in {report['elapsed_ms'] / 1000:.1f}s")
+    return 1 if report['failed'] else 0
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="SIPORTS v2.0 administration")
+    parser.add_argument('--database', default=DATABASE_URL, help="SQLite database path (postgresql:// URL accepted by import-users only)")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    migrate = subparsers.add_parser('migrate', help="Apply pending schema migrations")
+    migrate.add_argument('--component', choices=list(MIGRATIONS), default='core')
+    migrate.set_defaults(handler=cmd_migrate)
+
+    repair = subparsers.add_parser('repair-counters', help="Rebuild the admin dashboard counters from users")
+    repair.set_defaults(handler=cmd_repair_counters)
+
+    importer = subparsers.add_parser('import-users', help="Stream-import users from a CSV or NDJSON file")
+    importer.add_argument('file', help="CSV / NDJSON file, or - for stdin")
+    importer.add_argument('--format', choices=IMPORT_FORMATS, help="Default: guessed from the file extension")
+    importer.add_argument('--status', choices=['pending', 'validated'], default='pending',
+                          help="Status of created users without a status column")
+    importer.add_argument('--batch-size', type=int, default=IMPORT_BATCH_SIZE)
+    importer.set_defaults(handler=cmd_import_users)
+
+    args = parser.parse_args(argv)
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    configure_logging(fmt='text')
+    sys.exit(main())
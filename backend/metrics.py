@@ -0,0 +1,242 @@
+"""
+SIPORTS v2.0 - HTTP Metrics
+Middleware ASGI qui mesure par route le nombre de requêtes, les codes de
+statut et un histogramme de latence, plus les requêtes en cours et le retard
+de la boucle asyncio. Tout est exposé au format texte Prometheus sur /metrics.
+
+Chemin critique : la route est retrouvée via scope["endpoint"] dans une table
+pré-construite (endpoint -> méthode -> RouteStats), sans construire de
+labels ni de dictionnaires par requête.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from bisect import bisect_left
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+LOOP_LAG_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+LOOP_LAG_INTERVAL = float(os.environ.get('METRICS_LOOP_LAG_INTERVAL', 0.5))
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+UNMATCHED_ROUTE = '<unmatched>'
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_value(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Histogram:
+    """Fixed-bucket histogram; counts are per bucket and cumulated on render"""
+
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def render(self, name: str, labels: str) -> List[str]:
+        lines = []
+        cumulative = 0
+        prefix = f'{name}_bucket{{{labels},' if labels else f'{name}_bucket{{'
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            lines.append(f'{prefix}le="{bound}"}} {cumulative}')
+        lines.append(f'{prefix}le="+Inf"}} {self.count}')
+        suffix = f'{{{labels}}}' if labels else ''
+        lines.append(f'{name}_sum{suffix} {self.sum!r}')
+        lines.append(f'{name}_count{suffix} {self.count}')
+        return lines
+
+
+class RouteStats:
+    """Pre-bound label set and counters for one (method, route)"""
+
+    __slots__ = ('labels', 'latency', 'statuses')
+
+    def __init__(self, method: str, route: str):
+        self.labels = f'method="{method}",route="{_escape(route)}"'
+        self.latency = Histogram()
+        self.statuses: Dict[int, int] = {}
+
+    def record(self, status: int, duration: float):
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+        self.latency.observe(duration)
+
+
+class HTTPMetrics:
+    """Registry behind the middleware and the /metrics endpoint"""
+
+    def __init__(self):
+        self.in_flight = 0
+        self.loop_lag = Histogram(LOOP_LAG_BUCKETS)
+        self.loop_lag_last = 0.0
+        self._routes: Dict[Any, Dict[str, RouteStats]] = {}
+        self._unmatched: Dict[str, RouteStats] = {}
+        self._bound = False
+        self._sources: List[Tuple[str, Callable[[], Dict[str, Any]]]] = []
+        self._lag_task: Optional[asyncio.Task] = None
+
+    def bind(self, app):
+        """Pre-build one RouteStats per (endpoint, method) from the app routes"""
+        for route in getattr(app, 'routes', []):
+            endpoint = getattr(route, 'endpoint', None)
+            path = getattr(route, 'path', None)
+            if endpoint is None or path is None:
+                continue
+            by_method = self._routes.setdefault(endpoint, {})
+            for method in getattr(route, 'methods', None) or ('GET',):
+                by_method.setdefault(method, RouteStats(method, path))
+        self._bound = True
+
+    def stats_for(self, scope) -> RouteStats:
+        endpoint = scope.get('endpoint')
+        method = scope['method']
+        if endpoint is None:
+            stats = self._unmatched.get(method)
+            if stats is None:
+                stats = self._unmatched[method] = RouteStats(method, UNMATCHED_ROUTE)
+            return stats
+        by_method = self._routes.get(endpoint)
+        if by_method is None and not self._bound:
+            self.bind(scope['app'])
+            by_method = self._routes.get(endpoint)
+        if by_method is None:
+            by_method = self._routes[endpoint] = {}
+        stats = by_method.get(method)
+        if stats is None:
+            # Méthode non déclarée (HEAD, 405...) : lié une seule fois
+            route = scope.get('route')
+            path = getattr(route, 'path', None) or getattr(endpoint, '__name__', UNMATCHED_ROUTE)
+            stats = by_method[method] = RouteStats(method, path)
+        return stats
+
+    def add_source(self, prefix: str, snapshot: Callable[[], Dict[str, Any]]):
+        """Expose the numeric fields of a metrics() dict as gauges named prefix_field"""
+        self._sources.append((prefix, snapshot))
+
+    async def _watch_loop_lag(self, interval: float):
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + interval
+            await asyncio.sleep(interval)
+            lag = max(0.0, loop.time() - expected)
+            self.loop_lag_last = lag
+            self.loop_lag.observe(lag)
+
+    def start_loop_monitor(self, interval: float = LOOP_LAG_INTERVAL):
+        if self._lag_task is None or self._lag_task.done():
+            self._lag_task = asyncio.create_task(self._watch_loop_lag(interval))
+
+    def stop_loop_monitor(self):
+        if self._lag_task is not None:
+            self._lag_task.cancel()
+            self._lag_task = None
+
+    def render(self) -> str:
+        """Prometheus text exposition format"""
+        routes = [stats for by_method in self._routes.values() for stats in by_method.values()]
+        routes += list(self._unmatched.values())
+
+        lines = [
+            '# HELP siports_http_requests_total HTTP requests by route, method and status',
+            '# TYPE siports_http_requests_total counter',
+        ]
+        for stats in routes:
+            for status, count in sorted(stats.statuses.items()):
+                lines.append(f'siports_http_requests_total{{{stats.labels},status="{status}"}} {count}')
+
+        lines += [
+            '# HELP siports_http_request_duration_seconds HTTP request latency by route and method',
+            '# TYPE siports_http_request_duration_seconds histogram',
+        ]
+        for stats in routes:
+            if stats.latency.count:
+                lines += stats.latency.render('siports_http_request_duration_seconds', stats.labels)
+
+        lines += [
+            '# HELP siports_http_requests_in_flight HTTP requests being processed',
+            '# TYPE siports_http_requests_in_flight gauge',
+            f'siports_http_requests_in_flight {self.in_flight}',
+            '# HELP siports_event_loop_lag_seconds Delay of the last event-loop wake-up',
+            '# TYPE siports_event_loop_lag_seconds gauge',
+            f'siports_event_loop_lag_seconds {self.loop_lag_last!r}',
+            '# HELP siports_event_loop_lag_distribution_seconds Event-loop wake-up delays',
+            '# TYPE siports_event_loop_lag_distribution_seconds histogram',
+        ]
+        lines += self.loop_lag.render('siports_event_loop_lag_distribution_seconds', '')
+
+        for prefix, snapshot in self._sources:
+            try:
+                lines += _flatten_gauges(prefix, snapshot())
+            except Exception as e:
+                logger.warning("Metrics source %s failed: %s", prefix, e)
+        return '\n'.join(lines) + '\n'
+
+
+def _flatten_gauges(prefix: str, values: Dict[str, Any]) -> List[str]:
+    lines = []
+    for key, value in values.items():
+        name = f'{prefix}_{key}'
+        if isinstance(value, dict):
+            lines += _flatten_gauges(name, value)
+        elif isinstance(value, (bool, int, float)):
+            lines.append(f'# TYPE {name} gauge')
+            lines.append(f'{name} {_format_value(int(value) if isinstance(value, bool) else value)}')
+    return lines
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware recording per-route counts, statuses and latency"""
+
+    def __init__(self, app, metrics: Optional[HTTPMetrics] = None):
+        self.app = app
+        self.metrics = metrics or http_metrics
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        metrics = self.metrics
+        metrics.in_flight += 1
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            metrics.in_flight -= 1
+            metrics.stats_for(scope).record(status, time.perf_counter() - started)
+
+
+def metrics_authorized(authorization: Optional[str]) -> bool:
+    """/metrics is open unless METRICS_TOKEN is set"""
+    return METRICS_TOKEN is None or authorization == f'Bearer {METRICS_TOKEN}'
+
+
+# Registre global des métriques HTTP
+http_metrics = HTTPMetrics()
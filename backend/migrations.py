@@ -0,0 +1,144 @@
+"""
+SIPORTS v2.0 - Schema Migrations
+Migrations versionnées et idempotentes, appliquées au démarrage.
+Chaque composant (core, chatbot) a sa propre séquence de versions car ses
+tables sont créées par des modules différents.
+"""
+
+import logging
+import sqlite3
+from typing import Callable, Dict, List, Tuple, Union
+
+from user_counters import install_user_counters
+from package_catalog import install_package_catalog
+from session_store import install_chat_history
+from rate_limit import install_rate_limit_buckets
+
+logger = logging.getLogger(__name__)
+
+Step = Union[str, Callable[[sqlite3.Connection], None]]
+
+
+def _table_columns(conn: sqlite3.Connection, table: str) -> List[str]:
+    return [row[1] for row in conn.execute(f'PRAGMA table_info({table})').fetchall()]
+
+
+def _users_wordpress_columns(conn: sqlite3.Connection):
+    """Align the users table created by server_production.py with the WordPress schema"""
+    columns = _table_columns(conn, 'users')
+    if 'wp_user_id' not in columns:
+        conn.execute('ALTER TABLE users ADD COLUMN wp_user_id INTEGER')
+    if 'wp_sync_enabled' not in columns:
+        conn.execute('ALTER TABLE users ADD COLUMN wp_sync_enabled BOOLEAN DEFAULT 1')
+    if 'last_wp_sync' not in columns:
+        conn.execute('ALTER TABLE users ADD COLUMN last_wp_sync TIMESTAMP')
+    if 'updated_at' not in columns:
+        # ALTER TABLE n'accepte pas DEFAULT CURRENT_TIMESTAMP
+        conn.execute('ALTER TABLE users ADD COLUMN updated_at TIMESTAMP')
+        conn.execute('UPDATE users SET updated_at = created_at')
+
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS wp_sync_log (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            action TEXT NOT NULL,
+            data TEXT,
+            status TEXT DEFAULT 'pending',
+            error_message TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    ''')
+
+
+# (version, name, steps) par composant, dans l'ordre d'application
+MIGRATIONS: Dict[str, List[Tuple[int, str, List[Step]]]] = {
+    'core': [
+        (1, 'users_wordpress_columns', [_users_wordpress_columns]),
+        (2, 'hot_path_indexes', [
+            # Pending list: WHERE status = ? ORDER BY created_at
+            'CREATE INDEX IF NOT EXISTS idx_users_status_created ON users (status, created_at)',
+            'CREATE INDEX IF NOT EXISTS idx_users_user_type ON users (user_type)',
+            'CREATE INDEX IF NOT EXISTS idx_users_created_at ON users (created_at)',
+            'CREATE INDEX IF NOT EXISTS idx_users_wp_user_id ON users (wp_user_id)',
+            # Sync status: WHERE user_id = ? ORDER BY created_at DESC LIMIT 10
+            'CREATE INDEX IF NOT EXISTS idx_wp_sync_log_user_created ON wp_sync_log (user_id, created_at)',
+        ]),
+        (3, 'user_counters', [install_user_counters]),
+        (4, 'package_catalog', [install_package_catalog]),
+        (5, 'chat_history', [install_chat_history]),
+        (6, 'rate_limit_buckets', [install_rate_limit_buckets]),
+    ],
+    'chatbot': [
+        (1, 'chat_history_index', [
+            # Chat history: WHERE session_id = ? ORDER BY timestamp DESC LIMIT ?
+            'CREATE INDEX IF NOT EXISTS idx_chat_messages_session_timestamp ON chat_messages (session_id, timestamp)',
+        ]),
+    ],
+}
+
+
+def _ensure_migrations_table(conn: sqlite3.Connection):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            component TEXT NOT NULL,
+            version INTEGER NOT NULL,
+            name TEXT NOT NULL,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (component, version)
+        )
+    ''')
+
+
+def current_version(conn: sqlite3.Connection, component: str = 'core') -> int:
+    """Highest migration version applied for a component (0 if none)"""
+    _ensure_migrations_table(conn)
+    row = conn.execute(
+        'SELECT MAX(version) FROM schema_migrations WHERE component = ?',
+        (component,)
+    ).fetchone()
+    return row[0] or 0
+
+
+def run_migrations(conn: sqlite3.Connection, component: str = 'core') -> List[str]:
+    """Apply pending migrations for a component; returns the names applied.
+
+    Each migration runs in its own IMMEDIATE transaction and re-checks the
+    version under the lock, so concurrent workers starting together apply
+    every migration exactly once.
+    """
+    if component not in MIGRATIONS:
+        raise ValueError(f"Unknown migration component: {component}")
+
+    if conn.in_transaction:
+        conn.commit()
+    previous_isolation = conn.isolation_level
+    conn.isolation_level = None
+    applied = []
+    try:
+        _ensure_migrations_table(conn)
+        for version, name, steps in MIGRATIONS[component]:
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                if current_version(conn, component) >= version:
+                    conn.execute('COMMIT')
+                    continue
+                for step in steps:
+                    if callable(step):
+                        step(conn)
+                    else:
+                        conn.execute(step)
+                conn.execute(
+                    'INSERT INTO schema_migrations (component, version, name) VALUES (?, ?, ?)',
+                    (component, version, name)
+                )
+                conn.execute('COMMIT')
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+            applied.append(name)
+            logger.info("Migration %s#%s appliquée: %s", component, version, name)
+    finally:
+        conn.isolation_level = previous_isolation
+    return applied
+
@@ -0,0 +1,81 @@
+"""
+SIPORTS v2.0 - Bulk Moderation
+Validation / rejet d'utilisateurs en masse dans une seule transaction.
+"""
+
+import logging
+import sqlite3
+from typing import Any, Dict, List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+MODERATION_STATUSES = {'validate': 'validated', 'reject': 'rejected'}
+BULK_MODERATION_MAX_IDS = 50000
+
+# SQLite limite le nombre de paramètres liés par requête
+_ID_CHUNK = 500
+
+
+def _existing_statuses(conn: sqlite3.Connection, user_ids: Sequence[int]) -> Dict[int, str]:
+    statuses = {}
+    for start in range(0, len(user_ids), _ID_CHUNK):
+        chunk = user_ids[start:start + _ID_CHUNK]
+        placeholders = ','.join('?' * len(chunk))
+        for row in conn.execute(f'SELECT id, status FROM users WHERE id IN ({placeholders})', chunk):
+            statuses[row[0]] = row[1]
+    return statuses
+
+
+def _filtered_statuses(conn: sqlite3.Connection, filters: Dict[str, Any]) -> Dict[int, str]:
+    clauses = []
+    params = []
+    for column, value in filters.items():
+        if value is not None:
+            clauses.append(f'{column} = ?')
+            params.append(value)
+    sql = 'SELECT id, status FROM users'
+    if clauses:
+        sql += ' WHERE ' + ' AND '.join(clauses)
+    return {row[0]: row[1] for row in conn.execute(sql, params)}
+
+
+def apply_bulk_status(conn: sqlite3.Connection, status: str,
+                      user_ids: Optional[Sequence[int]] = None,
+                      filters: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Set status (and updated_at) for the given ids or for every user matching filters.
+
+    Runs inside the caller's transaction; returns a per-id result list plus
+    summary counts. Filter keys are column names chosen by the caller.
+    """
+    if user_ids is not None:
+        # Dédoublonner en gardant l'ordre de la requête
+        requested = list(dict.fromkeys(user_ids))
+        previous = _existing_statuses(conn, requested)
+    else:
+        previous = _filtered_statuses(conn, filters or {})
+        requested = list(previous)
+
+    conn.executemany(
+        'UPDATE users SET status = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ?',
+        ((status, user_id) for user_id in requested if user_id in previous)
+    )
+    return bulk_result(status, requested, previous)
+
+
+def bulk_result(status: str, requested: Sequence[int], previous: Dict[int, str]) -> Dict[str, Any]:
+    """Per-id results and summary counts, shared by every repository backend"""
+    found = [user_id for user_id in requested if user_id in previous]
+    results: List[Dict[str, Any]] = []
+    for user_id in requested:
+        if user_id in previous:
+            results.append({"user_id": user_id, "result": status, "previous_status": previous[user_id]})
+        else:
+            results.append({"user_id": user_id, "result": "not_found"})
+
+    logger.info("Bulk moderation: %s users set to %s", len(found), status)
+    return {
+        "status": status,
+        "updated": len(found),
+        "not_found": len(requested) - len(found),
+        "results": results
+    }
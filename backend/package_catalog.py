@@ -0,0 +1,369 @@
+"""
+SIPORTS v2.0 - Package Catalogs
+Catalogues visiteurs / partenaires stockés en base, servis depuis des octets
+JSON pré-encodés avec un ETag fort. Un compteur de version maintenu par des
+triggers permet de recharger à chaud après une modification du catalogue.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import time
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from fastapi import Request, Response
+
+logger = logging.getLogger(__name__)
+
+CATALOG_RELOAD_INTERVAL = float(os.environ.get('CATALOG_RELOAD_INTERVAL', 5))
+CATALOG_CACHE_CONTROL = os.environ.get('CATALOG_CACHE_CONTROL', 'public, max-age=60')
+
+CATALOG_TABLES = {
+    'visitor': 'visitor_packages',
+    'partnership': 'partnership_packages',
+}
+
+# Catalogues initiaux (anciennement codés en dur dans les endpoints)
+DEFAULT_VISITOR_PACKAGES = [
+    {
+        "id": 1,
+        "name": "Free Pass",
+        "price": 0,
+        "currency": "€",
+        "description": "Accès gratuit aux espaces d'exposition",
+        "features": [
+            "Accès aux espaces d'exposition",
+            "Conférences publiques",
+            "Application mobile",
+            "Plan du salon"
+        ],
+        "limitations": {
+            "b2b_meetings": 0,
+            "networking": "Limité"
+        }
+    },
+    {
+        "id": 2,
+        "name": "Basic Pass",
+        "price": 150,
+        "currency": "€",
+        "description": "Pass essentiel pour 1 journée",
+        "features": [
+            "Tout du Free Pass",
+            "2 rendez-vous B2B garantis",
+            "Accès aux pauses café",
+            "Badge visiteur personnalisé"
+        ],
+        "limitations": {
+            "b2b_meetings": 2,
+            "networking": "Standard"
+        }
+    },
+    {
+        "id": 3,
+        "name": "Premium Pass",
+        "price": 350,
+        "currency": "€",
+        "description": "Pass complet pour 2 journées",
+        "features": [
+            "Tout du Basic Pass",
+            "5 rendez-vous B2B garantis",
+            "Ateliers techniques spécialisés",
+            "Déjeuners networking",
+            "Accès zone VIP"
+        ],
+        "popular": True,
+        "limitations": {
+            "b2b_meetings": 5,
+            "networking": "Avancé"
+        }
+    },
+    {
+        "id": 4,
+        "name": "VIP Pass",
+        "price": 750,
+        "currency": "€",
+        "description": "Accès privilégié 3 journées complètes",
+        "features": [
+            "Tout du Premium Pass",
+            "Rendez-vous B2B illimités",
+            "Soirée de gala exclusive",
+            "Conférences privées C-Level",
+            "Service de conciergerie",
+            "Transferts inclus"
+        ],
+        "limitations": {
+            "b2b_meetings": "unlimited",
+            "networking": "Premium"
+        }
+    }
+]
+
+DEFAULT_PARTNERSHIP_PACKAGES = [
+    {
+        "id": 1,
+        "name": "Startup Package",
+        "price": 2500,
+        "currency": "$",
+        "description": "Idéal pour les jeunes entreprises maritimes",
+        "features": [
+            "Stand 6m² (2x3m)",
+            "2 badges exposant",
+            "Listing annuaire digital",
+            "Support technique de base"
+        ],
+        "category": "startup"
+    },
+    {
+        "id": 2,
+        "name": "Silver Package",
+        "price": 8000,
+        "currency": "$",
+        "description": "Package standard pour exposants confirmés",
+        "features": [
+            "Stand 12m² (3x4m)",
+            "4 badges exposant",
+            "Mobilier standard inclus",
+            "1 session de networking sponsorisée",
+            "Présence catalogue premium"
+        ],
+        "category": "standard"
+    },
+    {
+        "id": 3,
+        "name": "Gold Package",
+        "price": 15000,
+        "currency": "$",
+        "description": "Package avancé avec visibilité renforcée",
+        "features": [
+            "Stand 20m² (4x5m) - Emplacement premium",
+            "6 badges exposant",
+            "Mobilier sur-mesure",
+            "2 conférences sponsorisées (30min)",
+            "Logo sur supports officiels",
+            "1 cocktail networking privé"
+        ],
+        "popular": True,
+        "category": "premium"
+    },
+    {
+        "id": 4,
+        "name": "Platinum Package",
+        "price": 25000,
+        "currency": "$",
+        "description": "Package prestige - Partenaire officiel",
+        "features": [
+            "Stand 40m² (5x8m) - Hall d'entrée",
+            "10 badges exposant",
+            "Design stand personnalisé",
+            "Keynote session dédiée (45min)",
+            "Mini-site SIPORTS Premium dédié",
+            "Branding événement (logos, panneaux)",
+            "Dîner VIP avec comité d'organisation",
+            "Communiqué de presse co-signé"
+        ],
+        "category": "prestige"
+    }
+]
+
+# partnership_packages reprend le schéma de la base de déploiement
+CATALOG_TABLES_DDL = [
+    '''
+    CREATE TABLE IF NOT EXISTS partnership_packages (
+        id TEXT PRIMARY KEY,
+        name TEXT NOT NULL,
+        price REAL NOT NULL,
+        currency TEXT DEFAULT 'USD',
+        features TEXT, -- JSON string
+        benefits TEXT, -- JSON string
+        visibility_level INTEGER DEFAULT 1,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS visitor_packages (
+        id TEXT PRIMARY KEY,
+        name TEXT NOT NULL,
+        price REAL NOT NULL,
+        currency TEXT DEFAULT '€',
+        description TEXT,
+        features TEXT, -- JSON string
+        limitations TEXT, -- JSON string
+        popular BOOLEAN DEFAULT 0,
+        sort_order INTEGER DEFAULT 0,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS catalog_versions (
+        catalog TEXT PRIMARY KEY,
+        version INTEGER NOT NULL DEFAULT 0
+    )
+    ''',
+]
+
+# Colonnes absentes du schéma de déploiement de partnership_packages
+PARTNERSHIP_EXTRA_COLUMNS = [
+    ('description', 'TEXT'),
+    ('category', 'TEXT'),
+    ('popular', 'BOOLEAN DEFAULT 0'),
+    ('sort_order', 'INTEGER DEFAULT 0'),
+]
+
+
+def _version_triggers(catalog: str, table: str) -> List[str]:
+    return [
+        f'''
+        CREATE TRIGGER IF NOT EXISTS trg_{table}_version_{event.lower()} AFTER {event} ON {table}
+        BEGIN
+            UPDATE catalog_versions SET version = version + 1 WHERE catalog = '{catalog}';
+        END
+        '''
+        for event in ('INSERT', 'UPDATE', 'DELETE')
+    ]
+
+
+def install_package_catalog(conn: sqlite3.Connection):
+    """Create the catalog tables and version triggers, seed empty catalogs"""
+    for ddl in CATALOG_TABLES_DDL:
+        conn.execute(ddl)
+
+    columns = [row[1] for row in conn.execute('PRAGMA table_info(partnership_packages)').fetchall()]
+    for column, definition in PARTNERSHIP_EXTRA_COLUMNS:
+        if column not in columns:
+            conn.execute(f'ALTER TABLE partnership_packages ADD COLUMN {column} {definition}')
+
+    for catalog, table in CATALOG_TABLES.items():
+        conn.execute('INSERT OR IGNORE INTO catalog_versions (catalog, version) VALUES (?, 0)', (catalog,))
+        for ddl in _version_triggers(catalog, table):
+            conn.execute(ddl)
+
+    if not conn.execute('SELECT 1 FROM visitor_packages LIMIT 1').fetchone():
+        conn.executemany('''
+            INSERT INTO visitor_packages (id, name, price, currency, description, features, limitations, popular, sort_order)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', [
+            (p['id'], p['name'], p['price'], p['currency'], p['description'],
+             json.dumps(p['features'], ensure_ascii=False), json.dumps(p['limitations'], ensure_ascii=False),
+             p.get('popular', False), position)
+            for position, p in enumerate(DEFAULT_VISITOR_PACKAGES)
+        ])
+
+    if not conn.execute('SELECT 1 FROM partnership_packages LIMIT 1').fetchone():
+        conn.executemany('''
+            INSERT INTO partnership_packages (id, name, price, currency, description, features, category, popular, sort_order)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', [
+            (p['id'], p['name'], p['price'], p['currency'], p['description'],
+             json.dumps(p['features'], ensure_ascii=False), p['category'],
+             p.get('popular', False), position)
+            for position, p in enumerate(DEFAULT_PARTNERSHIP_PACKAGES)
+        ])
+
+
+def _number(value):
+    return int(value) if isinstance(value, float) and value.is_integer() else value
+
+
+def _package_id(value):
+    return int(value) if isinstance(value, str) and value.isdigit() else value
+
+
+def load_catalog(conn: sqlite3.Connection, catalog: str) -> List[Dict[str, Any]]:
+    """Read one catalog in display order, shaped like the historical API payload"""
+    table = CATALOG_TABLES[catalog]
+    packages = []
+    for row in conn.execute(f'SELECT * FROM {table} ORDER BY sort_order, rowid'):
+        package = {
+            "id": _package_id(row['id']),
+            "name": row['name'],
+            "price": _number(row['price']),
+            "currency": row['currency'],
+            "description": row['description'],
+            "features": json.loads(row['features']) if row['features'] else [],
+        }
+        if row['popular']:
+            package["popular"] = True
+        if catalog == 'visitor':
+            package["limitations"] = json.loads(row['limitations']) if row['limitations'] else {}
+        else:
+            package["category"] = row['category']
+        packages.append(package)
+    return packages
+
+
+class CatalogEntry(NamedTuple):
+    version: int
+    body: bytes
+    etag: str
+
+
+class PackageCatalog:
+    """Encoded catalogs kept in memory, revalidated against catalog_versions.
+
+    The version row is read at most once per CATALOG_RELOAD_INTERVAL; the
+    catalog is only reloaded and re-encoded when that version changed.
+    """
+
+    def __init__(self, db, reload_interval: float = CATALOG_RELOAD_INTERVAL):
+        self.db = db
+        self.reload_interval = reload_interval
+        self._entries: Dict[str, CatalogEntry] = {}
+        self._checked_at: Dict[str, float] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self.reloads = 0
+
+    async def get(self, catalog: str) -> CatalogEntry:
+        entry = self._entries.get(catalog)
+        now = time.monotonic()
+        if entry is not None and now - self._checked_at.get(catalog, 0) < self.reload_interval:
+            return entry
+
+        lock = self._locks.setdefault(catalog, asyncio.Lock())
+        async with lock:
+            entry = self._entries.get(catalog)
+            if entry is not None and time.monotonic() - self._checked_at.get(catalog, 0) < self.reload_interval:
+                return entry
+            version = await self.db.scalar(
+                'SELECT version FROM catalog_versions WHERE catalog = ?', (catalog,)
+            ) or 0
+            if entry is None or entry.version != version:
+                packages = await self.db.run(load_catalog, catalog)
+                body = json.dumps({"packages": packages}, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+                entry = CatalogEntry(version, body, '"' + hashlib.sha256(body).hexdigest()[:32] + '"')
+                self._entries[catalog] = entry
+                self.reloads += 1
+                logger.info("Catalogue %s chargé (version %s, %s forfaits)", catalog, version, len(packages))
+            self._checked_at[catalog] = time.monotonic()
+            return entry
+
+    async def versions(self) -> Tuple[int, ...]:
+        """Current version of every catalog (same revalidation interval as get)"""
+        return tuple([(await self.get(catalog)).version for catalog in CATALOG_TABLES])
+
+    def invalidate(self, catalog: Optional[str] = None):
+        """Force a version check on the next request"""
+        if catalog is None:
+            self._checked_at.clear()
+        else:
+            self._checked_at.pop(catalog, None)
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    if if_none_match.strip() == '*':
+        return True
+    # If-None-Match utilise la comparaison faible (RFC 9110 §13.1.2)
+    candidates = (tag.strip() for tag in if_none_match.split(','))
+    return any(tag[2:] == etag if tag.startswith('W/') else tag == etag for tag in candidates)
+
+
+def catalog_response(request: Request, entry: CatalogEntry) -> Response:
+    """200 with the pre-encoded body, or 304 when If-None-Match matches"""
+    headers = {"ETag": entry.etag, "Cache-Control": CATALOG_CACHE_CONTROL}
+    if_none_match = request.headers.get('if-none-match')
+    if if_none_match and _etag_matches(if_none_match, entry.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=entry.body, media_type="application/json", headers=headers)
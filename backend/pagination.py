@@ -0,0 +1,73 @@
+"""
+SIPORTS v2.0 - Keyset Pagination
+Curseurs opaques sur (created_at, id) pour parcourir de grandes listes
+d'utilisateurs sans OFFSET ni chargement complet en mémoire.
+"""
+
+import base64
+import json
+import os
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+DEFAULT_PAGE_SIZE = int(os.environ.get('ADMIN_PAGE_SIZE', 50))
+MAX_PAGE_SIZE = int(os.environ.get('ADMIN_MAX_PAGE_SIZE', 500))
+STREAM_BATCH_SIZE = int(os.environ.get('ADMIN_STREAM_BATCH_SIZE', 500))
+
+
+def encode_cursor(created_at: str, row_id: int) -> str:
+    """Opaque cursor pointing just after the given (created_at, id)"""
+    raw = json.dumps([created_at, row_id], separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str) -> Tuple[str, int]:
+    """Decode a cursor produced by encode_cursor(); raises ValueError if malformed"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        created_at, row_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except Exception:
+        raise ValueError(f"Invalid cursor: {cursor!r}")
+    if not isinstance(row_id, int):
+        raise ValueError(f"Invalid cursor: {cursor!r}")
+    return created_at, row_id
+
+
+def build_users_query(columns: Sequence[str], filters: Dict[str, Any],
+                      after: Optional[Tuple[str, int]] = None,
+                      limit: Optional[int] = None,
+                      package: Optional[str] = None) -> Tuple[str, List[Any]]:
+    """SELECT over users, newest first, keyed on (created_at, id).
+
+    Columns and filter keys come from code, never from the request; filters
+    whose value is None are skipped. `package` matches either the visitor
+    or the partnership package.
+    """
+    clauses = []
+    params: List[Any] = []
+    for column, value in filters.items():
+        if value is not None:
+            clauses.append(f'{column} = ?')
+            params.append(value)
+    if package is not None:
+        clauses.append('(visitor_package = ? OR partnership_package = ?)')
+        params.extend((package, package))
+    if after is not None:
+        clauses.append('(created_at, id) < (?, ?)')
+        params.extend(after)
+
+    sql = f'SELECT {", ".join(columns)} FROM users'
+    if clauses:
+        sql += ' WHERE ' + ' AND '.join(clauses)
+    sql += ' ORDER BY created_at DESC, id DESC'
+    if limit is not None:
+        sql += ' LIMIT ?'
+        params.append(limit)
+    return sql, params
+
+
+def paginate(rows: List[Dict[str, Any]], limit: int) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """Trim a limit+1 fetch to one page and compute the next cursor"""
+    if len(rows) <= limit:
+        return rows, None
+    page = rows[:limit]
+    return page, encode_cursor(page[-1]['created_at'], page[-1]['id'])
@@ -0,0 +1,148 @@
+"""
+SIPORTS v2.0 - Password Hashing Pool
+Hachage et vérification PBKDF2 (werkzeug) sur un pool de processus borné,
+pour que les rafales de login/inscription ne gèlent pas la boucle asyncio.
+"""
+
+import asyncio
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence
+
+from werkzeug.security import generate_password_hash, check_password_hash
+
+from db_pool import TimingStat
+
+logger = logging.getLogger(__name__)
+
+WEB_CONCURRENCY = int(os.environ.get('WEB_CONCURRENCY', 1))
+# Les cœurs sont partagés entre les workers uvicorn
+HASH_POOL_WORKERS = int(os.environ.get('HASH_POOL_WORKERS', max(1, (os.cpu_count() or 2) // WEB_CONCURRENCY)))
+HASH_QUEUE_LIMIT = int(os.environ.get('HASH_QUEUE_LIMIT', 64))
+# Pause avant de resoumettre les lots refusés par hash_many (croît jusqu'à x10)
+HASH_RETRY_DELAY = float(os.environ.get('HASH_RETRY_DELAY', 0.1))
+
+
+class HashPoolSaturated(Exception):
+    """Too many hashing jobs already queued; the caller should retry later"""
+
+
+def _hash_job(password: str, submitted_at: float):
+    started = time.time()
+    return generate_password_hash(password), started - submitted_at, time.time() - started
+
+
+def _verify_job(password_hash: str, password: str, submitted_at: float):
+    started = time.time()
+    return check_password_hash(password_hash, password), started - submitted_at, time.time() - started
+
+
+def _hash_batch_job(passwords: Sequence[str], submitted_at: float):
+    started = time.time()
+    return [generate_password_hash(p) for p in passwords], started - submitted_at, time.time() - started
+
+
+class PasswordHasher:
+    """Bounded process pool for password hashing with a queue-depth limit"""
+
+    def __init__(self, workers: int = HASH_POOL_WORKERS, queue_limit: int = HASH_QUEUE_LIMIT):
+        self.workers = workers
+        self.queue_limit = queue_limit
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._pending = 0
+        self.rejected = 0
+        self.hash_latency = TimingStat()
+        self.verify_latency = TimingStat()
+        self.queue_wait = TimingStat()
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ProcessPoolExecutor(max_workers=self.workers)
+                    logger.info("Password hashing pool started (%s workers)", self.workers)
+        return self._executor
+
+    async def _submit(self, job, *args, slots: int = 1):
+        with self._lock:
+            if self._pending + slots > self.queue_limit:
+                self.rejected += 1
+                raise HashPoolSaturated(f"{self._pending} hashing jobs pending (limit {self.queue_limit})")
+            self._pending += slots
+        try:
+            loop = asyncio.get_running_loop()
+            result, waited, duration = await loop.run_in_executor(self._get_executor(), job, *args, time.time())
+            self.queue_wait.observe(max(0.0, waited))
+            return result, duration
+        finally:
+            with self._lock:
+                self._pending -= slots
+
+    async def hash(self, password: str) -> str:
+        """generate_password_hash() on the pool"""
+        password_hash, duration = await self._submit(_hash_job, password)
+        self.hash_latency.observe(duration)
+        return password_hash
+
+    async def verify(self, password_hash: str, password: str) -> bool:
+        """check_password_hash() on the pool"""
+        valid, duration = await self._submit(_verify_job, password_hash, password)
+        self.verify_latency.observe(duration)
+        return valid
+
+    async def hash_many(self, passwords: Sequence[str], batch_size: int = 32, retries: int = 0) -> List[str]:
+        """Hash many passwords in parallel batches spread over the pool.
+
+        Batches refused by a saturated pool are resubmitted alone, up to
+        `retries` times with a growing pause: an accepted batch is never
+        hashed twice. HashPoolSaturated is raised only once every accepted
+        batch has finished, so no work is left running behind the caller.
+        """
+        batches = [passwords[i:i + batch_size] for i in range(0, len(passwords), batch_size)]
+        results: List[List[str]] = [[] for _ in batches]
+        waiting = list(range(len(batches)))
+        for attempt in range(retries + 1):
+            if attempt:
+                await asyncio.sleep(HASH_RETRY_DELAY * min(attempt, 10))
+            outcomes = await asyncio.gather(
+                *(self._submit(_hash_batch_job, batches[index]) for index in waiting), return_exceptions=True
+            )
+            refused = []
+            for index, outcome in zip(waiting, outcomes):
+                if isinstance(outcome, HashPoolSaturated):
+                    refused.append(index)
+                elif isinstance(outcome, BaseException):
+                    raise outcome
+                else:
+                    batch_hashes, duration = outcome
+                    self.hash_latency.observe(duration / max(1, len(batch_hashes)))
+                    results[index] = batch_hashes
+            waiting = refused
+            if not waiting:
+                return [password_hash for batch_hashes in results for password_hash in batch_hashes]
+        raise HashPoolSaturated(f"{len(waiting)} of {len(batches)} hashing batches refused after {retries} retries")
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "workers": self.workers,
+            "queue_limit": self.queue_limit,
+            "pending": self._pending,
+            "rejected": self.rejected,
+            "hash_latency": self.hash_latency.snapshot(),
+            "verify_latency": self.verify_latency.snapshot(),
+            "queue_wait": self.queue_wait.snapshot()
+        }
+
+    def close(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+
+# Instance globale du pool de hachage
+password_hasher = PasswordHasher()
@@ -0,0 +1,533 @@
+"""
+SIPORTS v2.0 - PostgreSQL Repositories
+Backend asynchrone (SQLAlchemy + asyncpg) des repositories users,
+wp_sync_log et chat_history. Importé seulement quand DATABASE_URL est une
+URL postgresql:// : SQLAlchemy et asyncpg restent optionnels.
+
+Les horodatages sont relus au format texte de SQLite ('YYYY-MM-DD HH:MM:SS')
+pour que les curseurs de pagination et les réponses JSON ne changent pas
+d'un backend à l'autre.
+"""
+
+import asyncio
+import functools
+import json
+import logging
+import os
+import time
+from contextlib import aclosing, asynccontextmanager
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+from werkzeug.security import generate_password_hash
+
+from db_pool import TimingStat
+from moderation import bulk_result
+from repositories import SYNC_LOG_RECENT, Repositories
+from session_store import SESSION_HISTORY_SIZE, SESSION_IDLE_TTL, MemorySessionStore, shared_session_store
+from startup import SEED_USERS
+from user_import import UPSERT_USER_SQL, plan_upsert
+
+logger = logging.getLogger(__name__)
+
+WEB_CONCURRENCY = int(os.environ.get('WEB_CONCURRENCY', 1))
+# Connexions par worker : le total côté serveur est WEB_CONCURRENCY x (size + overflow)
+PG_POOL_SIZE = int(os.environ.get('PG_POOL_SIZE', max(2, 10 // WEB_CONCURRENCY)))
+PG_MAX_OVERFLOW = int(os.environ.get('PG_MAX_OVERFLOW', PG_POOL_SIZE))
+PG_POOL_TIMEOUT = float(os.environ.get('PG_POOL_TIMEOUT', 10))
+PG_POOL_RECYCLE = int(os.environ.get('PG_POOL_RECYCLE', 1800))
+PG_POOL_PRE_PING = os.environ.get('PG_POOL_PRE_PING', 'true').lower() == 'true'
+# Requêtes préparées gardées par connexion (0 derrière PgBouncer en mode transaction)
+PG_STATEMENT_CACHE_SIZE = int(os.environ.get('PG_STATEMENT_CACHE_SIZE', 256))
+PG_COMMAND_TIMEOUT = float(os.environ.get('PG_COMMAND_TIMEOUT', 30))
+
+# Verrou consultatif : un seul worker crée le schéma au démarrage
+SCHEMA_LOCK_ID = 0x51504F5254
+
+SCHEMA = [
+    '''
+    CREATE TABLE IF NOT EXISTS users (
+        id SERIAL PRIMARY KEY,
+        email TEXT UNIQUE NOT NULL,
+        password_hash TEXT NOT NULL,
+        user_type TEXT DEFAULT 'visitor',
+        first_name TEXT,
+        last_name TEXT,
+        company TEXT,
+        phone TEXT,
+        visitor_package TEXT DEFAULT 'Free',
+        partnership_package TEXT,
+        status TEXT DEFAULT 'pending',
+        wp_user_id INTEGER,
+        wp_sync_enabled BOOLEAN DEFAULT TRUE,
+        last_wp_sync TIMESTAMP(0),
+        created_at TIMESTAMP(0) DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP(0) DEFAULT CURRENT_TIMESTAMP
+    )
+    ''',
+    'CREATE INDEX IF NOT EXISTS idx_users_status_created ON users (status, created_at, id)',
+    'CREATE INDEX IF NOT EXISTS idx_users_user_type ON users (user_type)',
+    'CREATE INDEX IF NOT EXISTS idx_users_created_at ON users (created_at, id)',
+    'CREATE INDEX IF NOT EXISTS idx_users_wp_user_id ON users (wp_user_id)',
+    # Compteurs du tableau de bord, comme user_counters.py côté SQLite
+    '''
+    CREATE TABLE IF NOT EXISTS user_counters (
+        user_type TEXT NOT NULL,
+        status TEXT NOT NULL,
+        wp_synced BOOLEAN NOT NULL,
+        count BIGINT NOT NULL DEFAULT 0,
+        PRIMARY KEY (user_type, status, wp_synced)
+    )
+    ''',
+    '''
+    CREATE OR REPLACE FUNCTION siports_user_counters() RETURNS trigger LANGUAGE plpgsql AS $$
+    BEGIN
+        IF TG_OP IN ('UPDATE', 'DELETE') THEN
+            UPDATE user_counters SET count = count - 1
+            WHERE user_type = COALESCE(OLD.user_type, '')
+              AND status = COALESCE(OLD.status, '')
+              AND wp_synced = (OLD.wp_user_id IS NOT NULL);
+        END IF;
+        IF TG_OP IN ('UPDATE', 'INSERT') THEN
+            INSERT INTO user_counters (user_type, status, wp_synced, count)
+            VALUES (COALESCE(NEW.user_type, ''), COALESCE(NEW.status, ''), NEW.wp_user_id IS NOT NULL, 1)
+            ON CONFLICT (user_type, status, wp_synced) DO UPDATE SET count = user_counters.count + 1;
+        END IF;
+        RETURN NULL;
+    END
+    $$
+    ''',
+    # Pas de CREATE TRIGGER IF NOT EXISTS avant PostgreSQL 17 : recréés sous le verrou consultatif
+    'DROP TRIGGER IF EXISTS trg_user_counters_insert_delete ON users',
+    '''
+    CREATE TRIGGER trg_user_counters_insert_delete AFTER INSERT OR DELETE ON users
+    FOR EACH ROW EXECUTE FUNCTION siports_user_counters()
+    ''',
+    'DROP TRIGGER IF EXISTS trg_user_counters_update ON users',
+    '''
+    CREATE TRIGGER trg_user_counters_update AFTER UPDATE OF user_type, status, wp_user_id ON users
+    FOR EACH ROW
+    WHEN (COALESCE(OLD.user_type, '') IS DISTINCT FROM COALESCE(NEW.user_type, '')
+       OR COALESCE(OLD.status, '') IS DISTINCT FROM COALESCE(NEW.status, '')
+       OR (OLD.wp_user_id IS NOT NULL) IS DISTINCT FROM (NEW.wp_user_id IS NOT NULL))
+    EXECUTE FUNCTION siports_user_counters()
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS wp_sync_log (
+        id SERIAL PRIMARY KEY,
+        user_id INTEGER REFERENCES users (id),
+        action TEXT NOT NULL,
+        data TEXT,
+        status TEXT DEFAULT 'pending',
+        error_message TEXT,
+        created_at TIMESTAMP(0) DEFAULT CURRENT_TIMESTAMP
+    )
+    ''',
+    'CREATE INDEX IF NOT EXISTS idx_wp_sync_log_user_created ON wp_sync_log (user_id, created_at)',
+    '''
+    CREATE TABLE IF NOT EXISTS chat_history (
+        id BIGSERIAL PRIMARY KEY,
+        session_id TEXT NOT NULL,
+        role TEXT NOT NULL,
+        content TEXT NOT NULL,
+        timestamp DOUBLE PRECISION NOT NULL
+    )
+    ''',
+    'CREATE INDEX IF NOT EXISTS idx_chat_history_session ON chat_history (session_id, id)',
+    'CREATE INDEX IF NOT EXISTS idx_chat_history_timestamp ON chat_history (timestamp)',
+]
+
+USER_COLUMNS = [
+    'id', 'email', 'password_hash', 'user_type', 'first_name', 'last_name', 'company', 'phone',
+    'visitor_package', 'partnership_package', 'status', 'wp_user_id', 'wp_sync_enabled',
+    'last_wp_sync', 'created_at', 'updated_at'
+]
+TIMESTAMP_COLUMNS = {'created_at', 'updated_at', 'last_wp_sync'}
+
+
+def _select_column(column: str) -> str:
+    # Mêmes valeurs que SQLite : texte pour les dates, 0/1 pour les booléens
+    if column in TIMESTAMP_COLUMNS:
+        return f"to_char({column}, 'YYYY-MM-DD HH24:MI:SS') AS {column}"
+    if column == 'wp_sync_enabled':
+        return f'{column}::int AS {column}'
+    return column
+
+
+def _select_list(columns: Sequence[str]) -> str:
+    return ', '.join(_select_column(column) for column in columns)
+
+
+USER_SELECT = _select_list(USER_COLUMNS)
+
+# Agrégat sur la petite table user_counters (::bigint : SUM renverrait un numeric)
+DASHBOARD_COUNTERS_QUERY = '''
+    SELECT
+        COALESCE(SUM(count), 0)::bigint AS total_users,
+        COALESCE(SUM(count) FILTER (WHERE user_type = 'visitor'), 0)::bigint AS visitors,
+        COALESCE(SUM(count) FILTER (WHERE user_type = 'exhibitor'), 0)::bigint AS exhibitors,
+        COALESCE(SUM(count) FILTER (WHERE user_type = 'partner'), 0)::bigint AS partners,
+        COALESCE(SUM(count) FILTER (WHERE status = 'pending'), 0)::bigint AS pending,
+        COALESCE(SUM(count) FILTER (WHERE status = 'validated'), 0)::bigint AS validated,
+        COALESCE(SUM(count) FILTER (WHERE status = 'rejected'), 0)::bigint AS rejected,
+        COALESCE(SUM(count) FILTER (WHERE wp_synced), 0)::bigint AS wordpress_synced
+    FROM user_counters
+'''
+
+# Recalcul complet (création de la table, ou après un TRUNCATE qui ne déclenche pas les triggers)
+REBUILD_COUNTERS_SQL = [
+    'DELETE FROM user_counters',
+    '''
+    INSERT INTO user_counters (user_type, status, wp_synced, count)
+    SELECT COALESCE(user_type, ''), COALESCE(status, ''), wp_user_id IS NOT NULL, COUNT(*)
+    FROM users
+    GROUP BY 1, 2, 3
+    ''',
+]
+
+
+def async_database_url(database_url: str) -> str:
+    """postgresql:// or postgres:// -> postgresql+asyncpg://"""
+    for prefix in ('postgresql://', 'postgres://'):
+        if database_url.startswith(prefix):
+            return 'postgresql+asyncpg://' + database_url[len(prefix):]
+    return database_url
+
+
+@functools.lru_cache(maxsize=512)
+def _sql(statement: str):
+    # Un seul objet text() par requête : la clé du cache de compilation reste stable
+    return text(statement)
+
+
+def build_users_query(columns: Sequence[str], filters: Dict[str, Any],
+                      after: Optional[Tuple[str, int]] = None,
+                      limit: Optional[int] = None,
+                      package: Optional[str] = None) -> Tuple[str, Dict[str, Any]]:
+    """PostgreSQL counterpart of pagination.build_users_query, with named parameters"""
+    clauses = []
+    params: Dict[str, Any] = {}
+    for column, value in filters.items():
+        if value is not None:
+            clauses.append(f'{column} = :{column}')
+            params[column] = value
+    if package is not None:
+        clauses.append('(visitor_package = :package OR partnership_package = :package)')
+        params['package'] = package
+    if after is not None:
+        # Le curseur porte la date en texte : la typer côté serveur
+        clauses.append('(created_at, id) < (CAST(CAST(:after_created AS text) AS timestamp), :after_id)')
+        params['after_created'], params['after_id'] = after
+
+    sql = f'SELECT {_select_list(columns)} FROM users'
+    if clauses:
+        sql += ' WHERE ' + ' AND '.join(clauses)
+    # Colonnes qualifiées : les alias texte de to_char() masqueraient l'index
+    sql += ' ORDER BY users.created_at DESC, users.id DESC'
+    if limit is not None:
+        sql += ' LIMIT :limit'
+        params['limit'] = limit
+    return sql, params
+
+
+class PostgresDatabase:
+    """Async engine with a bounded pool, plus pool-wait and query-time statistics"""
+
+    def __init__(self, database_url: str, pool_size: int = PG_POOL_SIZE, max_overflow: int = PG_MAX_OVERFLOW):
+        self.pool_size = pool_size
+        self.max_overflow = max_overflow
+        self.engine = create_async_engine(
+            async_database_url(database_url),
+            pool_size=pool_size,
+            max_overflow=max_overflow,
+            pool_timeout=PG_POOL_TIMEOUT,
+            pool_recycle=PG_POOL_RECYCLE,
+            pool_pre_ping=PG_POOL_PRE_PING,
+            # Autocommit par défaut : une lecture isolée (et le pre-ping) coûte un seul aller-retour,
+            # sans BEGIN / ROLLBACK autour
+            isolation_level='AUTOCOMMIT',
+            # LIFO : les connexions chaudes servent d'abord, les autres expirent
+            pool_use_lifo=True,
+            connect_args={
+                'prepared_statement_cache_size': PG_STATEMENT_CACHE_SIZE,
+                'command_timeout': PG_COMMAND_TIMEOUT,
+                'server_settings': {'application_name': 'siports', 'timezone': 'UTC', 'jit': 'off'},
+            },
+        )
+        # Transactions explicites (plusieurs requêtes atomiques) sur le même pool
+        self.transaction_engine = self.engine.execution_options(isolation_level='READ COMMITTED')
+        self.pool_wait = TimingStat()
+        self.query_time = TimingStat()
+        self.errors = 0
+
+    @asynccontextmanager
+    async def connect(self, transaction: bool = False):
+        started = time.perf_counter()
+        context = self.transaction_engine.begin() if transaction else self.engine.connect()
+        async with context as conn:
+            self.pool_wait.observe(time.perf_counter() - started)
+            yield conn
+
+    async def _execute(self, conn, sql: str, params):
+        started = time.perf_counter()
+        try:
+            return await conn.execute(_sql(sql), params)
+        except Exception:
+            self.errors += 1
+            raise
+        finally:
+            self.query_time.observe(time.perf_counter() - started)
+
+    async def fetchone(self, sql: str, params: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+        async with self.connect() as conn:
+            row = (await self._execute(conn, sql, params or {})).mappings().first()
+        return dict(row) if row is not None else None
+
+    async def fetchall(self, sql: str, params: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        async with self.connect() as conn:
+            rows = (await self._execute(conn, sql, params or {})).mappings().all()
+        return [dict(row) for row in rows]
+
+    async def execute(self, sql: str, params: Any = None) -> int:
+        """Run one statement, or executemany for a list of dicts in one transaction; returns rowcount"""
+        async with self.connect(transaction=isinstance(params, list)) as conn:
+            return (await self._execute(conn, sql, params or {})).rowcount
+
+    async def scalar(self, sql: str, params: Optional[Dict[str, Any]] = None) -> Any:
+        async with self.connect() as conn:
+            return (await self._execute(conn, sql, params or {})).scalar()
+
+    async def iterate(self, sql: str, params: Optional[Dict[str, Any]] = None,
+                      batch_size: int = 500) -> AsyncIterator[List[Dict[str, Any]]]:
+        """Server-side cursor (needs a transaction), yielded batch_size rows at a time"""
+        async with self.connect(transaction=True) as conn:
+            result = await conn.stream(_sql(sql), params or {})
+            async with aclosing(result.mappings().partitions(batch_size)) as partitions:
+                async for partition in partitions:
+                    yield [dict(row) for row in partition]
+
+    async def init(self):
+        """Create the schema and the missing seed accounts, once across workers"""
+        async with self.connect(transaction=True) as conn:
+            await conn.execute(_sql('SELECT pg_advisory_xact_lock(:lock_id)'), {'lock_id': SCHEMA_LOCK_ID})
+            counters_missing = (await conn.execute(_sql("SELECT to_regclass('user_counters')"))).scalar() is None
+            for statement in SCHEMA:
+                await conn.execute(_sql(statement))
+            if counters_missing:
+                # Base existante : les utilisateurs déjà présents n'ont pas traversé les triggers
+                for statement in REBUILD_COUNTERS_SQL:
+                    await conn.execute(_sql(statement))
+
+            emails = [email for email, _, _ in SEED_USERS]
+            existing = set((await conn.execute(
+                _sql('SELECT email FROM users WHERE email = ANY(:emails)'), {'emails': emails}
+            )).scalars())
+            created = 0
+            for email, password, fields in SEED_USERS:
+                if email in existing:
+                    continue
+                password_hash = await asyncio.to_thread(generate_password_hash, password)
+                columns = ['email', 'password_hash'] + list(fields)
+                await conn.execute(_sql(
+                    f'INSERT INTO users ({", ".join(columns)}) VALUES ({", ".join(":" + c for c in columns)}) '
+                    'ON CONFLICT (email) DO NOTHING'
+                ), {'email': email, 'password_hash': password_hash, **fields})
+                created += 1
+        if created:
+            logger.info("Comptes de démonstration créés (PostgreSQL): %s", created)
+
+    async def close(self):
+        await self.engine.dispose()
+
+    def metrics(self) -> Dict[str, Any]:
+        pool = self.engine.pool
+        return {
+            "pool_size": self.pool_size,
+            "max_overflow": self.max_overflow,
+            "connections_checked_out": pool.checkedout(),
+            "connections_idle": pool.checkedin(),
+            "overflow": max(0, pool.overflow()),
+            "statement_cache_size": PG_STATEMENT_CACHE_SIZE,
+            "errors": self.errors,
+            "pool_wait": self.pool_wait.snapshot(),
+            "query_time": self.query_time.snapshot()
+        }
+
+
+class PostgresUserRepository:
+    """users table on PostgreSQL; same methods and row shapes as SQLiteUserRepository"""
+
+    def __init__(self, database: PostgresDatabase):
+        self.database = database
+
+    async def get(self, user_id: int) -> Optional[Dict[str, Any]]:
+        return await self.database.fetchone(f'SELECT {USER_SELECT} FROM users WHERE id = :id', {'id': user_id})
+
+    async def get_by_email(self, email: str) -> Optional[Dict[str, Any]]:
+        return await self.database.fetchone(f'SELECT {USER_SELECT} FROM users WHERE email = :email', {'email': email})
+
+    async def exists(self, email: str) -> bool:
+        return await self.database.scalar('SELECT id FROM users WHERE email = :email', {'email': email}) is not None
+
+    async def create(self, fields: Dict[str, Any]) -> int:
+        columns = list(fields)
+        params = {column: bool(value) if column == 'wp_sync_enabled' else value for column, value in fields.items()}
+        return await self.database.scalar(
+            f'INSERT INTO users ({", ".join(columns)}) VALUES ({", ".join(":" + c for c in columns)}) RETURNING id',
+            params
+        )
+
+    async def set_visitor_package(self, user_id: int, package: str):
+        await self.database.execute(
+            'UPDATE users SET visitor_package = :package, updated_at = CURRENT_TIMESTAMP WHERE id = :id',
+            {'package': package, 'id': user_id}
+        )
+
+    async def set_status(self, user_id: int, status: str):
+        await self.database.execute(
+            'UPDATE users SET status = :status, updated_at = CURRENT_TIMESTAMP WHERE id = :id',
+            {'status': status, 'id': user_id}
+        )
+
+    async def bulk_set_status(self, status: str, user_ids: Optional[Sequence[int]] = None,
+                              filters: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Same contract as moderation.apply_bulk_status, one transaction and one UPDATE"""
+        async with self.database.connect(transaction=True) as conn:
+            if user_ids is not None:
+                requested = list(dict.fromkeys(user_ids))
+                rows = await self.database._execute(
+                    conn, 'SELECT id, status FROM users WHERE id = ANY(:ids) FOR UPDATE', {'ids': requested})
+            else:
+                where = [f'{column} = :{column}' for column, value in (filters or {}).items() if value is not None]
+                rows = await self.database._execute(
+                    conn,
+                    'SELECT id, status FROM users' + (' WHERE ' + ' AND '.join(where) if where else '') + ' FOR UPDATE',
+                    {column: value for column, value in (filters or {}).items() if value is not None}
+                )
+            previous = {row[0]: row[1] for row in rows}
+            if user_ids is None:
+                requested = list(previous)
+            if previous:
+                await self.database._execute(
+                    conn, 'UPDATE users SET status = :status, updated_at = CURRENT_TIMESTAMP WHERE id = ANY(:ids)',
+                    {'status': status, 'ids': list(previous)}
+                )
+        return bulk_result(status, requested, previous)
+
+    async def dashboard_counters(self) -> Dict[str, Any]:
+        """One aggregate over user_counters (a handful of rows), not a scan of users"""
+        return await self.database.fetchone(DASHBOARD_COUNTERS_QUERY)
+
+    async def rebuild_counters(self) -> int:
+        """Recompute user_counters from users; returns the user total"""
+        async with self.database.connect(transaction=True) as conn:
+            for statement in REBUILD_COUNTERS_SQL:
+                await self.database._execute(conn, statement, {})
+            return (await self.database._execute(
+                conn, 'SELECT COALESCE(SUM(count), 0)::bigint FROM user_counters', {})).scalar()
+
+    async def list(self, columns: Sequence[str], filters: Dict[str, Any],
+                   after: Optional[Tuple[str, int]] = None, limit: Optional[int] = None,
+                   package: Optional[str] = None) -> List[Dict[str, Any]]:
+        sql, params = build_users_query(columns, filters, after, limit, package)
+        return await self.database.fetchall(sql, params)
+
+    async def iterate(self, columns: Sequence[str], filters: Dict[str, Any],
+                      package: Optional[str] = None,
+                      batch_size: int = 500) -> AsyncIterator[List[Dict[str, Any]]]:
+        sql, params = build_users_query(columns, filters, package=package)
+        # aclose() de ce générateur ferme aussitôt le curseur serveur (et rend sa connexion)
+        async with aclosing(self.database.iterate(sql, params, batch_size)) as batches:
+            async for batch in batches:
+                yield batch
+
+    async def upsert_chunk(self, rows: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """user_import upsert on PostgreSQL: the same ON CONFLICT statement, sent as one executemany"""
+        emails = list(dict.fromkeys(row['email'] for row in rows))
+        async with self.database.connect(transaction=True) as conn:
+            existing = {row[1]: (row[0], row[2]) for row in await self.database._execute(
+                conn, 'SELECT id, email, user_type FROM users WHERE email = ANY(:emails)', {'emails': emails})}
+            rows, result = plan_upsert(rows, existing)
+            if rows:
+                await self.database._execute(conn, UPSERT_USER_SQL, rows)
+        return result
+
+    async def wordpress_link(self, user_id: int) -> Optional[Dict[str, Any]]:
+        return await self.database.fetchone(
+            f'SELECT {_select_list(["wp_user_id", "wp_sync_enabled", "last_wp_sync"])} FROM users WHERE id = :id',
+            {'id': user_id}
+        )
+
+
+class PostgresSyncLogRepository:
+    """wp_sync_log on PostgreSQL"""
+
+    def __init__(self, database: PostgresDatabase):
+        self.database = database
+
+    async def add(self, action: str, data: Any, status: str, user_id: Optional[int] = None):
+        await self.database.execute(
+            'INSERT INTO wp_sync_log (user_id, action, data, status) VALUES (:user_id, :action, :data, :status)',
+            {'user_id': user_id, 'action': action, 'data': json.dumps(data), 'status': status}
+        )
+
+    async def recent(self, user_id: int, limit: int = SYNC_LOG_RECENT) -> List[Dict[str, Any]]:
+        return await self.database.fetchall(f'''
+            SELECT action, status, {_select_column('created_at')}, error_message
+            FROM wp_sync_log
+            WHERE user_id = :user_id
+            ORDER BY wp_sync_log.created_at DESC
+            LIMIT :limit
+        ''', {'user_id': user_id, 'limit': limit})
+
+
+class PostgresSessionStore:
+    """Chat history shared by every worker and host through PostgreSQL"""
+
+    def __init__(self, database: PostgresDatabase, history_size: int = SESSION_HISTORY_SIZE):
+        self.database = database
+        self.history_size = history_size
+
+    async def append(self, session_id: str, role: str, content: str):
+        async with self.database.connect(transaction=True) as conn:
+            await self.database._execute(conn, '''
+                INSERT INTO chat_history (session_id, role, content, timestamp)
+                VALUES (:session_id, :role, :content, :timestamp)
+            ''', {'session_id': session_id, 'role': role, 'content': content, 'timestamp': time.time()})
+            await self.database._execute(conn, '''
+                DELETE FROM chat_history WHERE session_id = :session_id AND id <= (
+                    SELECT id FROM chat_history WHERE session_id = :session_id
+                    ORDER BY id DESC LIMIT 1 OFFSET :keep
+                )
+            ''', {'session_id': session_id, 'keep': self.history_size})
+
+    async def recent(self, session_id: str, limit: int = SESSION_HISTORY_SIZE) -> List[Dict[str, Any]]:
+        rows = await self.database.fetchall(
+            'SELECT role, content, timestamp FROM chat_history WHERE session_id = :session_id '
+            'ORDER BY id DESC LIMIT :limit',
+            {'session_id': session_id, 'limit': limit}
+        )
+        return rows[::-1]
+
+    async def clear(self, session_id: str) -> bool:
+        return await self.database.execute(
+            'DELETE FROM chat_history WHERE session_id = :session_id', {'session_id': session_id}) > 0
+
+    async def sweep(self, idle_ttl: float = SESSION_IDLE_TTL) -> int:
+        return await self.database.execute('''
+            DELETE FROM chat_history WHERE session_id IN (
+                SELECT session_id FROM chat_history GROUP BY session_id HAVING MAX(timestamp) < :cutoff
+            )
+        ''', {'cutoff': time.time() - idle_ttl})
+
+    def metrics(self) -> Dict[str, Any]:
+        return {"backend": "postgresql"}
+
+
+def create_postgres_repositories(database_url: str) -> Repositories:
+    database = PostgresDatabase(database_url)
+    sessions = PostgresSessionStore(database) if shared_session_store() else MemorySessionStore()
+    logger.info("PostgreSQL repositories (pool_size=%s, max_overflow=%s)", database.pool_size, database.max_overflow)
+    return Repositories('postgresql', PostgresUserRepository(database), PostgresSyncLogRepository(database),
+                        sessions, database)
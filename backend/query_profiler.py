@@ -0,0 +1,340 @@
+"""
+SIPORTS v2.0 - SQLite Query Profiler
+Connexion / curseur instrumentés : chaque requête est normalisée (littéraux
+remplacés par ?), chronométrée (exécution + lecture des lignes) et comptée.
+Les requêtes au-delà du seuil vont dans le journal des requêtes lentes.
+Activable / désactivable à chaud ; désactivé, le coût est un test de booléen.
+"""
+
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from array import array
+from collections import deque
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+slow_query_logger = logging.getLogger('siports.slow_queries')
+
+DB_PROFILER_ENABLED = os.environ.get('DB_PROFILER_ENABLED', 'true').lower() == 'true'
+DB_SLOW_QUERY_MS = float(os.environ.get('DB_SLOW_QUERY_MS', 100))
+DB_PROFILER_MAX_STATEMENTS = int(os.environ.get('DB_PROFILER_MAX_STATEMENTS', 1000))
+SAMPLES_PER_STATEMENT = 512
+SLOW_QUERY_HISTORY = 100
+
+OTHER_STATEMENTS = '<other statements>'
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?\b")
+_WHITESPACE = re.compile(r'\s+')
+_IN_LIST = re.compile(r'\bIN \(\?(?:, ?\?)*\)', re.IGNORECASE)
+_VALUES_LIST = re.compile(r'(\(\?(?:, ?\?)*\))(?:, ?\(\?(?:, ?\?)*\))+')
+
+_NORMALIZED_CACHE_SIZE = 4096
+
+
+def normalize_sql(sql: str) -> str:
+    """Statement shape without literals or whitespace noise: `IN (1,2,3)` -> `IN (?...)`"""
+    text = _STRING_LITERAL.sub('?', sql)
+    text = _NUMBER_LITERAL.sub('?', text)
+    text = _WHITESPACE.sub(' ', text).strip()
+    text = _IN_LIST.sub('IN (?...)', text)
+    return _VALUES_LIST.sub(r'\1, ...', text)
+
+
+class QueryStats:
+    """Counters and a ring of recent durations for one normalized statement"""
+
+    __slots__ = ('sql', 'count', 'total', 'max', 'rows', 'samples', '_next')
+
+    def __init__(self, sql: str):
+        self.sql = sql
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.rows = 0
+        self.samples = array('d')
+        self._next = 0
+
+    def observe(self, elapsed: float, rows: int):
+        self.count += 1
+        self.total += elapsed
+        self.rows += rows
+        if elapsed > self.max:
+            self.max = elapsed
+        if len(self.samples) < SAMPLES_PER_STATEMENT:
+            self.samples.append(elapsed)
+        else:
+            self.samples[self._next] = elapsed
+            self._next = (self._next + 1) % SAMPLES_PER_STATEMENT
+
+    def percentile(self, p: float) -> float:
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(p * len(ordered)))]
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "sql": self.sql,
+            "count": self.count,
+            "total_ms": round(self.total * 1000, 3),
+            "avg_ms": round(self.total / self.count * 1000, 3) if self.count else 0.0,
+            "p50_ms": round(self.percentile(0.50) * 1000, 3),
+            "p99_ms": round(self.percentile(0.99) * 1000, 3),
+            "max_ms": round(self.max * 1000, 3),
+            "rows": self.rows
+        }
+
+
+class QueryProfiler:
+    """Process-wide registry fed by ProfiledCursor and the trace callback"""
+
+    def __init__(self, enabled: bool = DB_PROFILER_ENABLED, slow_ms: float = DB_SLOW_QUERY_MS):
+        self.enabled = enabled
+        self.slow_threshold = slow_ms / 1000
+        self._lock = threading.Lock()
+        self._stats: Dict[str, QueryStats] = {}
+        self._normalized: Dict[str, str] = {}
+        # Instructions vues seulement par le trace callback (commit(), BEGIN implicite...)
+        self.traced: Dict[str, int] = {}
+        self._in_cursor = threading.local()
+        self.slow_queries: deque = deque(maxlen=SLOW_QUERY_HISTORY)
+        self.started_at = time.time()
+
+    def _normalize(self, sql: str) -> str:
+        normalized = self._normalized.get(sql)
+        if normalized is None:
+            normalized = normalize_sql(sql)
+            if len(self._normalized) >= _NORMALIZED_CACHE_SIZE:
+                self._normalized.clear()
+            self._normalized[sql] = normalized
+        return normalized
+
+    def stats_for(self, sql: str) -> QueryStats:
+        normalized = self._normalize(sql)
+        stats = self._stats.get(normalized)
+        if stats is None:
+            with self._lock:
+                stats = self._stats.get(normalized)
+                if stats is None:
+                    if len(self._stats) >= DB_PROFILER_MAX_STATEMENTS:
+                        normalized = OTHER_STATEMENTS
+                        stats = self._stats.get(normalized)
+                    if stats is None:
+                        stats = self._stats[normalized] = QueryStats(normalized)
+        return stats
+
+    def record(self, stats: QueryStats, elapsed: float, rows: int):
+        with self._lock:
+            stats.observe(elapsed, rows)
+        if elapsed >= self.slow_threshold:
+            entry = {
+                "sql": stats.sql,
+                "duration_ms": round(elapsed * 1000, 3),
+                "rows": rows,
+                "at": time.time()
+            }
+            self.slow_queries.append(entry)
+            slow_query_logger.warning("Slow query (%s ms, %s rows): %s", entry['duration_ms'], rows, stats.sql)
+
+    def trace(self, statement: str):
+        """sqlite3 trace callback: count statements the cursors never see.
+
+        Calls made while a ProfiledCursor is timing its own statement are
+        ignored, leaving commit(), implicit BEGINs and executescript(), so
+        nothing is recorded twice.
+        """
+        if not self.enabled or getattr(self._in_cursor, 'active', False):
+            return
+        normalized = self._normalize(statement)
+        with self._lock:
+            self.traced[normalized] = self.traced.get(normalized, 0) + 1
+
+    def configure(self, enabled: Optional[bool] = None, slow_ms: Optional[float] = None):
+        if enabled is not None:
+            self.enabled = enabled
+            logger.info("Query profiler %s", 'enabled' if enabled else 'disabled')
+        if slow_ms is not None:
+            self.slow_threshold = slow_ms / 1000
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+            self.traced.clear()
+            self.slow_queries.clear()
+            self.started_at = time.time()
+
+    def top(self, limit: int = 20, order: str = 'total') -> List[Dict[str, Any]]:
+        """Top statements by 'total', 'p99', 'count' or 'max' time"""
+        with self._lock:
+            snapshots = [stats.snapshot() for stats in self._stats.values()]
+        key = {'total': 'total_ms', 'p99': 'p99_ms', 'count': 'count', 'max': 'max_ms'}[order]
+        return sorted(snapshots, key=lambda item: item[key], reverse=True)[:limit]
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            count = sum(stats.count for stats in self._stats.values())
+            total = sum(stats.total for stats in self._stats.values())
+        return {
+            "enabled": self.enabled,
+            "statements": len(self._stats),
+            "queries": count,
+            "query_seconds": round(total, 6),
+            "slow_queries": len(self.slow_queries)
+        }
+
+    def report(self, limit: int = 20) -> Dict[str, Any]:
+        with self._lock:
+            traced = sorted(self.traced.items(), key=lambda item: item[1], reverse=True)[:limit]
+        return {
+            "enabled": self.enabled,
+            "slow_query_ms": round(self.slow_threshold * 1000, 3),
+            "since": self.started_at,
+            "statements": len(self._stats),
+            "top_by_total": self.top(limit, 'total'),
+            "top_by_p99": self.top(limit, 'p99'),
+            "slow_queries": list(self.slow_queries)[-limit:],
+            "traced_only": [{"sql": sql, "count": count} for sql, count in traced]
+        }
+
+
+# Instance globale du profiler
+query_profiler = QueryProfiler()
+
+
+class ProfiledCursor(sqlite3.Cursor):
+    """Cursor timing execute() plus the fetches of its result rows.
+
+    A SELECT's execution is recorded once its rows are exhausted, or when
+    the cursor is re-executed, closed or collected.
+    """
+
+    __slots__ = ('_stats', '_elapsed', '_rows')
+
+    def __init__(self, *args):
+        super().__init__(*args)
+        self._stats = None
+        self._elapsed = 0.0
+        self._rows = 0
+
+    def _finish(self):
+        stats, self._stats = self._stats, None
+        if stats is not None:
+            query_profiler.record(stats, self._elapsed, self._rows)
+
+    def execute(self, sql, parameters=()):
+        if self._stats is not None:
+            self._finish()
+        if not query_profiler.enabled:
+            return super().execute(sql, parameters)
+        stats = query_profiler.stats_for(sql)
+        in_cursor = query_profiler._in_cursor
+        in_cursor.active = True
+        started = time.perf_counter()
+        try:
+            super().execute(sql, parameters)
+        finally:
+            in_cursor.active = False
+            self._stats = stats
+            self._elapsed = time.perf_counter() - started
+            self._rows = 0
+        if self.description is None:
+            self._rows = max(self.rowcount, 0)
+            self._finish()
+        return self
+
+    def executemany(self, sql, seq_of_parameters):
+        if self._stats is not None:
+            self._finish()
+        if not query_profiler.enabled:
+            return super().executemany(sql, seq_of_parameters)
+        stats = query_profiler.stats_for(sql)
+        in_cursor = query_profiler._in_cursor
+        in_cursor.active = True
+        started = time.perf_counter()
+        try:
+            super().executemany(sql, seq_of_parameters)
+        finally:
+            in_cursor.active = False
+            query_profiler.record(stats, time.perf_counter() - started, max(self.rowcount, 0))
+        return self
+
+    def fetchone(self):
+        if self._stats is None:
+            return super().fetchone()
+        started = time.perf_counter()
+        row = super().fetchone()
+        self._elapsed += time.perf_counter() - started
+        if row is None:
+            self._finish()
+        else:
+            self._rows += 1
+        return row
+
+    def fetchmany(self, size=None):
+        if self._stats is None:
+            return super().fetchmany(self.arraysize if size is None else size)
+        started = time.perf_counter()
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        self._elapsed += time.perf_counter() - started
+        self._rows += len(rows)
+        if not rows:
+            self._finish()
+        return rows
+
+    def fetchall(self):
+        if self._stats is None:
+            return super().fetchall()
+        started = time.perf_counter()
+        rows = super().fetchall()
+        self._elapsed += time.perf_counter() - started
+        self._rows += len(rows)
+        self._finish()
+        return rows
+
+    def __next__(self):
+        if self._stats is None:
+            return super().__next__()
+        started = time.perf_counter()
+        try:
+            row = super().__next__()
+        except StopIteration:
+            self._elapsed += time.perf_counter() - started
+            self._finish()
+            raise
+        self._elapsed += time.perf_counter() - started
+        self._rows += 1
+        return row
+
+    def close(self):
+        if self._stats is not None:
+            self._finish()
+        super().close()
+
+    def __del__(self):
+        try:
+            if self._stats is not None:
+                self._finish()
+        except Exception:
+            pass
+
+
+class ProfiledConnection(sqlite3.Connection):
+    """sqlite3 connection whose statements all go through ProfiledCursor"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.set_trace_callback(query_profiler.trace)
+
+    def cursor(self, factory=ProfiledCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
@@ -0,0 +1,249 @@
+"""
+SIPORTS v2.0 - Login Throttling
+Seaux à jetons par IP et par compte, vérifiés avant tout hachage ou accès
+base : une rafale de credential stuffing est rejetée en O(1).
+Backend mémoire (un dict compacté périodiquement) ou SQLite partagé
+pour les déploiements multi-workers.
+"""
+
+import logging
+import math
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+WEB_CONCURRENCY = int(os.environ.get('WEB_CONCURRENCY', 1))
+LOGIN_RATE_LIMIT_ENABLED = os.environ.get('LOGIN_RATE_LIMIT_ENABLED', 'true').lower() == 'true'
+# memory | sqlite (par défaut sqlite dès qu'il y a plusieurs workers)
+RATE_LIMIT_BACKEND = os.environ.get('RATE_LIMIT_BACKEND', 'sqlite' if WEB_CONCURRENCY > 1 else 'memory')
+RATE_LIMIT_TRUST_FORWARDED = os.environ.get('RATE_LIMIT_TRUST_FORWARDED', 'false').lower() == 'true'
+
+# Par IP : rafale de 20 tentatives, puis 20 par minute
+LOGIN_IP_BURST = float(os.environ.get('LOGIN_IP_BURST', 20))
+LOGIN_IP_PER_MINUTE = float(os.environ.get('LOGIN_IP_PER_MINUTE', 20))
+# Par compte : 5 tentatives, verrouillage de 15 minutes pour tout le seau
+LOGIN_MAX_ATTEMPTS = float(os.environ.get('LOGIN_MAX_ATTEMPTS', 5))
+LOGIN_LOCKOUT_MINUTES = float(os.environ.get('LOGIN_LOCKOUT_MINUTES', 15))
+
+RATE_LIMIT_MAX_KEYS = int(os.environ.get('RATE_LIMIT_MAX_KEYS', 100000))
+RATE_LIMIT_COMPACT_INTERVAL = float(os.environ.get('RATE_LIMIT_COMPACT_INTERVAL', 60))
+
+RATE_LIMIT_SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS rate_limit_buckets (
+        key TEXT PRIMARY KEY,
+        tokens REAL NOT NULL,
+        updated REAL NOT NULL
+    ) WITHOUT ROWID
+'''
+
+
+def install_rate_limit_buckets(conn: sqlite3.Connection):
+    conn.execute(RATE_LIMIT_SCHEMA)
+
+
+class BucketLimit:
+    """capacity tokens, refilled continuously at rate tokens per second"""
+
+    __slots__ = ('capacity', 'rate')
+
+    def __init__(self, capacity: float, per_seconds: float):
+        self.capacity = capacity
+        self.rate = capacity / per_seconds
+
+    def refill(self, tokens: float, elapsed: float) -> float:
+        return min(self.capacity, tokens + elapsed * self.rate)
+
+    def retry_after(self, tokens: float) -> float:
+        return (1 - tokens) / self.rate
+
+    @property
+    def full_after(self) -> float:
+        return self.capacity / self.rate
+
+
+def _take(limit: BucketLimit, tokens: Optional[float], updated: float, now: float) -> Tuple[float, float]:
+    """(tokens left, retry_after); retry_after is 0 when the attempt is allowed"""
+    tokens = limit.capacity if tokens is None else limit.refill(tokens, now - updated)
+    if tokens >= 1:
+        return tokens - 1, 0.0
+    return tokens, limit.retry_after(tokens)
+
+
+class MemoryBuckets:
+    """key -> [tokens, updated] in one dict; full buckets are dropped on compaction"""
+
+    def __init__(self, max_keys: int = RATE_LIMIT_MAX_KEYS, compact_interval: float = RATE_LIMIT_COMPACT_INTERVAL):
+        self.max_keys = max_keys
+        self.compact_interval = compact_interval
+        self._buckets: Dict[str, list] = {}
+        self._lock = threading.Lock()
+        self._last_compact = time.monotonic()
+        self._longest_refill = 0.0
+        self.compactions = 0
+
+    async def take(self, key: str, limit: BucketLimit) -> Tuple[float, float]:
+        now = time.monotonic()
+        with self._lock:
+            if limit.full_after > self._longest_refill:
+                self._longest_refill = limit.full_after
+            if now - self._last_compact > self.compact_interval or len(self._buckets) >= self.max_keys:
+                self._compact(now)
+            bucket = self._buckets.get(key)
+            tokens, retry_after = _take(limit, bucket[0] if bucket else None, bucket[1] if bucket else now, now)
+            if bucket is None:
+                self._buckets[key] = [tokens, now]
+            else:
+                bucket[0] = tokens
+                bucket[1] = now
+        return retry_after, tokens
+
+    async def reset(self, key: str):
+        with self._lock:
+            self._buckets.pop(key, None)
+
+    def _compact(self, now: float):
+        # Un seau plein équivaut à une clé absente
+        cutoff = now - self._longest_refill
+        self._buckets = {key: bucket for key, bucket in self._buckets.items() if bucket[1] > cutoff}
+        if len(self._buckets) >= self.max_keys:
+            # Toujours trop de clés actives : garder les plus récentes
+            recent = sorted(self._buckets.items(), key=lambda item: item[1][1], reverse=True)
+            self._buckets = dict(recent[:self.max_keys // 2])
+        self._last_compact = now
+        self.compactions += 1
+
+    def size(self) -> Optional[int]:
+        return len(self._buckets)
+
+
+class SQLiteBuckets:
+    """Buckets shared by all workers in the application database.
+
+    Each take is one short job on the pool's writer; wall-clock time is
+    used since several processes compare timestamps.
+    """
+
+    def __init__(self, db, compact_interval: float = RATE_LIMIT_COMPACT_INTERVAL):
+        self.db = db
+        self.compact_interval = compact_interval
+        self._last_compact = time.monotonic()
+        self._longest_refill = 0.0
+        self.compactions = 0
+
+    @staticmethod
+    def _take_job(conn, key: str, limit: BucketLimit, now: float) -> Tuple[float, float]:
+        row = conn.execute('SELECT tokens, updated FROM rate_limit_buckets WHERE key = ?', (key,)).fetchone()
+        tokens, retry_after = _take(limit, row[0] if row else None, row[1] if row else now, now)
+        conn.execute(
+            'INSERT INTO rate_limit_buckets (key, tokens, updated) VALUES (?, ?, ?) '
+            'ON CONFLICT (key) DO UPDATE SET tokens = excluded.tokens, updated = excluded.updated',
+            (key, tokens, now)
+        )
+        return retry_after, tokens
+
+    async def take(self, key: str, limit: BucketLimit) -> Tuple[float, float]:
+        if limit.full_after > self._longest_refill:
+            self._longest_refill = limit.full_after
+        if time.monotonic() - self._last_compact > self.compact_interval:
+            self._last_compact = time.monotonic()
+            await self.db.execute('DELETE FROM rate_limit_buckets WHERE updated < ?',
+                                  (time.time() - self._longest_refill,))
+            self.compactions += 1
+        return await self.db.write(self._take_job, key, limit, time.time())
+
+    async def reset(self, key: str):
+        await self.db.execute('DELETE FROM rate_limit_buckets WHERE key = ?', (key,))
+
+    def size(self) -> Optional[int]:
+        # Pas de COUNT(*) à chaque scrape
+        return None
+
+
+class LoginThrottle:
+    """Per-IP and per-account token buckets in front of the login endpoints.
+
+    Every attempt takes one token from the IP bucket, then one from the
+    account bucket; a successful login refills the account bucket.
+    """
+
+    def __init__(self, buckets, enabled: bool = LOGIN_RATE_LIMIT_ENABLED):
+        self.buckets = buckets
+        self.enabled = enabled
+        self.ip_limit = BucketLimit(LOGIN_IP_BURST, LOGIN_IP_BURST * 60 / LOGIN_IP_PER_MINUTE)
+        self.account_limit = BucketLimit(LOGIN_MAX_ATTEMPTS, LOGIN_LOCKOUT_MINUTES * 60)
+        self.checks = 0
+        self.rejected_ip = 0
+        self.rejected_account = 0
+        self.lockouts = 0
+        self.errors = 0
+
+    async def check(self, ip: Optional[str], account: str) -> float:
+        """0 if the attempt may proceed, else the seconds to wait"""
+        if not self.enabled:
+            return 0.0
+        self.checks += 1
+        try:
+            if ip:
+                retry_after, _ = await self.buckets.take(f"ip:{ip}", self.ip_limit)
+                if retry_after:
+                    self.rejected_ip += 1
+                    return retry_after
+            retry_after, tokens = await self.buckets.take(f"account:{account.strip().lower()}", self.account_limit)
+            if retry_after:
+                self.rejected_account += 1
+            elif tokens < 1:
+                # Dernier jeton consommé : le compte est verrouillé
+                self.lockouts += 1
+            return retry_after
+        except Exception as e:
+            # Limiteur indisponible : ne pas bloquer les connexions légitimes
+            self.errors += 1
+            logger.error("Login throttle unavailable: %s", e)
+            return 0.0
+
+    async def succeeded(self, account: str):
+        if not self.enabled:
+            return
+        try:
+            await self.buckets.reset(f"account:{account.strip().lower()}")
+        except Exception as e:
+            self.errors += 1
+            logger.error("Login throttle reset failed: %s", e)
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "checks": self.checks,
+            "rejected_ip": self.rejected_ip,
+            "rejected_account": self.rejected_account,
+            "lockouts": self.lockouts,
+            "errors": self.errors,
+            "tracked_keys": self.buckets.size(),
+            "compactions": self.buckets.compactions
+        }
+
+
+def client_ip(request) -> Optional[str]:
+    """Peer address, or the first X-Forwarded-For hop behind a trusted proxy"""
+    if RATE_LIMIT_TRUST_FORWARDED:
+        forwarded = request.headers.get('x-forwarded-for')
+        if forwarded:
+            return forwarded.split(',')[0].strip()
+    return request.client.host if request.client else None
+
+
+def retry_after_header(seconds: float) -> Dict[str, str]:
+    return {"Retry-After": str(max(1, math.ceil(seconds)))}
+
+
+def create_login_throttle(db=None) -> LoginThrottle:
+    """Throttle on the backend selected by RATE_LIMIT_BACKEND"""
+    if RATE_LIMIT_BACKEND == 'sqlite':
+        if db is None:
+            raise ValueError("RATE_LIMIT_BACKEND=sqlite needs a database pool")
+        return LoginThrottle(SQLiteBuckets(db))
+    return LoginThrottle(MemoryBuckets())
@@ -0,0 +1,170 @@
+"""
+SIPORTS v2.0 - Repositories
+Accès aux tables users, wp_sync_log et chat_history derrière une interface
+commune, pour que les endpoints ne dépendent plus de sqlite3. Deux backends :
+le fichier SQLite actuel (via db_pool) ou PostgreSQL asynchrone
+(pg_repositories.py) dès que DATABASE_URL est une URL postgresql://.
+Les catalogues, le limiteur de connexions et le profileur restent sur le
+fichier SQLite local, de même que les tables chat_sessions / chat_messages
+du chatbot Claude (ai_chatbot_system), qu'aucun serveur n'utilise.
+"""
+
+import json
+import logging
+import os
+from contextlib import aclosing
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence, Tuple
+
+from moderation import apply_bulk_status
+from pagination import build_users_query
+from session_store import create_session_store
+from user_counters import read_dashboard_counters, rebuild_user_counters
+from user_import import upsert_users_chunk
+
+logger = logging.getLogger(__name__)
+
+POSTGRES_URL_PREFIXES = ('postgresql://', 'postgres://', 'postgresql+asyncpg://')
+# Fichier SQLite local quand DATABASE_URL pointe vers PostgreSQL
+SQLITE_DATABASE = os.environ.get('SQLITE_DATABASE', 'instance/siports_production.db')
+
+SYNC_LOG_RECENT = 10
+
+
+def is_postgres_url(database_url: str) -> bool:
+    return database_url.startswith(POSTGRES_URL_PREFIXES)
+
+
+def sqlite_database(database_url: str) -> str:
+    """Path of the local SQLite file: DATABASE_URL itself unless it is a PostgreSQL URL"""
+    return SQLITE_DATABASE if is_postgres_url(database_url) else database_url
+
+
+class SQLiteUserRepository:
+    """users table in the application's SQLite file; writes go through the pool's writer"""
+
+    def __init__(self, db):
+        self.db = db
+
+    async def get(self, user_id: int) -> Optional[Dict[str, Any]]:
+        return await self.db.fetchone('SELECT * FROM users WHERE id = ?', (user_id,))
+
+    async def get_by_email(self, email: str) -> Optional[Dict[str, Any]]:
+        return await self.db.fetchone('SELECT * FROM users WHERE email = ?', (email,))
+
+    async def exists(self, email: str) -> bool:
+        return await self.db.fetchone('SELECT id FROM users WHERE email = ?', (email,)) is not None
+
+    async def create(self, fields: Dict[str, Any]) -> int:
+        """Insert a user from column -> value; returns the new id"""
+        columns = list(fields)
+        result = await self.db.execute(
+            f'INSERT INTO users ({", ".join(columns)}) VALUES ({", ".join("?" * len(columns))})',
+            tuple(fields.values())
+        )
+        return result.lastrowid
+
+    async def set_visitor_package(self, user_id: int, package: str):
+        await self.db.execute(
+            'UPDATE users SET visitor_package = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ?',
+            (package, user_id)
+        )
+
+    async def set_status(self, user_id: int, status: str):
+        await self.db.execute(
+            'UPDATE users SET status = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ?',
+            (status, user_id)
+        )
+
+    async def bulk_set_status(self, status: str, user_ids: Optional[Sequence[int]] = None,
+                              filters: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        return await self.db.write(apply_bulk_status, status, user_ids, filters)
+
+    async def dashboard_counters(self) -> Dict[str, Any]:
+        return await self.db.run(read_dashboard_counters)
+
+    async def rebuild_counters(self) -> int:
+        """Recompute user_counters from users; returns the user total"""
+        return await self.db.write(rebuild_user_counters)
+
+    async def list(self, columns: Sequence[str], filters: Dict[str, Any],
+                   after: Optional[Tuple[str, int]] = None, limit: Optional[int] = None,
+                   package: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Users newest first, keyed on (created_at, id); see pagination.build_users_query"""
+        sql, params = build_users_query(columns, filters, after, limit, package)
+        return await self.db.fetchall(sql, tuple(params))
+
+    async def iterate(self, columns: Sequence[str], filters: Dict[str, Any],
+                      package: Optional[str] = None,
+                      batch_size: int = 500) -> AsyncIterator[List[Dict[str, Any]]]:
+        sql, params = build_users_query(columns, filters, package=package)
+        # aclose() de ce générateur ferme aussitôt celui du pool (et rend sa connexion)
+        async with aclosing(self.db.iterate(sql, tuple(params), batch_size)) as batches:
+            async for batch in batches:
+                yield batch
+
+    async def upsert_chunk(self, rows: List[Dict[str, Any]]) -> Dict[str, Any]:
+        return await self.db.write(upsert_users_chunk, rows)
+
+    async def wordpress_link(self, user_id: int) -> Optional[Dict[str, Any]]:
+        return await self.db.fetchone(
+            'SELECT wp_user_id, wp_sync_enabled, last_wp_sync FROM users WHERE id = ?',
+            (user_id,)
+        )
+
+
+class SQLiteSyncLogRepository:
+    """wp_sync_log in the application's SQLite file"""
+
+    def __init__(self, db):
+        self.db = db
+
+    async def add(self, action: str, data: Any, status: str, user_id: Optional[int] = None):
+        await self.db.execute(
+            'INSERT INTO wp_sync_log (user_id, action, data, status) VALUES (?, ?, ?, ?)',
+            (user_id, action, json.dumps(data), status)
+        )
+
+    async def recent(self, user_id: int, limit: int = SYNC_LOG_RECENT) -> List[Dict[str, Any]]:
+        return await self.db.fetchall('''
+            SELECT action, status, created_at, error_message
+            FROM wp_sync_log
+            WHERE user_id = ?
+            ORDER BY created_at DESC
+            LIMIT ?
+        ''', (user_id, limit))
+
+
+class Repositories:
+    """Users, sync log and chat history of one backend"""
+
+    def __init__(self, backend: str, users, sync_log, sessions, database=None):
+        self.backend = backend
+        self.users = users
+        self.sync_log = sync_log
+        self.sessions = sessions
+        self.database = database
+
+    async def init(self):
+        """Schema and seed accounts (the SQLite file is set up by init_database)"""
+        if self.database is not None:
+            await self.database.init()
+
+    async def close(self):
+        if self.database is not None:
+            await self.database.close()
+
+    def metrics(self) -> Dict[str, Any]:
+        if self.database is not None:
+            return {"backend": self.backend, **self.database.metrics()}
+        return {"backend": self.backend}
+
+
+def create_repositories(database_url: str, db=None) -> Repositories:
+    """PostgreSQL repositories for a postgresql:// URL, else SQLite ones on the app's pool"""
+    if is_postgres_url(database_url):
+        # Import différé : SQLAlchemy / asyncpg ne sont requis qu'avec PostgreSQL
+        from pg_repositories import create_postgres_repositories
+        return create_postgres_repositories(database_url)
+    if db is None:
+        raise ValueError("SQLite repositories need a database pool")
+    return Repositories('sqlite', SQLiteUserRepository(db), SQLiteSyncLogRepository(db), create_session_store(db))
@@ -0,0 +1,141 @@
+"""
+SIPORTS v2.0 - Chatbot Response Cache
+Cache LRU + TTL des réponses générées par le LLM, indexé par le message
+normalisé (minuscules, sans accents, espaces réduits) et le contexte.
+Borné en entrées et en mémoire; vidé dès que la base de connaissances du
+chatbot ou un catalogue de forfaits change de version.
+"""
+
+import os
+import re
+import sys
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+CHAT_CACHE_SIZE = int(os.environ.get('CHAT_CACHE_SIZE', 5000))
+CHAT_CACHE_TTL = float(os.environ.get('CHAT_CACHE_TTL', 600))
+CHAT_CACHE_MAX_BYTES = int(os.environ.get('CHAT_CACHE_MAX_BYTES', 16 * 1024 * 1024))
+# Intervalle entre deux vérifications de version de la base de connaissances
+CHAT_CACHE_CHECK_INTERVAL = float(os.environ.get('CHAT_CACHE_CHECK_INTERVAL', 5))
+
+# Par entrée : tuple de clé, tuple (réponse, expiration, taille) et nœud de l'OrderedDict
+ENTRY_OVERHEAD = sys.getsizeof((None, None, None)) * 2 + sys.getsizeof(0.0) + 100
+
+_WHITESPACE = re.compile(r'\s+')
+# Ponctuation finale sans effet sur le sens : "Horaires ?" == "horaires"
+_TRAILING_PUNCTUATION = re.compile(r'[\s?!.…]+$')
+
+
+def normalize_prompt(message: str) -> str:
+    """Lowercase, accent-folded, whitespace-collapsed form of a chat message"""
+    folded = unicodedata.normalize('NFKD', message.casefold())
+    folded = ''.join(c for c in folded if not unicodedata.combining(c))
+    return _TRAILING_PUNCTUATION.sub('', _WHITESPACE.sub(' ', folded).strip())
+
+
+def _entry_size(key: Tuple[str, ...], response: str) -> int:
+    return ENTRY_OVERHEAD + sum(sys.getsizeof(part) for part in key) + sys.getsizeof(response)
+
+
+class ResponseCache:
+    """In-process LRU + TTL cache of chatbot replies with a memory cap.
+
+    A change of knowledge version (see sync_version) drops every entry at
+    once; a generation counter, bumped on each clear, stops a reply whose
+    generation started before the change from being stored afterwards.
+    """
+
+    def __init__(self, max_size: int = CHAT_CACHE_SIZE, ttl: float = CHAT_CACHE_TTL,
+                 max_bytes: int = CHAT_CACHE_MAX_BYTES):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Tuple[str, ...], tuple]" = OrderedDict()
+        self.bytes = 0
+        self.version: Optional[Hashable] = None
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self.evictions = 0
+        self.expired = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_size > 0 and self.ttl > 0
+
+    def get(self, key: Tuple[str, ...]) -> Optional[str]:
+        if not self.enabled:
+            return None
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        response, expires_at, size = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            self.bytes -= size
+            self.expired += 1
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return response
+
+    def put(self, key: Tuple[str, ...], response: str, generation: Optional[int] = None):
+        """Store a reply; skipped if the cache was invalidated since `generation` was read"""
+        if not self.enabled or (generation is not None and generation != self.generation):
+            return
+        size = _entry_size(key, response)
+        if size > self.max_bytes:
+            return
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self.bytes -= previous[2]
+        self._entries[key] = (response, time.monotonic() + self.ttl, size)
+        self.bytes += size
+        while len(self._entries) > self.max_size or self.bytes > self.max_bytes:
+            self.bytes -= self._entries.popitem(last=False)[1][2]
+            self.evictions += 1
+
+    def bypass(self):
+        """Count a request that skipped the cache (personalized or follow-up)"""
+        self.bypassed += 1
+
+    def sync_version(self, version: Hashable):
+        """Drop every entry when the knowledge behind the replies changed"""
+        if version != self.version:
+            if self.version is not None:
+                self.clear()
+            self.version = version
+
+    def clear(self):
+        self.generation += 1
+        if self._entries:
+            self.invalidations += 1
+        self._entries.clear()
+        self.bytes = 0
+
+    def metrics(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "bypassed": self.bypassed,
+            "evictions": self.evictions,
+            "expired": self.expired,
+            "invalidations": self.invalidations
+        }
+
+
+# Instance globale du cache de réponses
+response_cache = ResponseCache()
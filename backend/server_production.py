@@ -8,36 +8,106 @@ Optimisé pour Railway deployment
 
 import os
 import sys
+import time
+from contextlib import aclosing, asynccontextmanager
 from datetime import datetime, timedelta
-from fastapi import FastAPI, HTTPException, Depends, Request
+from fastapi import FastAPI, HTTPException, Depends, Request, Query
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
+from fastapi.responses import StreamingResponse, PlainTextResponse
+from starlette.concurrency import run_in_threadpool
 from pydantic import BaseModel, Field
-from typing import List, Optional
+from typing import List, Optional, Literal
 import jwt
-import secrets
 import json
 import sqlite3
-from werkzeug.security import generate_password_hash, check_password_hash
 import logging
 
 # Import chatbot service
-from chatbot_service import siports_ai_service, ChatRequest, ChatResponse
-
-# Configure logging
-logging.basicConfig(level=logging.INFO)
+from chatbot_service import siports_ai_service, ChatRequest, ChatResponse, SSE_HEADERS, format_sse
+
+# Import data-access layer
+from db_pool import get_db_pool, close_db_pools
+from migrations import run_migrations
+from pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, STREAM_BATCH_SIZE, decode_cursor, paginate
+from moderation import MODERATION_STATUSES, BULK_MODERATION_MAX_IDS
+from repositories import create_repositories, sqlite_database
+from password_hashing import password_hasher, HashPoolSaturated
+from user_cache import user_cache
+from package_catalog import CATALOG_TABLES, PackageCatalog, catalog_response
+from startup import load_jwt_secret, seed_missing_users, start_deferred
+from session_store import WEB_CONCURRENCY
+from user_import import IMPORT_FORMATS, detect_format, import_users, normalize_email
+from user_export import EXPORT_MEDIA_TYPES, EXPORT_USER_COLUMNS, export_chunks, export_filename
+from metrics import MetricsMiddleware, PROMETHEUS_CONTENT_TYPE, http_metrics, metrics_authorized
+from query_profiler import query_profiler
+from rate_limit import client_ip, create_login_throttle, retry_after_header
+from log_pipeline import configure_logging, log_pipeline
+from llm_client import ClientDisconnected, cancel_on_disconnect, ollama_client
+
+# Configure logging (JSON via une file, hors du chemin des requêtes)
+configure_logging()
 logger = logging.getLogger(__name__)
+# Volume élevé : échantillonné par LOG_SAMPLING
+chat_logger = logging.getLogger('siports.chat')
 
 # Configuration
-JWT_SECRET_KEY = os.environ.get('JWT_SECRET_KEY', secrets.token_hex(32))
+# Résolu au démarrage : variable d'environnement ou fichier partagé par les workers
+JWT_SECRET_KEY = os.environ.get('JWT_SECRET_KEY')
+# Chemin SQLite, ou URL postgresql:// pour les tables users / wp_sync_log / chat_history
 DATABASE_URL = os.environ.get('DATABASE_URL', 'instance/siports_production.db')
+SQLITE_DATABASE = sqlite_database(DATABASE_URL)
+
+# Shared connection pool (queries run off the event loop)
+db = get_db_pool(SQLITE_DATABASE)
+repos = create_repositories(DATABASE_URL, db)
+package_catalog = PackageCatalog(db)
+siports_ai_service.use_session_store(repos.sessions)
+siports_ai_service.use_package_catalog(package_catalog)
+login_throttle = create_login_throttle(db)
+
+# Startup pipeline
+async def _warm_package_catalogs():
+    for catalog in CATALOG_TABLES:
+        await package_catalog.get(catalog)
+
+async def _optimize_database():
+    await db.write(lambda conn: conn.execute('PRAGMA optimize'))
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Schema and seed accounts before serving; non-critical setup in background"""
+    logger.info("SIPORTS v2.0 API starting...")
+    logger.info("Database: %s (users: %s)", SQLITE_DATABASE, repos.backend)
+    global JWT_SECRET_KEY
+    JWT_SECRET_KEY = await run_in_threadpool(load_jwt_secret, SQLITE_DATABASE)
+    started = time.perf_counter()
+    await run_in_threadpool(init_database)
+    await repos.init()
+    logger.info("Database ready in %.0f ms", (time.perf_counter() - started) * 1000)
+    
+    deferred = start_deferred(
+        ("package_catalogs", _warm_package_catalogs),
+        ("optimize_database", _optimize_database),
+    )
+    http_metrics.start_loop_monitor()
+    siports_ai_service.start_session_sweeper()
+    yield
+    
+    http_metrics.stop_loop_monitor()
+    siports_ai_service.stop_session_sweeper()
+    await ollama_client.close()
+    deferred.cancel()
+    await repos.close()
+    close_db_pools()
+    password_hasher.close()
 
 # FastAPI app
 app = FastAPI(
     title="SIPORTS v2.0 API",
     description="API pour événements maritimes avec chatbot IA",
-    version="2.0.0"
+    version="2.0.0",
+    lifespan=lifespan
 )
 
 # CORS configuration for production
@@ -49,6 +119,20 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Per-route latency histograms (outermost, so CORS time is included)
+app.add_middleware(MetricsMiddleware, metrics=http_metrics)
+http_metrics.add_source('siports_db', db.metrics)
+http_metrics.add_source('siports_repositories', repos.metrics)
+http_metrics.add_source('siports_password_hashing', password_hasher.metrics)
+http_metrics.add_source('siports_user_cache', user_cache.metrics)
+http_metrics.add_source('siports_query_profiler', query_profiler.metrics)
+http_metrics.add_source('siports_login_throttle', login_throttle.metrics)
+http_metrics.add_source('siports_logging', log_pipeline.metrics)
+http_metrics.add_source('siports_chat_sessions', siports_ai_service.session_metrics)
+http_metrics.add_source('siports_chat_cache', siports_ai_service.response_cache_metrics)
+http_metrics.add_source('siports_chat_coalescing', siports_ai_service.coalescing_metrics)
+http_metrics.add_source('siports_ollama', ollama_client.metrics)
+
 # Security
 security = HTTPBearer()
 
@@ -56,7 +140,7 @@ security = HTTPBearer()
 def init_database():
     """Initialize production database"""
     os.makedirs('instance', exist_ok=True)
-    conn = sqlite3.connect(DATABASE_URL)
+    conn = sqlite3.connect(SQLITE_DATABASE)
     
     # Users table
     conn.execute('''
@@ -76,33 +160,15 @@ def init_database():
         )
     ''')
     
-    # Insert admin user if not exists
-    admin_password = generate_password_hash('admin123')
-    conn.execute('''
-        INSERT OR IGNORE INTO users (email, password_hash, user_type, status, first_name, last_name)
-        VALUES (?, ?, 'admin', 'validated', 'Admin', 'SIPORTS')
-    ''', ('admin@siportevent.com', admin_password))
-    
-    # Sample data
-    visitor_password = generate_password_hash('visitor123')
-    exhibitor_password = generate_password_hash('exhibitor123')
-    
-    conn.execute('''
-        INSERT OR IGNORE INTO users (email, password_hash, user_type, visitor_package, status, first_name, last_name, company)
-        VALUES (?, ?, 'visitor', 'Premium', 'validated', 'Marie', 'Dupont', 'Port Autonome Marseille')
-    ''', ('visitor@example.com', visitor_password))
+    conn.commit()
     
-    conn.execute('''
-        INSERT OR IGNORE INTO users (email, password_hash, user_type, partnership_package, status, first_name, last_name, company)
-        VALUES (?, ?, 'exhibitor', 'Gold', 'validated', 'Jean', 'Martin', 'Maritime Solutions Ltd')
-    ''', ('exposant@example.com', exhibitor_password))
+    # Demo accounts, hashed only when missing
+    seed_missing_users(conn)
     
-    conn.commit()
+    # Versioned schema changes (indexes, added columns)
+    run_migrations(conn)
     conn.close()
 
-# Initialize database on startup
-init_database()
-
 # Models
 class UserLogin(BaseModel):
     email: str
@@ -121,6 +187,21 @@ class PackageUpdate(BaseModel):
     package_type: str
     user_id: int
 
+class BulkModerationFilter(BaseModel):
+    status: str = 'pending'
+    company: Optional[str] = None
+    user_type: Optional[str] = None
+
+class BulkModeration(BaseModel):
+    action: Literal['validate', 'reject']
+    user_ids: Optional[List[int]] = Field(default=None, max_length=BULK_MODERATION_MAX_IDS)
+    filter: Optional[BulkModerationFilter] = None
+
+class ProfilerSettings(BaseModel):
+    enabled: Optional[bool] = None
+    slow_ms: Optional[float] = Field(default=None, ge=0)
+    reset: bool = False
+
 # Helper functions
 def create_jwt_token(user_data: dict) -> str:
     """Create JWT token"""
@@ -132,6 +213,13 @@ def create_jwt_token(user_data: dict) -> str:
     }
     return jwt.encode(payload, JWT_SECRET_KEY, algorithm='HS256')
 
+async def check_login_throttle(request: Request, account: str):
+    """429 before any hashing or database work once the IP or the account is throttled"""
+    retry_after = await login_throttle.check(client_ip(request), account)
+    if retry_after:
+        raise HTTPException(status_code=429, detail="Trop de tentatives de connexion, réessayez plus tard",
+                            headers=retry_after_header(retry_after))
+
 def verify_jwt_token(token: str) -> dict:
     """Verify JWT token"""
     try:
@@ -142,23 +230,23 @@ def verify_jwt_token(token: str) -> dict:
     except jwt.InvalidTokenError:
         raise HTTPException(status_code=401, detail="Token invalide")
 
-def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
+async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
     """Get current user from JWT token"""
     token = credentials.credentials
     payload = verify_jwt_token(token)
     
-    conn = sqlite3.connect(DATABASE_URL)
-    conn.row_factory = sqlite3.Row
-    user = conn.execute(
-        'SELECT * FROM users WHERE id = ?',
-        (payload['user_id'],)
-    ).fetchone()
-    conn.close()
+    user = user_cache.get(payload['user_id'])
+    if user is not None:
+        return user
+    
+    generation = user_cache.generation
+    user = await repos.users.get(payload['user_id'])
     
     if not user:
         raise HTTPException(status_code=401, detail="Utilisateur non trouvé")
     
-    return dict(user)
+    user_cache.put(payload['user_id'], user, generation)
+    return user
 
 def admin_required(user: dict = Depends(get_current_user)):
     """Admin authorization required"""
@@ -174,55 +262,50 @@ def admin_required(user: dict = Depends(get_current_user)):
 async def register(user: UserRegister):
     """User registration"""
     try:
-        conn = sqlite3.connect(DATABASE_URL)
-        
-        # Check if user exists
-        existing = conn.execute(
-            'SELECT id FROM users WHERE email = ?',
-            (user.email,)
-        ).fetchone()
-        
-        if existing:
+        # Check if user exists (same email normalization as the import)
+        email = normalize_email(user.email)
+        if await repos.users.exists(email) or (email != user.email and await repos.users.exists(user.email)):
             raise HTTPException(status_code=400, detail="Utilisateur existant")
         
         # Create user
-        password_hash = generate_password_hash(user.password)
-        cursor = conn.execute('''
-            INSERT INTO users (email, password_hash, user_type, first_name, last_name, company, phone)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        ''', (user.email, password_hash, user.user_type, user.first_name, user.last_name, user.company, user.phone))
-        
-        user_id = cursor.lastrowid
-        conn.commit()
-        conn.close()
+        password_hash = await password_hasher.hash(user.password)
+        user_id = await repos.users.create({
+            'email': email, 'password_hash': password_hash, 'user_type': user.user_type,
+            'first_name': user.first_name, 'last_name': user.last_name, 'company': user.company,
+            'phone': user.phone
+        })
         
         return {"message": "Inscription réussie", "user_id": user_id}
         
+    except HTTPException:
+        raise
+    except HashPoolSaturated as e:
+        logger.warning("Registration rejected: %s", e)
+        raise HTTPException(status_code=503, detail="Service surchargé, réessayez plus tard", headers={"Retry-After": "1"})
     except Exception as e:
-        logger.error(f"Registration error: {str(e)}")
+        logger.error("Registration error: %s", e)
         raise HTTPException(status_code=500, detail="Erreur inscription")
 
 @app.post("/api/auth/login")
-async def login(user: UserLogin):
+async def login(user: UserLogin, request: Request):
     """User login"""
+    email = normalize_email(user.email)
+    await check_login_throttle(request, email)
     try:
-        conn = sqlite3.connect(DATABASE_URL)
-        conn.row_factory = sqlite3.Row
-        
-        db_user = conn.execute(
-            'SELECT * FROM users WHERE email = ?',
-            (user.email,)
-        ).fetchone()
-        conn.close()
+        db_user = await repos.users.get_by_email(email)
+        if db_user is None and email != user.email:
+            # Comptes créés avant la normalisation des emails
+            db_user = await repos.users.get_by_email(user.email)
         
-        if not db_user or not check_password_hash(db_user['password_hash'], user.password):
+        if not db_user or not await password_hasher.verify(db_user['password_hash'], user.password):
             raise HTTPException(status_code=401, detail="Identifiants invalides")
+        await login_throttle.succeeded(email)
         
         if db_user['status'] != 'validated':
             raise HTTPException(status_code=403, detail="Compte en attente de validation")
         
         # Create JWT token
-        user_data = dict(db_user)
+        user_data = db_user
         token = create_jwt_token(user_data)
         
         # Return user data with token
@@ -243,8 +326,11 @@ async def login(user: UserLogin):
         
     except HTTPException:
         raise
+    except HashPoolSaturated as e:
+        logger.warning("Login rejected: %s", e)
+        raise HTTPException(status_code=503, detail="Service surchargé, réessayez plus tard", headers={"Retry-After": "1"})
     except Exception as e:
-        logger.error(f"Login error: {str(e)}")
+        logger.error("Login error: %s", e)
         raise HTTPException(status_code=500, detail="Erreur connexion")
 
 # =============================================================================
@@ -252,100 +338,21 @@ async def login(user: UserLogin):
 # =============================================================================
 
 @app.get("/api/visitor-packages")
-async def get_visitor_packages():
-    """Get visitor packages"""
-    packages = [
-        {
-            "id": 1,
-            "name": "Free Pass",
-            "price": 0,
-            "currency": "€",
-            "description": "Accès gratuit aux espaces d'exposition",
-            "features": [
-                "Accès aux espaces d'exposition",
-                "Conférences publiques",
-                "Application mobile",
-                "Plan du salon"
-            ],
-            "limitations": {
-                "b2b_meetings": 0,
-                "networking": "Limité"
-            }
-        },
-        {
-            "id": 2,
-            "name": "Basic Pass",
-            "price": 150,
-            "currency": "€",
-            "description": "Pass essentiel pour 1 journée",
-            "features": [
-                "Tout du Free Pass",
-                "2 rendez-vous B2B garantis",
-                "Accès aux pauses café",
-                "Badge visiteur personnalisé"
-            ],
-            "limitations": {
-                "b2b_meetings": 2,
-                "networking": "Standard"
-            }
-        },
-        {
-            "id": 3,
-            "name": "Premium Pass",
-            "price": 350,
-            "currency": "€",
-            "description": "Pass complet pour 2 journées",
-            "features": [
-                "Tout du Basic Pass",
-                "5 rendez-vous B2B garantis",
-                "Ateliers techniques spécialisés",
-                "Déjeuners networking",
-                "Accès zone VIP"
-            ],
-            "popular": True,
-            "limitations": {
-                "b2b_meetings": 5,
-                "networking": "Avancé"
-            }
-        },
-        {
-            "id": 4,
-            "name": "VIP Pass",
-            "price": 750,
-            "currency": "€",
-            "description": "Accès privilégié 3 journées complètes",
-            "features": [
-                "Tout du Premium Pass",
-                "Rendez-vous B2B illimités",
-                "Soirée de gala exclusive",
-                "Conférences privées C-Level",
-                "Service de conciergerie",
-                "Transferts inclus"
-            ],
-            "limitations": {
-                "b2b_meetings": "unlimited",
-                "networking": "Premium"
-            }
-        }
-    ]
-    return {"packages": packages}
+async def get_visitor_packages(request: Request):
+    """Get visitor packages (pre-encoded, ETag / If-None-Match)"""
+    return catalog_response(request, await package_catalog.get('visitor'))
 
 @app.post("/api/visitor-packages/update")
 async def update_visitor_package(data: PackageUpdate, user: dict = Depends(get_current_user)):
     """Update user's visitor package"""
     try:
-        conn = sqlite3.connect(DATABASE_URL)
-        conn.execute(
-            'UPDATE users SET visitor_package = ? WHERE id = ?',
-            (data.package_type, user['id'])
-        )
-        conn.commit()
-        conn.close()
+        await repos.users.set_visitor_package(user['id'], data.package_type)
+        user_cache.invalidate(user['id'])
         
         return {"message": "Forfait mis à jour avec succès"}
         
     except Exception as e:
-        logger.error(f"Package update error: {str(e)}")
+        logger.error("Package update error: %s", e)
         raise HTTPException(status_code=500, detail="Erreur mise à jour forfait")
 
 # =============================================================================
@@ -353,75 +360,9 @@ async def update_visitor_package(data: PackageUpdate, user: dict = Depends(get_c
 # =============================================================================
 
 @app.get("/api/partnership-packages")
-async def get_partnership_packages():
-    """Get partnership packages"""
-    packages = [
-        {
-            "id": 1,
-            "name": "Startup Package",
-            "price": 2500,
-            "currency": "$",
-            "description": "Idéal pour les jeunes entreprises maritimes",
-            "features": [
-                "Stand 6m² (2x3m)",
-                "2 badges exposant",
-                "Listing annuaire digital",
-                "Support technique de base"
-            ],
-            "category": "startup"
-        },
-        {
-            "id": 2,
-            "name": "Silver Package", 
-            "price": 8000,
-            "currency": "$",
-            "description": "Package standard pour exposants confirmés",
-            "features": [
-                "Stand 12m² (3x4m)",
-                "4 badges exposant",
-                "Mobilier standard inclus",
-                "1 session de networking sponsorisée",
-                "Présence catalogue premium"
-            ],
-            "category": "standard"
-        },
-        {
-            "id": 3,
-            "name": "Gold Package",
-            "price": 15000,
-            "currency": "$", 
-            "description": "Package avancé avec visibilité renforcée",
-            "features": [
-                "Stand 20m² (4x5m) - Emplacement premium",
-                "6 badges exposant",
-                "Mobilier sur-mesure",
-                "2 conférences sponsorisées (30min)",
-                "Logo sur supports officiels",
-                "1 cocktail networking privé"
-            ],
-            "popular": True,
-            "category": "premium"
-        },
-        {
-            "id": 4,
-            "name": "Platinum Package",
-            "price": 25000,
-            "currency": "$",
-            "description": "Package prestige - Partenaire officiel",
-            "features": [
-                "Stand 40m² (5x8m) - Hall d'entrée",
-                "10 badges exposant",
-                "Design stand personnalisé",
-                "Keynote session dédiée (45min)",
-                "Mini-site SIPORTS Premium dédié",
-                "Branding événement (logos, panneaux)",
-                "Dîner VIP avec comité d'organisation",
-                "Communiqué de presse co-signé"
-            ],
-            "category": "prestige"
-        }
-    ]
-    return {"packages": packages}
+async def get_partnership_packages(request: Request):
+    """Get partnership packages (pre-encoded, ETag / If-None-Match)"""
+    return catalog_response(request, await package_catalog.get('partnership'))
 
 # =============================================================================
 # ADMIN ENDPOINTS
@@ -431,130 +372,206 @@ async def get_partnership_packages():
 async def get_admin_stats(admin: dict = Depends(admin_required)):
     """Get admin dashboard statistics"""
     try:
-        conn = sqlite3.connect(DATABASE_URL)
-        
-        # Count users by type
-        total_users = conn.execute('SELECT COUNT(*) FROM users').fetchone()[0]
-        visitors = conn.execute('SELECT COUNT(*) FROM users WHERE user_type = "visitor"').fetchone()[0]
-        exhibitors = conn.execute('SELECT COUNT(*) FROM users WHERE user_type = "exhibitor"').fetchone()[0]
-        partners = conn.execute('SELECT COUNT(*) FROM users WHERE user_type = "partner"').fetchone()[0]
-        
-        # Count by status
-        pending = conn.execute('SELECT COUNT(*) FROM users WHERE status = "pending"').fetchone()[0]
-        validated = conn.execute('SELECT COUNT(*) FROM users WHERE status = "validated"').fetchone()[0]
-        rejected = conn.execute('SELECT COUNT(*) FROM users WHERE status = "rejected"').fetchone()[0]
-        
-        conn.close()
-        
-        return {
-            "total_users": total_users,
-            "visitors": visitors,
-            "exhibitors": exhibitors,
-            "partners": partners,
-            "pending": pending,
-            "validated": validated,
-            "rejected": rejected
-        }
+        stats = await repos.users.dashboard_counters()
+        stats.pop('wordpress_synced')
+        return stats
         
     except Exception as e:
-        logger.error(f"Admin stats error: {str(e)}")
+        logger.error("Admin stats error: %s", e)
         raise HTTPException(status_code=500, detail="Erreur statistiques")
 
+PENDING_USER_COLUMNS = ['id', 'email', 'first_name', 'last_name', 'company', 'user_type', 'created_at']
+
 @app.get("/api/admin/users/pending")
-async def get_pending_users(admin: dict = Depends(admin_required)):
-    """Get users pending validation"""
+async def get_pending_users(
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    user_type: Optional[str] = None,
+    company: Optional[str] = None,
+    admin: dict = Depends(admin_required)
+):
+    """Get users pending validation (keyset pagination on created_at, id)"""
     try:
-        conn = sqlite3.connect(DATABASE_URL)
-        conn.row_factory = sqlite3.Row
-        
-        users = conn.execute('''
-            SELECT id, email, first_name, last_name, company, user_type, created_at
-            FROM users WHERE status = 'pending'
-            ORDER BY created_at DESC
-        ''').fetchall()
-        conn.close()
+        after = decode_cursor(cursor) if cursor else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Curseur invalide")
+    
+    try:
+        rows = await repos.users.list(
+            PENDING_USER_COLUMNS,
+            {'status': 'pending', 'user_type': user_type, 'company': company},
+            after, limit + 1
+        )
+        users, next_cursor = paginate(rows, limit)
         
-        return {"users": [dict(user) for user in users]}
+        return {"users": users, "next_cursor": next_cursor}
         
     except Exception as e:
-        logger.error(f"Pending users error: {str(e)}")
+        logger.error("Pending users error: %s", e)
         raise HTTPException(status_code=500, detail="Erreur récupération utilisateurs")
 
+@app.get("/api/admin/users/pending/stream")
+async def stream_pending_users(
+    user_type: Optional[str] = None,
+    company: Optional[str] = None,
+    admin: dict = Depends(admin_required)
+):
+    """Stream every pending user as NDJSON, one fetchmany batch at a time"""
+    filters = {'status': 'pending', 'user_type': user_type, 'company': company}
+    
+    async def ndjson_rows():
+        async for batch in repos.users.iterate(PENDING_USER_COLUMNS, filters, batch_size=STREAM_BATCH_SIZE):
+            yield ''.join(json.dumps(user, ensure_ascii=False) + '\n' for user in batch)
+    
+    return StreamingResponse(ndjson_rows(), media_type="application/x-ndjson")
+
 @app.post("/api/admin/users/{user_id}/validate")
 async def validate_user(user_id: int, admin: dict = Depends(admin_required)):
     """Validate a user"""
     try:
-        conn = sqlite3.connect(DATABASE_URL)
-        conn.execute(
-            'UPDATE users SET status = "validated" WHERE id = ?',
-            (user_id,)
-        )
-        conn.commit()
-        conn.close()
+        await repos.users.set_status(user_id, 'validated')
+        user_cache.invalidate(user_id)
         
         return {"message": "Utilisateur validé avec succès"}
         
     except Exception as e:
-        logger.error(f"User validation error: {str(e)}")
+        logger.error("User validation error: %s", e)
         raise HTTPException(status_code=500, detail="Erreur validation utilisateur")
 
 @app.post("/api/admin/users/{user_id}/reject") 
 async def reject_user(user_id: int, admin: dict = Depends(admin_required)):
     """Reject a user"""
     try:
-        conn = sqlite3.connect(DATABASE_URL)
-        conn.execute(
-            'UPDATE users SET status = "rejected" WHERE id = ?',
-            (user_id,)
-        )
-        conn.commit()
-        conn.close()
+        await repos.users.set_status(user_id, 'rejected')
+        user_cache.invalidate(user_id)
         
         return {"message": "Utilisateur rejeté"}
         
     except Exception as e:
-        logger.error(f"User rejection error: {str(e)}")
+        logger.error("User rejection error: %s", e)
         raise HTTPException(status_code=500, detail="Erreur rejet utilisateur")
 
+@app.post("/api/admin/users/bulk")
+async def bulk_moderate_users(data: BulkModeration, admin: dict = Depends(admin_required)):
+    """Validate or reject many users (ids or filter) in one transaction"""
+    if (data.user_ids is None) == (data.filter is None):
+        raise HTTPException(status_code=400, detail="Fournir user_ids ou filter")
+    
+    try:
+        result = await repos.users.bulk_set_status(
+            MODERATION_STATUSES[data.action],
+            data.user_ids,
+            data.filter.dict() if data.filter else None
+        )
+        user_cache.invalidate_many(
+            item['user_id'] for item in result['results'] if item['result'] != 'not_found'
+        )
+        return result
+        
+    except Exception as e:
+        logger.error("Bulk moderation error: %s", e)
+        raise HTTPException(status_code=500, detail="Erreur modération groupée")
+
+@app.post("/api/admin/users/import")
+async def import_users_endpoint(
+    request: Request,
+    fmt: Optional[Literal['csv', 'ndjson']] = Query(None, alias="format"),
+    status: Literal['pending', 'validated'] = 'pending',
+    admin: dict = Depends(admin_required)
+):
+    """Stream-import users from a CSV or NDJSON body (upsert on email, per-row errors)"""
+    fmt = fmt or detect_format(request.headers.get('content-type', ''))
+    if fmt not in IMPORT_FORMATS:
+        raise HTTPException(status_code=400, detail="Format non supporté (csv ou ndjson)")
+    
+    try:
+        return await import_users(request.stream(), fmt, repos.users, password_hasher, default_status=status)
+        
+    except Exception as e:
+        logger.error("User import error: %s", e)
+        raise HTTPException(status_code=500, detail="Erreur import utilisateurs")
+
+@app.get("/api/admin/users/export")
+async def export_users(
+    fmt: Literal['csv', 'ndjson'] = Query('csv', alias="format"),
+    status: Optional[str] = None,
+    user_type: Optional[str] = None,
+    package: Optional[str] = None,
+    gzip: bool = False,
+    admin: dict = Depends(admin_required)
+):
+    """Stream users as CSV (Excel) or NDJSON, filtered by status, user_type and package"""
+    rows = repos.users.iterate(
+        EXPORT_USER_COLUMNS,
+        {'status': status, 'user_type': user_type},
+        package=package, batch_size=STREAM_BATCH_SIZE
+    )
+    filename = export_filename(fmt)
+    headers = {"Content-Disposition": f'attachment; filename="{filename}"'}
+    if gzip:
+        headers["Content-Encoding"] = "gzip"
+    
+    return StreamingResponse(
+        export_chunks(rows, fmt, EXPORT_USER_COLUMNS, compress=gzip),
+        media_type=EXPORT_MEDIA_TYPES[fmt],
+        headers=headers
+    )
+
 # =============================================================================
 # AI CHATBOT ENDPOINTS
 # =============================================================================
 
 @app.post("/api/chat", response_model=ChatResponse)
-async def chat_endpoint(request: ChatRequest):
+async def chat_endpoint(request: ChatRequest, http_request: Request):
     """Main AI chatbot endpoint"""
     try:
-        response = await siports_ai_service.generate_response(request)
-        logger.info(f"Chatbot response generated for context: {request.context_type}")
+        # Génération annulée si le client se déconnecte avant la réponse
+        response = await cancel_on_disconnect(http_request, siports_ai_service.generate_response(request))
+        chat_logger.info("Chatbot response generated for context: %s", request.context_type)
         return response
         
+    except ClientDisconnected:
+        logger.info("Chat generation cancelled: client disconnected")
+        raise HTTPException(status_code=499, detail="Client déconnecté")
     except Exception as e:
-        logger.error(f"Chatbot error: {str(e)}")
+        logger.error("Chatbot error: %s", e)
         raise HTTPException(status_code=500, detail="Erreur chatbot")
 
 @app.post("/api/chat/exhibitor", response_model=ChatResponse)
-async def exhibitor_chat_endpoint(request: ChatRequest):
+async def exhibitor_chat_endpoint(request: ChatRequest, http_request: Request):
     """Specialized endpoint for exhibitor recommendations"""
     request.context_type = "exhibitor"
-    return await chat_endpoint(request)
+    return await chat_endpoint(request, http_request)
 
 @app.post("/api/chat/package", response_model=ChatResponse) 
-async def package_chat_endpoint(request: ChatRequest):
+async def package_chat_endpoint(request: ChatRequest, http_request: Request):
     """Specialized endpoint for package suggestions"""
     request.context_type = "package"
-    return await chat_endpoint(request)
+    return await chat_endpoint(request, http_request)
 
 @app.post("/api/chat/event", response_model=ChatResponse)
-async def event_chat_endpoint(request: ChatRequest):
+async def event_chat_endpoint(request: ChatRequest, http_request: Request):
     """Specialized endpoint for event information"""
     request.context_type = "event"
-    return await chat_endpoint(request)
+    return await chat_endpoint(request, http_request)
+
+@app.post("/api/chat/stream")
+async def chat_stream_endpoint(request: ChatRequest):
+    """Chatbot response as server-sent events: token chunks, then done (suggested_actions, confidence)"""
+    async def events():
+        # Client déconnecté : Starlette abandonne ce générateur, sa fermeture ferme la génération
+        async with aclosing(siports_ai_service.stream_response(request)) as stream:
+            async for event in stream:
+                yield format_sse(event)
+        chat_logger.info("Chatbot response streamed for context: %s", request.context_type)
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers=SSE_HEADERS)
 
 @app.get("/api/chatbot/health")
 async def chatbot_health_check():
     """Chatbot health check"""
     try:
-        test_request = ChatRequest(message="test health", context_type="general")
+        test_request = ChatRequest(message="test health", context_type="general", bypass_cache=True)
         response = await siports_ai_service.generate_response(test_request)
         
         return {
@@ -565,9 +582,43 @@ async def chatbot_health_check():
             "test_response_length": len(response.response)
         }
     except Exception as e:
-        logger.error(f"Chatbot health check failed: {str(e)}")
+        logger.error("Chatbot health check failed: %s", e)
         return {"status": "unhealthy", "error": str(e)}
 
+@app.get("/api/admin/db/metrics")
+async def get_db_metrics(admin: dict = Depends(admin_required)):
+    """Connection pool wait and query time metrics"""
+    return {**db.metrics(), "repositories": repos.metrics()}
+
+@app.get("/api/admin/auth/metrics")
+async def get_hashing_metrics(admin: dict = Depends(admin_required)):
+    """Password hashing pool latency, queue wait and rejections, plus login throttling"""
+    return {**password_hasher.metrics(), "login_throttle": login_throttle.metrics()}
+
+@app.get("/api/admin/cache/metrics")
+async def get_cache_metrics(admin: dict = Depends(admin_required)):
+    """Authenticated-user cache hit/miss counters"""
+    return user_cache.metrics()
+
+@app.get("/api/admin/db/queries")
+async def get_query_profile(
+    limit: int = Query(20, ge=1, le=200),
+    admin: dict = Depends(admin_required)
+):
+    """Top SQL statements by total and p99 time, plus the slow-query log"""
+    return query_profiler.report(limit)
+
+@app.post("/api/admin/db/profiler")
+async def configure_query_profiler(settings: ProfilerSettings, admin: dict = Depends(admin_required)):
+    """Enable/disable the query profiler or change the slow-query threshold at runtime"""
+    query_profiler.configure(enabled=settings.enabled, slow_ms=settings.slow_ms)
+    if settings.reset:
+        query_profiler.reset()
+    return {
+        "enabled": query_profiler.enabled,
+        "slow_query_ms": round(query_profiler.slow_threshold * 1000, 3)
+    }
+
 # =============================================================================
 # HEALTH CHECK
 # =============================================================================
@@ -577,23 +628,23 @@ async def root():
     """Root endpoint"""
     return {"message": "SIPORTS v2.0 API", "status": "active", "version": "2.0.0"}
 
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics(request: Request):
+    """Prometheus text exposition (open unless METRICS_TOKEN is set)"""
+    if not metrics_authorized(request.headers.get('authorization')):
+        raise HTTPException(status_code=401, detail="Token métriques invalide")
+    return PlainTextResponse(http_metrics.render(), media_type=PROMETHEUS_CONTENT_TYPE)
+
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
     return {"status": "healthy", "service": "siports-api", "version": "2.0.0"}
 
-# =============================================================================
-# STARTUP EVENT
-# =============================================================================
-
-@app.on_event("startup")
-async def startup_event():
-    """Initialize application on startup"""
-    logger.info("SIPORTS v2.0 API starting...")
-    logger.info(f"Database: {DATABASE_URL}")
-    logger.info("AI Chatbot service initialized")
-
 if __name__ == "__main__":
     import uvicorn
     port = int(os.environ.get("PORT", 8001))
-    uvicorn.run(app, host="0.0.0.0", port=port)
\ No newline at end of file
+    if WEB_CONCURRENCY > 1:
+        # Plusieurs workers : uvicorn a besoin du chemin d'import de l'app
+        uvicorn.run("server_production:app", host="0.0.0.0", port=port, workers=WEB_CONCURRENCY, log_config=None)
+    else:
+        uvicorn.run(app, host="0.0.0.0", port=port, log_config=None)
\ No newline at end of file
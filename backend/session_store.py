@@ -0,0 +1,226 @@
+"""
+SIPORTS v2.0 - Chat Session Store
+Historique des conversations du chatbot. En mono-processus il reste en
+mémoire, borné (LRU, TTL d'inactivité, plafond mémoire); avec plusieurs
+workers uvicorn il passe dans la base partagée (SQLite, ou PostgreSQL via
+repositories.py) pour qu'une session garde son contexte quel que soit le
+worker qui reçoit la requête.
+"""
+
+import logging
+import os
+import sqlite3
+import sys
+import time
+from collections import OrderedDict, deque
+from itertools import islice
+from typing import Any, Deque, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+WEB_CONCURRENCY = int(os.environ.get('WEB_CONCURRENCY', 1))
+# memory | database (par défaut database dès qu'il y a plusieurs workers; 'sqlite' reste accepté)
+SESSION_STORE = os.environ.get('SESSION_STORE', 'database' if WEB_CONCURRENCY > 1 else 'memory')
+SESSION_HISTORY_SIZE = int(os.environ.get('SESSION_HISTORY_SIZE', 20))
+SESSION_IDLE_TTL = float(os.environ.get('SESSION_IDLE_TTL', 24 * 3600))
+# Plafonds du store mémoire : au-delà, les sessions les moins récentes sont évincées
+SESSION_MAX_SESSIONS = int(os.environ.get('SESSION_MAX_SESSIONS', 20000))
+SESSION_MAX_BYTES = int(os.environ.get('SESSION_MAX_BYTES', 64 * 1024 * 1024))
+SESSION_SWEEP_INTERVAL = float(os.environ.get('SESSION_SWEEP_INTERVAL', 60))
+
+# Estimation mémoire : dict du message + float ; par session, la deque plus
+# ~200 octets pour la clé, le nœud de l'OrderedDict et l'objet _MemorySession
+MESSAGE_OVERHEAD = sys.getsizeof({"role": "", "content": "", "timestamp": 0.0}) + sys.getsizeof(0.0)
+SESSION_OVERHEAD = sys.getsizeof(deque()) + 200
+
+CHAT_HISTORY_SCHEMA = [
+    '''
+    CREATE TABLE IF NOT EXISTS chat_history (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        session_id TEXT NOT NULL,
+        role TEXT NOT NULL,
+        content TEXT NOT NULL,
+        timestamp REAL NOT NULL
+    )
+    ''',
+    'CREATE INDEX IF NOT EXISTS idx_chat_history_session ON chat_history (session_id, id)',
+    'CREATE INDEX IF NOT EXISTS idx_chat_history_timestamp ON chat_history (timestamp)',
+]
+
+
+def install_chat_history(conn: sqlite3.Connection):
+    for statement in CHAT_HISTORY_SCHEMA:
+        conn.execute(statement)
+
+
+class _MemorySession:
+    __slots__ = ('history', 'last_access', 'size')
+
+    def __init__(self, history_size: int):
+        # Tampon circulaire : le message le plus ancien sort tout seul
+        self.history: Deque[Dict[str, Any]] = deque(maxlen=history_size)
+        self.last_access = time.monotonic()
+        self.size = SESSION_OVERHEAD
+
+
+def _message_size(content: str) -> int:
+    return MESSAGE_OVERHEAD + sys.getsizeof(content)
+
+
+class MemorySessionStore:
+    """Per-process history, bounded: LRU order, idle TTL, session and memory caps.
+
+    Sessions live in an OrderedDict from least to most recently used, so both
+    LRU eviction and the idle sweep only ever pop from the front. Sizes are
+    estimates from sys.getsizeof on the message contents plus a fixed
+    per-message and per-session overhead.
+    """
+
+    def __init__(self, history_size: int = SESSION_HISTORY_SIZE, idle_ttl: float = SESSION_IDLE_TTL,
+                 max_sessions: int = SESSION_MAX_SESSIONS, max_bytes: int = SESSION_MAX_BYTES):
+        self.history_size = history_size
+        self.idle_ttl = idle_ttl
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+        self.sessions: 'OrderedDict[str, _MemorySession]' = OrderedDict()
+        self.bytes = 0
+        self.evictions = 0
+        self.expired = 0
+
+    def _touch(self, session_id: str) -> Optional[_MemorySession]:
+        session = self.sessions.get(session_id)
+        if session is None:
+            return None
+        now = time.monotonic()
+        if now - session.last_access > self.idle_ttl:
+            self._drop(session_id)
+            self.expired += 1
+            return None
+        session.last_access = now
+        self.sessions.move_to_end(session_id)
+        return session
+
+    def _drop(self, session_id: str):
+        self.bytes -= self.sessions.pop(session_id).size
+
+    def _enforce_limits(self):
+        # La session courante est en fin de file : elle n'est jamais évincée
+        while len(self.sessions) > 1 and (len(self.sessions) > self.max_sessions or self.bytes > self.max_bytes):
+            self._drop(next(iter(self.sessions)))
+            self.evictions += 1
+
+    async def append(self, session_id: str, role: str, content: str):
+        session = self._touch(session_id)
+        if session is None:
+            session = self.sessions[session_id] = _MemorySession(self.history_size)
+            self.bytes += session.size
+        history = session.history
+        if len(history) == history.maxlen:
+            freed = _message_size(history[0]['content'])
+            session.size -= freed
+            self.bytes -= freed
+        history.append({"role": role, "content": content, "timestamp": time.time()})
+        added = _message_size(content)
+        session.size += added
+        self.bytes += added
+        self._enforce_limits()
+
+    async def recent(self, session_id: str, limit: int = SESSION_HISTORY_SIZE) -> List[Dict[str, Any]]:
+        session = self._touch(session_id)
+        if session is None:
+            return []
+        history = session.history
+        return list(islice(history, max(0, len(history) - limit), None))
+
+    async def clear(self, session_id: str) -> bool:
+        if session_id not in self.sessions:
+            return False
+        self._drop(session_id)
+        return True
+
+    async def sweep(self, idle_ttl: Optional[float] = None) -> int:
+        cutoff = time.monotonic() - (self.idle_ttl if idle_ttl is None else idle_ttl)
+        removed = 0
+        while self.sessions:
+            session_id, session = next(iter(self.sessions.items()))
+            if session.last_access >= cutoff:
+                break
+            self._drop(session_id)
+            removed += 1
+        self.expired += removed
+        return removed
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "backend": "memory",
+            "sessions": len(self.sessions),
+            "bytes": self.bytes,
+            "max_sessions": self.max_sessions,
+            "max_bytes": self.max_bytes,
+            "evictions": self.evictions,
+            "expired": self.expired,
+        }
+
+
+class SQLiteSessionStore:
+    """History shared by all workers through the application database.
+
+    Appends go through the pool's single writer and trim the session to its
+    last history_size messages in the same transaction.
+    """
+
+    def __init__(self, db, history_size: int = SESSION_HISTORY_SIZE):
+        self.db = db
+        self.history_size = history_size
+
+    def _append(self, conn, session_id: str, role: str, content: str):
+        conn.execute(
+            'INSERT INTO chat_history (session_id, role, content, timestamp) VALUES (?, ?, ?, ?)',
+            (session_id, role, content, time.time())
+        )
+        conn.execute('''
+            DELETE FROM chat_history WHERE session_id = ? AND id <= (
+                SELECT id FROM chat_history WHERE session_id = ?
+                ORDER BY id DESC LIMIT 1 OFFSET ?
+            )
+        ''', (session_id, session_id, self.history_size))
+
+    async def append(self, session_id: str, role: str, content: str):
+        await self.db.write(self._append, session_id, role, content)
+
+    async def recent(self, session_id: str, limit: int = SESSION_HISTORY_SIZE) -> List[Dict[str, Any]]:
+        rows = await self.db.fetchall(
+            'SELECT role, content, timestamp FROM chat_history WHERE session_id = ? ORDER BY id DESC LIMIT ?',
+            (session_id, limit)
+        )
+        return rows[::-1]
+
+    async def clear(self, session_id: str) -> bool:
+        result = await self.db.execute('DELETE FROM chat_history WHERE session_id = ?', (session_id,))
+        return result.rowcount > 0
+
+    async def sweep(self, idle_ttl: float = SESSION_IDLE_TTL) -> int:
+        result = await self.db.execute('''
+            DELETE FROM chat_history WHERE session_id IN (
+                SELECT session_id FROM chat_history GROUP BY session_id HAVING MAX(timestamp) < ?
+            )
+        ''', (time.time() - idle_ttl,))
+        return result.rowcount
+
+    def metrics(self) -> Dict[str, Any]:
+        return {"backend": "sqlite"}
+
+
+def shared_session_store() -> bool:
+    return SESSION_STORE in ('database', 'sqlite')
+
+
+def create_session_store(db=None):
+    """Store selected by SESSION_STORE; the SQLite one needs the app's pool"""
+    if shared_session_store():
+        if db is None:
+            raise ValueError(f"SESSION_STORE={SESSION_STORE} needs a database pool")
+        return SQLiteSessionStore(db)
+    if WEB_CONCURRENCY > 1:
+        logger.warning("SESSION_STORE=memory with several workers: chat context is not shared")
+    return MemorySessionStore()
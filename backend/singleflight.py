@@ -0,0 +1,77 @@
+"""
+SIPORTS v2.0 - Request Coalescing
+Regroupement des appels identiques en cours (singleflight) : tant qu'une
+génération est en cours pour une clé, les appels suivants avec la même clé
+attendent son résultat au lieu d'en lancer une nouvelle. La génération
+n'est annulée que si plus aucun appelant ne l'attend.
+"""
+
+import asyncio
+import os
+from typing import Any, Awaitable, Callable, Dict, Hashable, TypeVar
+
+# CHAT_COALESCING=false : chaque requête lance sa propre génération
+CHAT_COALESCING = os.environ.get('CHAT_COALESCING', 'true').lower() == 'true'
+
+T = TypeVar('T')
+
+
+class _Call:
+    __slots__ = ('task', 'waiters')
+
+    def __init__(self, task: asyncio.Future):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Concurrent calls with the same key share one execution.
+
+    Each caller awaits the shared task through asyncio.shield, so a caller
+    that goes away does not cancel the work for the others; the last one
+    to leave cancels it. The key is forgotten as soon as the task finishes:
+    results are not kept (that is the response cache's job).
+    """
+
+    def __init__(self, enabled: bool = CHAT_COALESCING):
+        self.enabled = enabled
+        self._calls: Dict[Hashable, _Call] = {}
+        self.executions = 0
+        self.coalesced = 0
+        self.cancelled = 0
+
+    def _forget(self, key: Hashable, call: _Call):
+        if self._calls.get(key) is call:
+            del self._calls[key]
+
+    async def do(self, key: Hashable, factory: Callable[[], Awaitable[T]]) -> T:
+        """Result of factory(), shared with every concurrent call using the same key"""
+        if not self.enabled:
+            return await factory()
+        call = self._calls.get(key)
+        if call is None:
+            call = self._calls[key] = _Call(asyncio.ensure_future(factory()))
+            call.task.add_done_callback(lambda _: self._forget(key, call))
+            self.executions += 1
+        else:
+            self.coalesced += 1
+        call.waiters += 1
+        try:
+            return await asyncio.shield(call.task)
+        except asyncio.CancelledError:
+            # Dernier appelant parti : inutile de poursuivre le travail
+            if call.waiters == 1 and not call.task.done():
+                call.task.cancel()
+                self.cancelled += 1
+            raise
+        finally:
+            call.waiters -= 1
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "in_flight": len(self._calls),
+            "executions": self.executions,
+            "coalesced": self.coalesced,
+            "cancelled": self.cancelled,
+        }
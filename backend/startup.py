@@ -0,0 +1,119 @@
+"""
+SIPORTS v2.0 - Startup Pipeline
+Étapes de démarrage appelées depuis le lifespan FastAPI : les comptes de
+démonstration ne sont créés (et hachés) que s'ils manquent, et le travail
+non critique est reporté dans une tâche de fond.
+"""
+
+import asyncio
+import logging
+import os
+import secrets
+import sqlite3
+import time
+from typing import Awaitable, Callable, Tuple
+
+from werkzeug.security import generate_password_hash
+
+logger = logging.getLogger(__name__)
+
+# (email, mot de passe, colonnes additionnelles)
+SEED_USERS = [
+    ('admin@siportevent.com', 'admin123', {
+        'user_type': 'admin', 'status': 'validated',
+        'first_name': 'Admin', 'last_name': 'SIPORTS'
+    }),
+    ('visitor@example.com', 'visitor123', {
+        'user_type': 'visitor', 'visitor_package': 'Premium', 'status': 'validated',
+        'first_name': 'Marie', 'last_name': 'Dupont', 'company': 'Port Autonome Marseille'
+    }),
+    ('exposant@example.com', 'exhibitor123', {
+        'user_type': 'exhibitor', 'partnership_package': 'Gold', 'status': 'validated',
+        'first_name': 'Jean', 'last_name': 'Martin', 'company': 'Maritime Solutions Ltd'
+    }),
+]
+
+DeferredStep = Tuple[str, Callable[[], Awaitable[None]]]
+
+JWT_SECRET_FILENAME = 'jwt_secret'
+
+
+def load_jwt_secret(database_url: str) -> str:
+    """JWT_SECRET_KEY, or a secret generated once and shared by all workers.
+
+    The secret is stored in JWT_SECRET_FILE (default: next to the database)
+    and published with a hard link, so workers booting together all end up
+    reading the same value.
+    """
+    secret = os.environ.get('JWT_SECRET_KEY')
+    if secret:
+        return secret
+
+    path = os.environ.get('JWT_SECRET_FILE') or os.path.join(
+        os.path.dirname(os.path.abspath(database_url)), JWT_SECRET_FILENAME)
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, 'w') as f:
+            f.write(secrets.token_hex(32))
+        try:
+            os.link(tmp_path, path)
+            logger.info("JWT secret generated in %s", path)
+        except FileExistsError:
+            pass
+        finally:
+            os.unlink(tmp_path)
+
+    with open(path) as f:
+        return f.read().strip()
+
+
+def seed_missing_users(conn: sqlite3.Connection) -> int:
+    """Insert the seed accounts that are missing; returns how many were created.
+
+    Passwords are only hashed for missing rows, so a normal boot costs one
+    indexed lookup instead of three PBKDF2 rounds.
+    """
+    emails = [email for email, _, _ in SEED_USERS]
+    placeholders = ','.join('?' * len(emails))
+    existing = {row[0] for row in conn.execute(
+        f'SELECT email FROM users WHERE email IN ({placeholders})', emails
+    )}
+
+    created = 0
+    for email, password, fields in SEED_USERS:
+        if email in existing:
+            continue
+        columns = ['email', 'password_hash'] + list(fields)
+        conn.execute(
+            f'INSERT OR IGNORE INTO users ({", ".join(columns)}) VALUES ({", ".join("?" * len(columns))})',
+            [email, generate_password_hash(password)] + list(fields.values())
+        )
+        created += 1
+
+    if created:
+        conn.commit()
+        logger.info("Comptes de démonstration créés: %s", created)
+    return created
+
+
+async def _run_deferred(steps: Tuple[DeferredStep, ...]):
+    for name, step in steps:
+        started = time.perf_counter()
+        try:
+            await step()
+            logger.info("Deferred startup step '%s' done in %.0f ms", name, (time.perf_counter() - started) * 1000)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning("Deferred startup step '%s' failed: %s", name, e)
+
+
+def start_deferred(*steps: DeferredStep) -> asyncio.Task:
+    """Run non-critical startup steps in the background, in order.
+
+    A failing step is logged and skipped; the returned task should be
+    cancelled on shutdown.
+    """
+    return asyncio.create_task(_run_deferred(steps))
@@ -0,0 +1,97 @@
+"""
+SIPORTS v2.0 - Authenticated User Cache
+Cache LRU + TTL des lignes users derrière get_current_user, invalidé
+explicitement par chaque écriture sur un utilisateur.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Optional
+
+USER_CACHE_SIZE = int(os.environ.get('USER_CACHE_SIZE', 10000))
+WEB_CONCURRENCY = int(os.environ.get('WEB_CONCURRENCY', 1))
+# Les invalidations restent locales au worker : TTL court en multi-workers
+USER_CACHE_TTL = float(os.environ.get('USER_CACHE_TTL', 60 if WEB_CONCURRENCY == 1 else 5))
+
+
+class UserCache:
+    """In-process LRU cache of user rows keyed by user id.
+
+    The TTL bounds staleness for writes this process cannot see (other
+    workers, manual SQL). A generation counter, bumped on every
+    invalidation, stops a read that started before a write from
+    re-populating the cache with the old row.
+    """
+
+    def __init__(self, max_size: int = USER_CACHE_SIZE, ttl: float = USER_CACHE_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: "OrderedDict[int, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, user_id: int) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                self.misses += 1
+                return None
+            row, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._entries[user_id]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(user_id)
+            self.hits += 1
+            return row
+
+    def put(self, user_id: int, row: Dict[str, Any], generation: Optional[int] = None):
+        """Store a row; skipped if an invalidation happened since `generation` was read"""
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return
+            self._entries[user_id] = (row, time.monotonic() + self.ttl)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, user_id: int):
+        self.invalidate_many((user_id,))
+
+    def invalidate_many(self, user_ids: Iterable[int]):
+        with self._lock:
+            self.generation += 1
+            for user_id in user_ids:
+                self._entries.pop(user_id, None)
+                self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self.generation += 1
+            self._entries.clear()
+
+    def metrics(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations
+        }
+
+
+# Instance globale du cache utilisateurs
+user_cache = UserCache()
@@ -0,0 +1,99 @@
+"""
+SIPORTS v2.0 - Admin Dashboard Counters
+Compteurs utilisateurs par (user_type, status, wp_synced) maintenus par des
+triggers SQLite, pour que le tableau de bord admin lise une seule ligne au
+lieu de scanner la table users.
+"""
+
+import logging
+import sqlite3
+from typing import Any, Dict
+
+logger = logging.getLogger(__name__)
+
+COUNTERS_TABLE_DDL = '''
+    CREATE TABLE IF NOT EXISTS user_counters (
+        user_type TEXT NOT NULL,
+        status TEXT NOT NULL,
+        wp_synced INTEGER NOT NULL,
+        count INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (user_type, status, wp_synced)
+    ) WITHOUT ROWID
+'''
+
+COUNTERS_TRIGGERS_DDL = [
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_user_counters_insert AFTER INSERT ON users
+    BEGIN
+        INSERT INTO user_counters (user_type, status, wp_synced, count)
+        VALUES (COALESCE(NEW.user_type, ''), COALESCE(NEW.status, ''), NEW.wp_user_id IS NOT NULL, 1)
+        ON CONFLICT (user_type, status, wp_synced) DO UPDATE SET count = count + 1;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_user_counters_delete AFTER DELETE ON users
+    BEGIN
+        UPDATE user_counters SET count = count - 1
+        WHERE user_type = COALESCE(OLD.user_type, '')
+          AND status = COALESCE(OLD.status, '')
+          AND wp_synced = (OLD.wp_user_id IS NOT NULL);
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_user_counters_update AFTER UPDATE OF user_type, status, wp_user_id ON users
+    WHEN COALESCE(OLD.user_type, '') != COALESCE(NEW.user_type, '')
+      OR COALESCE(OLD.status, '') != COALESCE(NEW.status, '')
+      OR (OLD.wp_user_id IS NOT NULL) != (NEW.wp_user_id IS NOT NULL)
+    BEGIN
+        UPDATE user_counters SET count = count - 1
+        WHERE user_type = COALESCE(OLD.user_type, '')
+          AND status = COALESCE(OLD.status, '')
+          AND wp_synced = (OLD.wp_user_id IS NOT NULL);
+        INSERT INTO user_counters (user_type, status, wp_synced, count)
+        VALUES (COALESCE(NEW.user_type, ''), COALESCE(NEW.status, ''), NEW.wp_user_id IS NOT NULL, 1)
+        ON CONFLICT (user_type, status, wp_synced) DO UPDATE SET count = count + 1;
+    END
+    ''',
+]
+
+# Une seule ligne agrégée sur la petite table de compteurs
+DASHBOARD_COUNTERS_QUERY = '''
+    SELECT
+        COALESCE(SUM(count), 0) AS total_users,
+        COALESCE(SUM(CASE WHEN user_type = 'visitor' THEN count END), 0) AS visitors,
+        COALESCE(SUM(CASE WHEN user_type = 'exhibitor' THEN count END), 0) AS exhibitors,
+        COALESCE(SUM(CASE WHEN user_type = 'partner' THEN count END), 0) AS partners,
+        COALESCE(SUM(CASE WHEN status = 'pending' THEN count END), 0) AS pending,
+        COALESCE(SUM(CASE WHEN status = 'validated' THEN count END), 0) AS validated,
+        COALESCE(SUM(CASE WHEN status = 'rejected' THEN count END), 0) AS rejected,
+        COALESCE(SUM(CASE WHEN wp_synced = 1 THEN count END), 0) AS wordpress_synced
+    FROM user_counters
+'''
+
+
+def install_user_counters(conn: sqlite3.Connection):
+    """Create the counters table and triggers, then seed it from users"""
+    conn.execute(COUNTERS_TABLE_DDL)
+    for ddl in COUNTERS_TRIGGERS_DDL:
+        conn.execute(ddl)
+    rebuild_user_counters(conn)
+
+
+def rebuild_user_counters(conn: sqlite3.Connection) -> int:
+    """Recompute every counter from the users table; returns the user total"""
+    conn.execute('DELETE FROM user_counters')
+    conn.execute('''
+        INSERT INTO user_counters (user_type, status, wp_synced, count)
+        SELECT COALESCE(user_type, ''), COALESCE(status, ''), wp_user_id IS NOT NULL, COUNT(*)
+        FROM users
+        GROUP BY 1, 2, 3
+    ''')
+    total = conn.execute('SELECT COALESCE(SUM(count), 0) FROM user_counters').fetchone()[0]
+    logger.info("User counters rebuilt (%s users)", total)
+    return total
+
+
+def read_dashboard_counters(conn: sqlite3.Connection) -> Dict[str, Any]:
+    """Dashboard statistics from the counters table"""
+    row = conn.execute(DASHBOARD_COUNTERS_QUERY).fetchone()
+    return {key: row[key] for key in row.keys()}
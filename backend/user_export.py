@@ -0,0 +1,80 @@
+"""
+SIPORTS v2.0 - User Export
+Export CSV / NDJSON des utilisateurs (impression des badges, Excel) en flux :
+les lignes sont lues par lots fetchmany et encodées au fil de l'eau, avec
+compression gzip optionnelle.
+"""
+
+import csv
+import io
+import json
+import zlib
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, List, Sequence
+
+EXPORT_FORMATS = ('csv', 'ndjson')
+EXPORT_MEDIA_TYPES = {'csv': 'text/csv', 'ndjson': 'application/x-ndjson'}
+
+# Cellules lues comme des formules par les tableurs (injection CSV) : préfixées par '
+CSV_FORMULA_PREFIXES = frozenset('=+-@\t\r')
+
+# Jamais de password_hash dans un export
+EXPORT_USER_COLUMNS = [
+    'id', 'email', 'first_name', 'last_name', 'company', 'phone', 'user_type',
+    'visitor_package', 'partnership_package', 'status', 'created_at'
+]
+
+
+def _csv_cell(value: Any) -> Any:
+    """Neutralize a text cell that Excel / LibreOffice would evaluate as a formula"""
+    if isinstance(value, str) and value[:1] in CSV_FORMULA_PREFIXES:
+        return "'" + value
+    return value
+
+
+def _encode_csv(rows: List[Dict[str, Any]], columns: Sequence[str]) -> bytes:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerows([_csv_cell(row[column]) for column in columns] for row in rows)
+    return buffer.getvalue().encode('utf-8')
+
+
+def _encode_ndjson(rows: List[Dict[str, Any]]) -> bytes:
+    return ''.join(json.dumps(row, ensure_ascii=False) + '\n' for row in rows).encode('utf-8')
+
+
+async def export_chunks(batches: AsyncIterator[List[Dict[str, Any]]], fmt: str,
+                        columns: Sequence[str], compress: bool = False) -> AsyncIterator[bytes]:
+    """Encode fetchmany batches as CSV / NDJSON byte chunks, optionally gzipped.
+
+    The CSV header (with a BOM so Excel reads UTF-8) is sent before the
+    first batch is fetched, so the client gets its first byte at once.
+    """
+    gzip = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None
+
+    def _out(data: bytes, flush: bool = False) -> bytes:
+        if gzip is None:
+            return data
+        return gzip.compress(data) + (gzip.flush(zlib.Z_SYNC_FLUSH) if flush else b'')
+
+    if fmt == 'csv':
+        header = io.StringIO()
+        csv.writer(header).writerow(columns)
+        yield _out(('\ufeff' + header.getvalue()).encode('utf-8'), flush=True)
+
+    try:
+        async for batch in batches:
+            data = _encode_csv(batch, columns) if fmt == 'csv' else _encode_ndjson(batch)
+            chunk = _out(data)
+            if chunk:
+                yield chunk
+    finally:
+        # Client parti en cours de route : rendre la connexion tout de suite
+        await batches.aclose()
+
+    if gzip is not None:
+        yield gzip.flush()
+
+
+def export_filename(fmt: str) -> str:
+    return f"siports-users-{datetime.now().strftime('%Y%m%d-%H%M%S')}.{fmt}"
@@ -0,0 +1,292 @@
+"""
+SIPORTS v2.0 - Bulk User Import
+Import en flux de listes CSV / NDJSON (exposants, visiteurs) : lecture ligne
+à ligne sans charger le fichier, hachage des mots de passe par lots sur le
+pool de processus, upsert executemany par blocs transactionnels.
+"""
+
+import codecs
+import csv
+import json
+import logging
+import os
+import sqlite3
+import time
+from typing import Any, AsyncIterable, AsyncIterator, Dict, List, Optional, Tuple
+
+from user_cache import user_cache
+
+logger = logging.getLogger(__name__)
+
+IMPORT_BATCH_SIZE = int(os.environ.get('IMPORT_BATCH_SIZE', 1000))
+IMPORT_MAX_ERRORS = int(os.environ.get('IMPORT_MAX_ERRORS', 1000))
+# L'import partage le pool de hachage avec les logins : attendre plutôt qu'échouer
+IMPORT_HASH_RETRIES = int(os.environ.get('IMPORT_HASH_RETRIES', 100))
+
+IMPORT_FORMATS = ('csv', 'ndjson')
+IMPORT_USER_TYPES = {'visitor', 'exhibitor', 'partner'}
+IMPORT_STATUSES = {'pending', 'validated', 'rejected'}
+IMPORT_FIELDS = ['email', 'password', 'user_type', 'first_name', 'last_name', 'company',
+                 'phone', 'visitor_package', 'partnership_package', 'status']
+
+# Comptes importés sans mot de passe : connexion impossible tant qu'il n'est pas défini
+NO_PASSWORD_HASH = '!import'
+
+_ID_CHUNK = 500
+
+UPSERT_USER_SQL = '''
+    INSERT INTO users (email, password_hash, user_type, first_name, last_name, company, phone,
+                       visitor_package, partnership_package, status)
+    VALUES (:email, :password_hash, :user_type, :first_name, :last_name, :company, :phone,
+            COALESCE(:visitor_package, 'Free'), :partnership_package, COALESCE(:status, :default_status))
+    ON CONFLICT (email) DO UPDATE SET
+        password_hash = CASE WHEN :password_hash = '!import' THEN users.password_hash ELSE :password_hash END,
+        user_type = COALESCE(:explicit_user_type, users.user_type),
+        first_name = COALESCE(:first_name, users.first_name),
+        last_name = COALESCE(:last_name, users.last_name),
+        company = COALESCE(:company, users.company),
+        phone = COALESCE(:phone, users.phone),
+        visitor_package = COALESCE(:visitor_package, users.visitor_package),
+        partnership_package = COALESCE(:partnership_package, users.partnership_package),
+        status = COALESCE(:status, users.status),
+        updated_at = CURRENT_TIMESTAMP
+    WHERE users.user_type != 'admin'
+'''
+
+PROTECTED_ERROR = "compte administrateur: non modifiable par import"
+
+
+def normalize_email(email: str) -> str:
+    """Canonical form of an email, shared by import, registration and login"""
+    return email.strip().lower()
+
+
+def detect_format(content_type: str) -> Optional[str]:
+    """Map a Content-Type header to an import format"""
+    content_type = content_type.split(';')[0].strip().lower()
+    if content_type in ('text/csv', 'application/csv'):
+        return 'csv'
+    if content_type in ('application/x-ndjson', 'application/ndjson', 'application/jsonl', 'application/json-lines'):
+        return 'ndjson'
+    return None
+
+
+async def _iter_lines(chunks: AsyncIterable[bytes]) -> AsyncIterator[str]:
+    decoder = codecs.getincrementaldecoder('utf-8-sig')(errors='replace')
+    pending = ''
+    async for chunk in chunks:
+        pending += decoder.decode(chunk)
+        *lines, pending = pending.split('\n')
+        for line in lines:
+            yield line + '\n'
+    pending += decoder.decode(b'', final=True)
+    if pending:
+        yield pending
+
+
+async def _iter_records(chunks: AsyncIterable[bytes], fmt: str) -> AsyncIterator[Tuple[int, Any]]:
+    """Yield (line number, dict or error message) for each record of the upload"""
+    if fmt == 'ndjson':
+        line_no = 0
+        async for line in _iter_lines(chunks):
+            line_no += 1
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                yield line_no, f"JSON invalide: {e}"
+                continue
+            yield line_no, record if isinstance(record, dict) else "Objet JSON attendu"
+        return
+
+    header = None
+    record_lines: List[str] = []
+    line_no = start_line = 0
+    async for line in _iter_lines(chunks):
+        line_no += 1
+        if not record_lines:
+            start_line = line_no
+        record_lines.append(line)
+        text = ''.join(record_lines)
+        # Champ entre guillemets sur plusieurs lignes : attendre la fin de l'enregistrement
+        if text.count('"') % 2:
+            continue
+        record_lines = []
+        if not text.strip():
+            continue
+        values = next(csv.reader([text]))
+        if header is None:
+            header = [name.strip().lower() for name in values]
+            continue
+        if len(values) > len(header):
+            yield start_line, f"{len(values)} colonnes pour {len(header)} en-têtes"
+            continue
+        yield start_line, dict(zip(header, values))
+    if record_lines:
+        yield start_line, "Guillemet non fermé en fin de fichier"
+
+
+def _clean(record: Dict[str, Any]) -> Dict[str, Optional[str]]:
+    row = {}
+    for field in IMPORT_FIELDS:
+        value = record.get(field)
+        if value is not None and not isinstance(value, str):
+            value = str(value)
+        value = value.strip() if value is not None else None
+        row[field] = value or None
+    return row
+
+
+def _validate(row: Dict[str, Optional[str]]) -> Optional[str]:
+    email = row['email']
+    if not email or '@' not in email:
+        return "email invalide"
+    if row['user_type'] is not None and row['user_type'] not in IMPORT_USER_TYPES:
+        return f"user_type invalide: {row['user_type']}"
+    if row['status'] is not None and row['status'] not in IMPORT_STATUSES:
+        return f"status invalide: {row['status']}"
+    return None
+
+
+def plan_upsert(rows: List[Dict[str, Any]], existing: Dict[str, Tuple[int, str]]) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    """Drop rows targeting an admin account; returns the rows to upsert and the chunk result.
+
+    `existing` maps the emails already in users to (id, user_type). The
+    WHERE clause of UPSERT_USER_SQL protects admins as well; filtering here
+    lets the import report those rows instead of counting them as updated.
+    """
+    protected = sorted(email for email, (_, user_type) in existing.items() if user_type == 'admin')
+    if protected:
+        rows = [row for row in rows if row['email'] not in existing or existing[row['email']][1] != 'admin']
+    emails = list(dict.fromkeys(row['email'] for row in rows))
+    created = len([email for email in emails if email not in existing])
+    return rows, {
+        "created": created,
+        "updated": len(rows) - created,
+        "updated_ids": [existing[email][0] for email in emails if email in existing],
+        "protected": protected
+    }
+
+
+def upsert_users_chunk(conn: sqlite3.Connection, rows: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Upsert one chunk of validated rows; returns created/updated counts, updated ids and skipped admin emails"""
+    emails = list(dict.fromkeys(row['email'] for row in rows))
+    existing: Dict[str, Tuple[int, str]] = {}
+    for start in range(0, len(emails), _ID_CHUNK):
+        chunk = emails[start:start + _ID_CHUNK]
+        placeholders = ','.join('?' * len(chunk))
+        for row in conn.execute(f'SELECT id, email, user_type FROM users WHERE email IN ({placeholders})', chunk):
+            existing[row[1]] = (row[0], row[2])
+
+    rows, result = plan_upsert(rows, existing)
+    if rows:
+        conn.executemany(UPSERT_USER_SQL, rows)
+    return result
+
+
+class ImportReport:
+    """Running totals and per-row errors of an import"""
+
+    def __init__(self, fmt: str):
+        self.format = fmt
+        self.rows = 0
+        self.created = 0
+        self.updated = 0
+        self.failed = 0
+        self.errors: List[Dict[str, Any]] = []
+        self.started = time.perf_counter()
+
+    def error(self, line: int, email: Optional[str], message: str):
+        self.failed += 1
+        if len(self.errors) < IMPORT_MAX_ERRORS:
+            self.errors.append({"line": line, "email": email, "error": message})
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "format": self.format,
+            "rows": self.rows,
+            "created": self.created,
+            "updated": self.updated,
+            "failed": self.failed,
+            "errors": self.errors,
+            "errors_truncated": self.failed > len(self.errors),
+            "elapsed_ms": round((time.perf_counter() - self.started) * 1000, 1)
+        }
+
+
+async def _flush(batch: List[Tuple[int, Dict[str, Any]]], users, hasher, report: ImportReport):
+    to_hash = [index for index, (_, row) in enumerate(batch) if row['password']]
+    passwords = [batch[index][1]['password'] for index in to_hash]
+    hashes = await hasher.hash_many(passwords, retries=IMPORT_HASH_RETRIES) if to_hash else []
+    hashed = dict(zip(to_hash, hashes))
+
+    rows = []
+    for index, (_, row) in enumerate(batch):
+        params = {field: row[field] for field in IMPORT_FIELDS if field != 'password'}
+        params['password_hash'] = hashed.get(index, NO_PASSWORD_HASH)
+        params['explicit_user_type'] = row['user_type']
+        params['user_type'] = row['user_type'] or 'visitor'
+        params['default_status'] = row['default_status']
+        rows.append(params)
+
+    try:
+        result = await users.upsert_chunk(rows)
+    except Exception as e:
+        logger.error("Import chunk failed: %s", e)
+        for line, row in batch:
+            report.error(line, row['email'], f"Erreur base: {e}")
+        return
+
+    if result['protected']:
+        protected = set(result['protected'])
+        for line, row in batch:
+            if row['email'] in protected:
+                report.error(line, row['email'], PROTECTED_ERROR)
+    report.created += result['created']
+    report.updated += result['updated']
+    user_cache.invalidate_many(result['updated_ids'])
+
+
+async def import_users(chunks: AsyncIterable[bytes], fmt: str, users, hasher,
+                       default_status: str = 'pending',
+                       batch_size: int = IMPORT_BATCH_SIZE) -> Dict[str, Any]:
+    """Stream-import users from CSV / NDJSON byte chunks.
+
+    Rows are validated one by one; valid rows are grouped into chunks whose
+    passwords are hashed in parallel on the hashing pool, then upserted on
+    email through the users repository, one transaction per chunk. Invalid rows,
+    and rows targeting an admin account, are reported with their line number
+    and never abort the import.
+    """
+    if fmt not in IMPORT_FORMATS:
+        raise ValueError(f"Unsupported import format: {fmt}")
+
+    report = ImportReport(fmt)
+    batch: List[Tuple[int, Dict[str, Any]]] = []
+    async for line, record in _iter_records(chunks, fmt):
+        report.rows += 1
+        if isinstance(record, str):
+            report.error(line, None, record)
+            continue
+        row = _clean(record)
+        if row['email']:
+            row['email'] = normalize_email(row['email'])
+        problem = _validate(row)
+        if problem:
+            report.error(line, row['email'], problem)
+            continue
+        row['default_status'] = default_status
+        batch.append((line, row))
+        if len(batch) >= batch_size:
+            await _flush(batch, users, hasher, report)
+            batch = []
+    if batch:
+        await _flush(batch, users, hasher, report)
+
+    summary = report.as_dict()
+    logger.info(
+        "User import (%s): %s rows, %s created, %s updated, %s failed in %s ms",
+        fmt, report.rows, report.created, report.updated, report.failed, summary['elapsed_ms']
+    )
+    return summary
@@ -10,6 +10,7 @@ import jwt
 from datetime import datetime, timedelta
 import hashlib
 import logging
+from typing import Optional
 
 logger = logging.getLogger(__name__)
 
@@ -30,7 +31,7 @@ class WordPressConfig:
         self.wp_site_url = os.environ.get('WP_SITE_URL', 'https://siportevent.com')
         self.wp_admin_email = os.environ.get('WP_ADMIN_EMAIL', 'admin@siportevent.com')
         
-        logger.info(f"WordPress config initialized for: {self.wp_site_url}")
+        logger.info("WordPress config initialized for: %s", self.wp_site_url)
 
     def get_wp_connection(self):
         """Get WordPress MySQL database connection"""
@@ -50,7 +51,7 @@ class WordPressConfig:
                 return connection
                 
         except Error as e:
-            logger.error(f"WordPress MySQL connection failed: {e}")
+            logger.error("WordPress MySQL connection failed: %s", e)
             return None
 
     def verify_wp_user(self, username, password):
@@ -102,7 +103,7 @@ class WordPressConfig:
             return None
             
         except Error as e:
-            logger.error(f"WordPress user verification failed: {e}")
+            logger.error("WordPress user verification failed: %s", e)
             return None
         finally:
             if connection and connection.is_connected():
@@ -144,7 +145,7 @@ class WordPressConfig:
                     wp_user_data['id'],
                     wp_user_data['email']
                 ))
-                logger.info(f"Updated SIPORTS user: {wp_user_data['email']}")
+                logger.info("Updated SIPORTS user: %s", wp_user_data['email'])
             else:
                 # Create new user
                 cursor.execute('''
@@ -158,13 +159,13 @@ class WordPressConfig:
                     wp_user_data['display_name'].split(' ', 1)[1] if ' ' in wp_user_data['display_name'] else '',
                     wp_user_data['id']
                 ))
-                logger.info(f"Created new SIPORTS user: {wp_user_data['email']}")
+                logger.info("Created new SIPORTS user: %s", wp_user_data['email'])
             
             siports_connection.commit()
             return True
             
         except Exception as e:
-            logger.error(f"User sync failed: {e}")
+            logger.error("User sync failed: %s", e)
             siports_connection.rollback()
             return False
 
@@ -211,7 +212,7 @@ class WordPressConfig:
             return packages
             
         except Error as e:
-            logger.error(f"Failed to get user packages: {e}")
+            logger.error("Failed to get user packages: %s", e)
             return {}
         finally:
             if connection and connection.is_connected():
@@ -238,16 +239,29 @@ class WordPressConfig:
                 """, (wp_user_id, meta_key, package_value))
             
             connection.commit()
-            logger.info(f"Updated WordPress user packages for user {wp_user_id}")
+            logger.info("Updated WordPress user packages for user %s", wp_user_id)
             return True
             
         except Error as e:
-            logger.error(f"Failed to update user packages: {e}")
+            logger.error("Failed to update user packages: %s", e)
             return False
         finally:
             if connection and connection.is_connected():
                 cursor.close()
                 connection.close()
 
-# Global WordPress configuration instance
-wp_config = WordPressConfig()
\ No newline at end of file
+# Instance globale, créée au premier accès
+_wp_config: Optional[WordPressConfig] = None
+
+def get_wp_config() -> WordPressConfig:
+    """Get the WordPress configuration (built on first use)"""
+    global _wp_config
+    if _wp_config is None:
+        _wp_config = WordPressConfig()
+    return _wp_config
+
+def __getattr__(name):
+    # Compatibilité: `from wordpress_config import wp_config`
+    if name == 'wp_config':
+        return get_wp_config()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
\ No newline at end of file
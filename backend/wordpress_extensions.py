@@ -64,7 +64,7 @@ class WordPressDatabaseManager:
             if connection.is_connected():
                 return connection
         except Exception as e:
-            logger.warning(f"WordPress DB connection failed, using demo mode: {e}")
+            logger.warning("WordPress DB connection failed, using demo mode: %s", e)
             return None
     
     def execute_query(self, query: str, params: tuple = None, fetch_one: bool = False):
@@ -85,7 +85,7 @@ class WordPressDatabaseManager:
                 return cursor.rowcount
                 
         except Exception as e:
-            logger.error(f"Erreur exécution requête: {e}")
+            logger.error("Erreur exécution requête: %s", e)
             if connection:
                 connection.rollback()
             return [] if not fetch_one else None
@@ -307,7 +307,7 @@ def add_wordpress_routes(app):
         except HTTPException:
             raise
         except Exception as e:
-            logger.error(f"Erreur login WordPress: {e}")
+            logger.error("Erreur login WordPress: %s", e)
             raise HTTPException(status_code=500, detail="Authentication failed")
     
     @app.post("/api/sync/users")
@@ -359,7 +359,7 @@ def add_wordpress_routes(app):
                 'wordpress_connection': MYSQL_AVAILABLE
             }
         except Exception as e:
-            logger.error(f"Erreur statut sync: {e}")
+            logger.error("Erreur statut sync: %s", e)
             raise HTTPException(status_code=500, detail=str(e))
     
     @app.get("/api/health")
@@ -398,6 +398,6 @@ def init_wordpress_integration(app):
                 logger.info("✅ Connexion WordPress DB testée")
                 connection.close()
         except Exception as e:
-            logger.warning(f"⚠️  WordPress DB non accessible: {e}")
+            logger.warning("⚠️  WordPress DB non accessible: %s", e)
     
     logger.info("🎉 Intégration WordPress initialisée")
\ No newline at end of file
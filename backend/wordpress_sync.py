@@ -6,7 +6,10 @@ Handles bidirectional sync between WordPress and SIPORTS
 import sqlite3
 import logging
 from datetime import datetime
-from wordpress_config import wp_config
+from wordpress_config import get_wp_config
+from db_pool import get_db_pool
+from user_cache import user_cache
+from query_profiler import ProfiledConnection
 import json
 
 logger = logging.getLogger(__name__)
@@ -14,16 +17,17 @@ logger = logging.getLogger(__name__)
 class WordPressSyncService:
     def __init__(self, siports_db_path):
         self.siports_db_path = siports_db_path
-        self.wp_config = wp_config
+        self.wp_config = get_wp_config()
+        self.db = get_db_pool(siports_db_path)
 
     def get_siports_connection(self):
         """Get SIPORTS SQLite connection"""
         try:
-            conn = sqlite3.connect(self.siports_db_path)
+            conn = sqlite3.connect(self.siports_db_path, factory=ProfiledConnection)
             conn.row_factory = sqlite3.Row
             return conn
         except Exception as e:
-            logger.error(f"SIPORTS database connection failed: {e}")
+            logger.error("SIPORTS database connection failed: %s", e)
             return None
 
     def sync_wp_user_to_siports(self, wp_username, password):
@@ -34,16 +38,16 @@ class WordPressSyncService:
             if not wp_user:
                 return None
 
+            # Sync user data through the serialized writer
+            success = self.db.write_sync(lambda conn: self.wp_config.sync_user_to_siports(wp_user, conn))
+            if not success:
+                return None
+
             # Get SIPORTS connection
             siports_conn = self.get_siports_connection()
             if not siports_conn:
                 return None
 
-            # Sync user data
-            success = self.wp_config.sync_user_to_siports(wp_user, siports_conn)
-            if not success:
-                return None
-
             # Get updated SIPORTS user
             cursor = siports_conn.cursor()
             cursor.execute(
@@ -54,6 +58,9 @@ class WordPressSyncService:
             siports_conn.close()
 
             if siports_user:
+                # Name, wp_user_id and status may have changed
+                user_cache.invalidate(siports_user['id'])
+
                 # Get WordPress packages
                 wp_packages = self.wp_config.get_wp_user_packages(wp_user['id'])
                 
@@ -63,13 +70,13 @@ class WordPressSyncService:
                 user_data['wp_user_id'] = wp_user['id']
                 user_data['wp_role'] = wp_user['role']
 
-                logger.info(f"Successfully synced WordPress user: {wp_user['email']}")
+                logger.info("Successfully synced WordPress user: %s", wp_user['email'])
                 return user_data
 
             return None
 
         except Exception as e:
-            logger.error(f"WordPress user sync failed: {e}")
+            logger.error("WordPress user sync failed: %s", e)
             return None
 
     def sync_siports_packages_to_wp(self, user_id, packages):
@@ -89,7 +96,7 @@ class WordPressSyncService:
             siports_conn.close()
 
             if not user or not user['wp_user_id']:
-                logger.warning(f"No WordPress user ID found for SIPORTS user {user_id}")
+                logger.warning("No WordPress user ID found for SIPORTS user %s", user_id)
                 return False
 
             # Update WordPress user packages
@@ -102,12 +109,12 @@ class WordPressSyncService:
             success = self.wp_config.update_wp_user_packages(user['wp_user_id'], wp_packages)
             
             if success:
-                logger.info(f"Successfully synced packages to WordPress for user {user_id}")
+                logger.info("Successfully synced packages to WordPress for user %s", user_id)
             
             return success
 
         except Exception as e:
-            logger.error(f"Package sync to WordPress failed: {e}")
+            logger.error("Package sync to WordPress failed: %s", e)
             return False
 
     def get_wp_events_data(self):
@@ -146,11 +153,11 @@ class WordPressSyncService:
                     'status': row['post_status']
                 })
             
-            logger.info(f"Retrieved {len(events)} events from WordPress")
+            logger.info("Retrieved %s events from WordPress", len(events))
             return events
 
         except Exception as e:
-            logger.error(f"Failed to get WordPress events: {e}")
+            logger.error("Failed to get WordPress events: %s", e)
             return []
         finally:
             if connection and connection.is_connected():
@@ -194,11 +201,11 @@ class WordPressSyncService:
                     'booth': row['booth_number']
                 })
             
-            logger.info(f"Retrieved {len(exhibitors)} exhibitors from WordPress")
+            logger.info("Retrieved %s exhibitors from WordPress", len(exhibitors))
             return exhibitors
 
         except Exception as e:
-            logger.error(f"Failed to get WordPress exhibitors: {e}")
+            logger.error("Failed to get WordPress exhibitors: %s", e)
             return []
         finally:
             if connection and connection.is_connected():
@@ -212,7 +219,7 @@ class WordPressSyncService:
             post_type = webhook_data.get('post_type')
             post_id = webhook_data.get('post_id')
 
-            logger.info(f"Processing WordPress webhook: {action} for {post_type} ID {post_id}")
+            logger.info("Processing WordPress webhook: %s for %s ID %s", action, post_type, post_id)
 
             if action == 'user_register':
                 # Handle new user registration
@@ -229,7 +236,7 @@ class WordPressSyncService:
             return {"status": "ignored", "message": f"Webhook action {action} not handled"}
 
         except Exception as e:
-            logger.error(f"Webhook processing failed: {e}")
+            logger.error("Webhook processing failed: %s", e)
             return {"status": "error", "message": str(e)}
 
     def _handle_user_registration_webhook(self, data):
@@ -241,12 +248,12 @@ class WordPressSyncService:
 
             # Sync new WordPress user to SIPORTS
             # This will be called when user registers on WordPress
-            logger.info(f"New WordPress user registered: {user_email}")
+            logger.info("New WordPress user registered: %s", user_email)
             
             return {"status": "success", "message": "User registration webhook processed"}
 
         except Exception as e:
-            logger.error(f"User registration webhook failed: {e}")
+            logger.error("User registration webhook failed: %s", e)
             return {"status": "error", "message": str(e)}
 
     def _handle_user_meta_webhook(self, data):
@@ -258,24 +265,22 @@ class WordPressSyncService:
 
             if meta_key in ['siports_visitor_package', 'siports_partnership_package']:
                 # Sync package changes back to SIPORTS
-                siports_conn = self.get_siports_connection()
-                if siports_conn:
-                    cursor = siports_conn.cursor()
-                    
-                    package_field = meta_key.replace('siports_', '')
-                    cursor.execute(
+                package_field = meta_key.replace('siports_', '')
+                def _update_package(conn):
+                    conn.execute(
                         f'UPDATE users SET {package_field} = ? WHERE wp_user_id = ?',
                         (meta_value, wp_user_id)
                     )
-                    siports_conn.commit()
-                    siports_conn.close()
+                    return [row[0] for row in conn.execute('SELECT id FROM users WHERE wp_user_id = ?', (wp_user_id,))]
+
+                user_cache.invalidate_many(self.db.write_sync(_update_package))
 
-                    logger.info(f"Synced WordPress package update: {meta_key} = {meta_value}")
+                logger.info("Synced WordPress package update: %s = %s", meta_key, meta_value)
 
             return {"status": "success", "message": "User meta webhook processed"}
 
         except Exception as e:
-            logger.error(f"User meta webhook failed: {e}")
+            logger.error("User meta webhook failed: %s", e)
             return {"status": "error", "message": str(e)}
 
     def _handle_content_webhook(self, data):
@@ -285,12 +290,12 @@ class WordPressSyncService:
             post_id = data.get('post_id')
 
             # Log content updates (could trigger cache refresh, notifications, etc.)
-            logger.info(f"WordPress content updated: {post_type} ID {post_id}")
+            logger.info("WordPress content updated: %s ID %s", post_type, post_id)
 
             return {"status": "success", "message": "Content webhook processed"}
 
         except Exception as e:
-            logger.error(f"Content webhook failed: {e}")
+            logger.error("Content webhook failed: %s", e)
             return {"status": "error", "message": str(e)}
 
 # Global sync service instance
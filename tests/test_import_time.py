@@ -0,0 +1,68 @@
+"""
+Cold-start budget: importing a server module must not touch the database
+or hash passwords, and must stay within an import-time budget measured with
+`python -X importtime`. Run with `-s` to see the per-module report.
+"""
+
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / 'backend'
+
+# Budgets en millisecondes, ajustables pour les machines lentes
+IMPORT_BUDGET_MS = float(os.environ.get('IMPORT_BUDGET_MS', 2000))
+MODULE_SELF_BUDGET_MS = float(os.environ.get('IMPORT_SELF_BUDGET_MS', 100))
+REPORT_TOP = 15
+
+# Dépendances lourdes réservées aux étapes différées
+DEFERRED_MODULES = ['mysql.connector', 'emergentintegrations']
+
+
+def _importtime(module, db_path, wordpress_enabled):
+    env = dict(os.environ, DATABASE_URL=str(db_path), WORDPRESS_ENABLED=wordpress_enabled)
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True, timeout=120
+    )
+    assert proc.returncode == 0, proc.stderr[-2000:]
+
+    timings = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        timings[name.strip()] = (int(self_us) / 1000, int(cumulative_us) / 1000)
+    return timings
+
+
+def _report(module, timings):
+    rows = sorted(timings.items(), key=lambda item: item[1][1], reverse=True)[:REPORT_TOP]
+    lines = [f"Cold start of {module} (top {REPORT_TOP} by cumulative ms):"]
+    lines += [f"  {cumulative:9.1f} {self_ms:9.1f}  {name}" for name, (self_ms, cumulative) in rows]
+    return '\n'.join(lines)
+
+
+@pytest.mark.parametrize('module,wordpress_enabled', [
+    ('server_production', 'false'),
+    ('server_production_wp', 'true'),
+])
+def test_server_import_budget(module, wordpress_enabled, tmp_path):
+    db_path = tmp_path / 'siports.db'
+    timings = _importtime(module, db_path, wordpress_enabled)
+    report = _report(module, timings)
+    print(report)
+
+    assert module in timings, report
+    self_ms, cumulative_ms = timings[module]
+
+    # Aucune I/O base (DDL, seeds) à l'import : tout est dans le lifespan
+    assert not db_path.exists(), "importing the server created the database"
+    for name in DEFERRED_MODULES:
+        assert name not in timings, f"{name} imported at module import time\n{report}"
+
+    assert self_ms < MODULE_SELF_BUDGET_MS, f"{module} body took {self_ms:.1f} ms\n{report}"
+    assert cumulative_ms < IMPORT_BUDGET_MS, f"{module} import took {cumulative_ms:.1f} ms\n{report}"
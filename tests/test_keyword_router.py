@@ -0,0 +1,41 @@
+"""
+KeywordRouter must give the same answer as one `word in text` check per
+keyword, overlapping and nested keywords included.
+"""
+
+import random
+
+from keyword_router import KeywordRouter
+
+TABLES = {
+    "greeting": ["salut", "bonjour"],
+    "goodbye": ["au revoir", "salut"],
+    "tech": ["tech", "technologie", "logie"],
+    "short": ["te", "r", "é"],
+}
+
+
+def naive(text):
+    return {category: sum(1 for word in set(words) if word in text) for category, words in TABLES.items()}
+
+
+def test_scan_matches_substring_checks():
+    router = KeywordRouter(TABLES)
+    rng = random.Random(7)
+    alphabet = 'abcdeghilnorstuvjéz '
+    samples = ["salut, au revoir", "technologies et logistique", "bonjour"]
+    samples += [''.join(rng.choice(alphabet) for _ in range(rng.randint(0, 30))) for _ in range(2000)]
+    for text in samples:
+        hits = router.scan(text)
+        assert {category: hits[category] for category in TABLES} == naive(text), text
+
+
+def test_mock_routing_unchanged():
+    import asyncio
+    from chatbot_service import ContextType, SiportsAIService
+
+    service = SiportsAIService()
+    reply = asyncio.run(service.generate_response_mock("Le forfait PREMIUM ?", ContextType.PACKAGE, 's'))
+    assert reply.startswith("Le forfait Premium (350€)")
+    reply = asyncio.run(service.generate_response_mock("Horaires des conférences", ContextType.EVENT, 's'))
+    assert reply.startswith("L'événement se déroule sur 3 jours")
@@ -0,0 +1,163 @@
+"""
+Schema migrations: idempotency and query plans of the hot queries against a
+large synthetic database.
+"""
+
+import random
+import sqlite3
+
+import pytest
+
+from migrations import MIGRATIONS, current_version, run_migrations
+
+USERS = 50000
+SYNC_LOGS = 20000
+CHAT_MESSAGES = 50000
+
+# Schéma historique de server_production.py (sans colonnes WordPress)
+LEGACY_USERS_DDL = '''
+    CREATE TABLE users (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        email TEXT UNIQUE NOT NULL,
+        password_hash TEXT NOT NULL,
+        user_type TEXT DEFAULT 'visitor',
+        first_name TEXT,
+        last_name TEXT,
+        company TEXT,
+        phone TEXT,
+        visitor_package TEXT DEFAULT 'Free',
+        partnership_package TEXT,
+        status TEXT DEFAULT 'pending',
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+'''
+
+CHAT_MESSAGES_DDL = '''
+    CREATE TABLE chat_messages (
+        id TEXT PRIMARY KEY,
+        session_id TEXT,
+        user_id INTEGER,
+        message TEXT NOT NULL,
+        response TEXT NOT NULL,
+        timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        message_type TEXT DEFAULT 'text',
+        language TEXT DEFAULT 'fr',
+        context TEXT DEFAULT '{}',
+        sentiment_score REAL DEFAULT 0.0,
+        intent TEXT
+    )
+'''
+
+
+def _timestamp(rng):
+    return f"2025-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d} {rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}:00"
+
+
+@pytest.fixture(scope='module')
+def large_db(tmp_path_factory):
+    rng = random.Random(42)
+    path = str(tmp_path_factory.mktemp('migrations') / 'large.db')
+    conn = sqlite3.connect(path)
+    conn.execute(LEGACY_USERS_DDL)
+    conn.execute(CHAT_MESSAGES_DDL)
+    conn.executemany(
+        'INSERT INTO users (email, password_hash, user_type, company, status, created_at) VALUES (?, ?, ?, ?, ?, ?)',
+        (
+            (f'user{i}@example.com', 'hash',
+             rng.choice(['visitor', 'visitor', 'visitor', 'exhibitor', 'partner']),
+             f'Company {i % 500}',
+             rng.choice(['pending', 'validated', 'validated', 'rejected']),
+             _timestamp(rng))
+            for i in range(USERS)
+        )
+    )
+    conn.executemany(
+        'INSERT INTO chat_messages (id, session_id, message, response, timestamp) VALUES (?, ?, ?, ?, ?)',
+        ((f'msg{i}', f'session_{i % 5000}', 'question', 'réponse', _timestamp(rng)) for i in range(CHAT_MESSAGES))
+    )
+    conn.commit()
+
+    run_migrations(conn)
+    run_migrations(conn, 'chatbot')
+    conn.executemany(
+        'INSERT INTO wp_sync_log (user_id, action, status, created_at) VALUES (?, ?, ?, ?)',
+        ((rng.randint(1, USERS), 'wordpress_login', 'success', _timestamp(rng)) for _ in range(SYNC_LOGS))
+    )
+    conn.execute("UPDATE users SET wp_user_id = id WHERE id % 7 = 0")
+    conn.commit()
+    yield conn
+    conn.close()
+
+
+def _plan(conn, sql, params=()):
+    return ' | '.join(row[3] for row in conn.execute(f'EXPLAIN QUERY PLAN {sql}', params).fetchall())
+
+
+def test_migrations_are_recorded_and_idempotent(large_db):
+    assert current_version(large_db, 'core') == MIGRATIONS['core'][-1][0]
+    assert current_version(large_db, 'chatbot') == MIGRATIONS['chatbot'][-1][0]
+    assert run_migrations(large_db) == []
+    assert run_migrations(large_db, 'chatbot') == []
+
+
+def test_legacy_users_table_gains_wordpress_columns(large_db):
+    columns = [row[1] for row in large_db.execute('PRAGMA table_info(users)').fetchall()]
+    for column in ('wp_user_id', 'wp_sync_enabled', 'last_wp_sync', 'updated_at'):
+        assert column in columns
+
+
+def test_pending_users_plan_uses_status_index(large_db):
+    plan = _plan(large_db, '''
+        SELECT id, email, first_name, last_name, company, user_type, created_at
+        FROM users WHERE status = 'pending'
+        ORDER BY created_at DESC
+    ''')
+    assert 'idx_users_status_created' in plan
+    assert 'TEMP B-TREE' not in plan
+
+
+def test_dashboard_counts_use_indexes(large_db):
+    assert 'idx_users_user_type' in _plan(large_db, "SELECT COUNT(*) FROM users WHERE user_type = 'visitor'")
+    assert 'idx_users_status_created' in _plan(large_db, "SELECT COUNT(*) FROM users WHERE status = 'validated'")
+    assert 'idx_users_wp_user_id' in _plan(large_db, 'SELECT COUNT(*) FROM users WHERE wp_user_id IS NOT NULL')
+
+
+def test_sync_status_plan_uses_log_index(large_db):
+    plan = _plan(large_db, '''
+        SELECT action, status, created_at, error_message
+        FROM wp_sync_log
+        WHERE user_id = ?
+        ORDER BY created_at DESC
+        LIMIT 10
+    ''', (123,))
+    assert 'idx_wp_sync_log_user_created' in plan
+    assert 'TEMP B-TREE' not in plan
+
+
+def test_chat_history_plan_uses_session_index(large_db):
+    plan = _plan(large_db, '''
+        SELECT message, response
+        FROM chat_messages
+        WHERE session_id = ?
+        ORDER BY timestamp DESC
+        LIMIT ?
+    ''', ('session_42', 3))
+    assert 'idx_chat_messages_session_timestamp' in plan
+    assert 'TEMP B-TREE' not in plan
+
+
+def test_wp_user_lookup_uses_index(large_db):
+    assert 'idx_users_wp_user_id' in _plan(large_db, 'SELECT id FROM users WHERE wp_user_id = ?', (7,))
+
+
+def test_pending_users_keyset_page_uses_status_index(large_db):
+    from pagination import build_users_query
+
+    sql, params = build_users_query(
+        ['id', 'email', 'created_at'],
+        {'status': 'pending', 'user_type': None, 'company': None},
+        ('2025-06-01 00:00:00', 1000), 51
+    )
+    plan = _plan(large_db, sql, params)
+    assert 'idx_users_status_created' in plan
+    assert 'TEMP B-TREE' not in plan
@@ -0,0 +1,79 @@
+"""
+Bulk moderation: duplicated and unknown ids, filter selection, and the
+per-id result list returned to the admin.
+"""
+
+import sqlite3
+
+import pytest
+
+from moderation import apply_bulk_status
+
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(':memory:')
+    conn.execute('''
+        CREATE TABLE users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            email TEXT UNIQUE NOT NULL,
+            user_type TEXT DEFAULT 'visitor',
+            status TEXT DEFAULT 'pending',
+            updated_at TIMESTAMP DEFAULT '2025-01-01 00:00:00'
+        )
+    ''')
+    conn.executemany('INSERT INTO users (email, user_type, status) VALUES (?, ?, ?)', [
+        ('a@example.com', 'visitor', 'pending'),
+        ('b@example.com', 'exhibitor', 'pending'),
+        ('c@example.com', 'exhibitor', 'validated'),
+        ('d@example.com', 'partner', 'rejected'),
+        ('e@example.com', 'exhibitor', 'pending'),
+    ])
+    yield conn
+    conn.close()
+
+
+def statuses(conn):
+    return dict(conn.execute('SELECT id, status FROM users'))
+
+
+def test_ids_are_deduplicated_in_request_order(conn):
+    result = apply_bulk_status(conn, 'validated', user_ids=[3, 1, 3, 1, 2])
+    assert [item['user_id'] for item in result['results']] == [3, 1, 2]
+    assert result['results'][0] == {"user_id": 3, "result": "validated", "previous_status": "validated"}
+    assert (result['updated'], result['not_found']) == (3, 0)
+    assert statuses(conn) == {1: 'validated', 2: 'validated', 3: 'validated', 4: 'rejected', 5: 'pending'}
+
+
+def test_unknown_ids_are_reported_not_found(conn):
+    result = apply_bulk_status(conn, 'rejected', user_ids=[99, 1, 100, 99])
+    assert result['results'] == [
+        {"user_id": 99, "result": "not_found"},
+        {"user_id": 1, "result": "rejected", "previous_status": "pending"},
+        {"user_id": 100, "result": "not_found"},
+    ]
+    assert (result['status'], result['updated'], result['not_found']) == ('rejected', 1, 2)
+    assert statuses(conn)[1] == 'rejected'
+
+
+def test_large_id_list_spans_several_chunks(conn):
+    result = apply_bulk_status(conn, 'validated', user_ids=list(range(1, 1300)))
+    assert (result['updated'], result['not_found']) == (5, 1294)
+    assert set(statuses(conn).values()) == {'validated'}
+
+
+def test_filter_selects_matching_users_only(conn):
+    result = apply_bulk_status(conn, 'validated', filters={'status': 'pending', 'user_type': 'exhibitor'})
+    assert sorted(item['user_id'] for item in result['results']) == [2, 5]
+    assert (result['updated'], result['not_found']) == (2, 0)
+    assert statuses(conn) == {1: 'pending', 2: 'validated', 3: 'validated', 4: 'rejected', 5: 'validated'}
+    changed = {row[0] for row in conn.execute("SELECT id FROM users WHERE updated_at != '2025-01-01 00:00:00'")}
+    assert changed == {2, 5}
+
+
+def test_filter_ignores_unset_fields(conn):
+    result = apply_bulk_status(conn, 'rejected', filters={'status': 'pending', 'user_type': None})
+    assert sorted(item['user_id'] for item in result['results']) == [1, 2, 5]
+
+    result = apply_bulk_status(conn, 'rejected', filters={'status': 'pending'})
+    assert result == {"status": "rejected", "updated": 0, "not_found": 0, "results": []}
@@ -0,0 +1,203 @@
+"""
+Ollama path of the chatbot against the local fake server
+(benchmarks/fake_ollama.py): generations must not block the event loop,
+must respect the concurrency cap and must stop when the client leaves;
+the SSE endpoint streams tokens, then a done event; repeated questions are
+answered from the response cache until the knowledge changes, and
+identical questions asked at the same time share one generation; closing
+the client mid-generation leaves the running calls able to give back their
+slot.
+"""
+
+import asyncio
+import json
+import sys
+import time
+from pathlib import Path
+
+import httpx
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'backend' / 'benchmarks'))
+
+from fake_ollama import FakeOllama  # noqa: E402
+
+GENERATION_LATENCY = 0.8
+MAX_CONCURRENCY = 2
+# Une génération bloquante gèlerait /health pendant ~1 s
+HEALTH_BUDGET = 0.25
+
+
+@pytest.fixture
+def fake_ollama():
+    with FakeOllama(latency=GENERATION_LATENCY, tokens_per_second=100, tokens=10) as fake:
+        yield fake
+
+
+@pytest.fixture
+def ollama_service(fake_ollama, tmp_path, monkeypatch):
+    monkeypatch.setenv('DATABASE_URL', str(tmp_path / 'test.db'))
+    monkeypatch.setenv('JWT_SECRET_KEY', 'test-secret')
+    import chatbot_service
+    from llm_client import OllamaClient
+    from response_cache import ResponseCache
+    from singleflight import SingleFlight
+
+    client = OllamaClient(host=fake_ollama.url, timeout=10, max_concurrency=MAX_CONCURRENCY, queue_timeout=10)
+    monkeypatch.setattr(chatbot_service, 'ollama_client', client)
+    monkeypatch.setattr(chatbot_service.siports_ai_service, 'mock_mode', False)
+    monkeypatch.setattr(chatbot_service.siports_ai_service, 'response_cache', ResponseCache())
+    monkeypatch.setattr(chatbot_service.siports_ai_service, 'single_flight', SingleFlight(enabled=True))
+    # Le catalogue branché par un serveur importé plus tôt pointe vers une autre base de test
+    monkeypatch.setattr(chatbot_service.siports_ai_service, '_package_catalog', None)
+    yield chatbot_service.siports_ai_service, client
+
+
+def test_health_stays_responsive_during_generations(fake_ollama, ollama_service):
+    import server_production
+    _, client = ollama_service
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=server_production.app)
+        async with httpx.AsyncClient(transport=transport, base_url='http://test', timeout=30) as http:
+            chats = [asyncio.ensure_future(http.post('/api/chat', json={'message': f'Bonjour {i}'}))
+                     for i in range(4)]
+            health = []
+            while not all(chat.done() for chat in chats):
+                started = time.perf_counter()
+                assert (await http.get('/health')).status_code == 200
+                health.append(time.perf_counter() - started)
+                await asyncio.sleep(0.05)
+            replies = [(await chat).json() for chat in chats]
+        await client.close()
+        return health, replies
+
+    health, replies = asyncio.run(scenario())
+    assert all(reply['response'].startswith('Le salon SIPORTS') for reply in replies)
+    assert len(health) > 5
+    assert max(health) < HEALTH_BUDGET
+    assert fake_ollama.max_active <= MAX_CONCURRENCY
+    assert client.requests == 4
+
+
+def test_disconnect_cancels_generation(fake_ollama, ollama_service):
+    from chatbot_service import ChatRequest
+    from llm_client import ClientDisconnected, cancel_on_disconnect
+    service, client = ollama_service
+
+    class LeavingRequest:
+        async def receive(self):
+            await asyncio.sleep(0.2)
+            return {'type': 'http.disconnect'}
+
+    async def scenario():
+        with pytest.raises(ClientDisconnected):
+            await cancel_on_disconnect(LeavingRequest(), service.generate_response(ChatRequest(message='Bonjour')))
+        # Laisser le faux serveur constater la fermeture de la connexion
+        await asyncio.sleep(0.2)
+        await client.close()
+
+    asyncio.run(scenario())
+    assert client.metrics()['cancelled'] == 1
+    assert fake_ollama.cancelled == 1
+    assert fake_ollama.completed == 0
+
+
+def test_stream_endpoint_sends_tokens_then_done(fake_ollama, ollama_service):
+    import server_production
+    service, client = ollama_service
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=server_production.app)
+        async with httpx.AsyncClient(transport=transport, base_url='http://test', timeout=30) as http:
+            response = await http.post('/api/chat/stream', json={'message': 'Bonjour', 'context_type': 'event'})
+        await client.close()
+        return response
+
+    response = asyncio.run(scenario())
+    assert response.headers['content-type'].startswith('text/event-stream')
+    events = [(block.split('\n')[0][len('event: '):], json.loads(block.split('\n')[1][len('data: '):]))
+              for block in response.text.strip().split('\n\n')]
+    assert [name for name, _ in events[:-1]] == ['token'] * fake_ollama.tokens
+    name, done = events[-1]
+    assert name == 'done'
+    assert done['confidence'] > 0 and done['suggested_actions']
+
+    reply = ''.join(data['content'] for _, data in events[:-1])
+    history = asyncio.run(service.sessions.recent(done['session_id']))
+    assert [(m['role'], m['content']) for m in history] == [('user', 'Bonjour'), ('assistant', reply)]
+
+
+def test_repeated_question_served_from_cache(fake_ollama, ollama_service, monkeypatch):
+    from chatbot_service import ChatRequest
+    service, client = ollama_service
+    monkeypatch.setattr(service, 'siports_knowledge', dict(service.siports_knowledge))
+
+    async def ask(message, **kwargs):
+        return (await service.generate_response(ChatRequest(message=message, context_type='package', **kwargs))).response
+
+    async def scenario():
+        first = await ask('Prix des forfaits ?')
+        # Même question normalisée, autre session : pas de nouvelle génération
+        assert await ask('  prix des FORFAITS') == first
+        await ask('Prix des forfaits', bypass_cache=True)
+        assert fake_ollama.requests == 2
+
+        service.siports_knowledge['forfaits'] = {}
+        service._knowledge_checked_at = 0.0
+        await ask('prix des forfaits')
+        await client.close()
+
+    asyncio.run(scenario())
+    assert fake_ollama.requests == 3
+    metrics = service.response_cache.metrics()
+    assert (metrics['hits'], metrics['bypassed'], metrics['invalidations']) == (1, 1, 1)
+
+
+def test_concurrent_identical_questions_share_one_generation(fake_ollama, ollama_service):
+    from chatbot_service import ChatRequest
+    service, client = ollama_service
+    # Sans cache : seule la coalescence peut éviter les générations en double
+    service.response_cache.max_size = 0
+
+    async def scenario():
+        replies = await asyncio.gather(*(
+            service.generate_response(ChatRequest(message=message, context_type='event'))
+            for message in ['Où est le salon ?', 'où est le SALON', 'Ou est le salon', 'Horaires ?']
+        ))
+        histories = [await service.sessions.recent(reply.session_id) for reply in replies]
+        await client.close()
+        return replies, histories
+
+    replies, histories = asyncio.run(scenario())
+    assert fake_ollama.requests == 2
+    assert len({reply.session_id for reply in replies}) == 4
+    for reply, history in zip(replies, histories):
+        assert [m['role'] for m in history] == ['user', 'assistant']
+        assert history[1]['content'] == reply.response
+    metrics = service.coalescing_metrics()
+    assert (metrics['executions'], metrics['coalesced'], metrics['in_flight']) == (2, 2, 0)
+
+
+def test_close_during_generations_releases_their_slots(fake_ollama):
+    from llm_client import OllamaClient
+    client = OllamaClient(host=fake_ollama.url, timeout=10, max_concurrency=MAX_CONCURRENCY, queue_timeout=10)
+    messages = [{'role': 'user', 'content': 'Bonjour'}]
+
+    async def streamed():
+        return ''.join([chunk async for chunk in client.stream_chat('tinyllama', messages)])
+
+    async def scenario():
+        running = [asyncio.ensure_future(client.chat('tinyllama', messages)), asyncio.ensure_future(streamed())]
+        await asyncio.sleep(0.2)
+        await client.close()
+        outcomes = await asyncio.gather(*running, return_exceptions=True)
+        # Client recréé au besoin : une nouvelle génération aboutit
+        reply = await client.chat('tinyllama', messages)
+        await client.close()
+        return outcomes, reply
+
+    outcomes, reply = asyncio.run(scenario())
+    assert not any(isinstance(outcome, AttributeError) for outcome in outcomes)
+    assert reply.startswith('Le salon SIPORTS')
+    assert client.metrics()['in_flight'] == 0
@@ -0,0 +1,67 @@
+"""
+PasswordHasher.hash_many on a saturated pool: accepted batches are hashed
+exactly once, refused ones are resubmitted alone, and nothing is left
+running when it gives up.
+"""
+
+import asyncio
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import password_hashing
+from password_hashing import HashPoolSaturated, PasswordHasher
+
+
+class ThreadHasher(PasswordHasher):
+    """Same queue accounting, on threads so the hash function can be patched"""
+
+    def _get_executor(self):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers)
+        return self._executor
+
+
+@pytest.fixture
+def hashed(monkeypatch):
+    calls = Counter()
+    lock = threading.Lock()
+
+    def fake_hash(password):
+        time.sleep(0.01)
+        with lock:
+            calls[password] += 1
+        return 'hash:' + password
+
+    monkeypatch.setattr(password_hashing, 'generate_password_hash', fake_hash)
+    monkeypatch.setattr(password_hashing, 'HASH_RETRY_DELAY', 0.01)
+    return calls
+
+
+def test_refused_batches_are_resubmitted_alone(hashed):
+    hasher = ThreadHasher(workers=2, queue_limit=3)
+    passwords = [f'pw{i}' for i in range(20)]
+    try:
+        hashes = asyncio.run(hasher.hash_many(passwords, batch_size=2, retries=10))
+    finally:
+        hasher.close()
+    assert hashes == ['hash:' + password for password in passwords]
+    assert hasher.rejected > 0
+    assert set(hashed.values()) == {1}
+    assert hasher.metrics()['pending'] == 0
+
+
+def test_gives_up_after_accepted_batches_finish(hashed):
+    hasher = ThreadHasher(workers=1, queue_limit=2)
+    passwords = [f'pw{i}' for i in range(10)]
+    try:
+        with pytest.raises(HashPoolSaturated):
+            asyncio.run(hasher.hash_many(passwords, batch_size=1))
+        # Les lots acceptés sont terminés avant l'exception : rien ne tourne encore
+        assert hasher.metrics()['pending'] == 0
+        assert sorted(hashed) == ['pw0', 'pw1']
+    finally:
+        hasher.close()
@@ -0,0 +1,237 @@
+"""
+PostgreSQL repositories against a live server: schema init (repeated and
+concurrent), trigger-maintained dashboard counters under every write path,
+and pagination / export parity with the SQLite backend.
+
+Skipped unless PG_TEST_URL points to a disposable database, e.g.
+    PG_TEST_URL=postgresql://postgres@127.0.0.1:5432/siports_test
+Its users, user_counters, wp_sync_log and chat_history tables are dropped.
+"""
+
+import asyncio
+import os
+import sqlite3
+from datetime import datetime
+
+import pytest
+
+PG_TEST_URL = os.environ.get('PG_TEST_URL')
+
+pytestmark = pytest.mark.skipif(not PG_TEST_URL, reason='PG_TEST_URL not set')
+if PG_TEST_URL:
+    pytest.importorskip('sqlalchemy')
+    pytest.importorskip('asyncpg')
+
+from pagination import decode_cursor, paginate  # noqa: E402
+from startup import SEED_USERS  # noqa: E402
+from tests.test_user_counters import COUNT_QUERY, USERS_DDL, import_row  # noqa: E402
+
+RESET_SQL = [
+    'DROP TABLE IF EXISTS wp_sync_log, chat_history, user_counters, users CASCADE',
+    'DROP FUNCTION IF EXISTS siports_user_counters() CASCADE',
+]
+LIST_COLUMNS = ['id', 'email', 'first_name', 'last_name', 'company', 'user_type', 'status',
+                'visitor_package', 'partnership_package', 'created_at']
+
+
+def database(**kwargs):
+    from pg_repositories import PostgresDatabase
+    return PostgresDatabase(PG_TEST_URL, **kwargs)
+
+
+async def fresh_database():
+    db = database(pool_size=4, max_overflow=4)
+    for statement in RESET_SQL:
+        await db.execute(statement)
+    return db
+
+
+async def counted(db):
+    return await db.fetchone(COUNT_QUERY)
+
+
+def test_init_twice_and_concurrently():
+    async def scenario():
+        db = await fresh_database()
+        # Deux workers qui démarrent ensemble, puis un redémarrage
+        other = database(pool_size=2, max_overflow=0)
+        try:
+            await asyncio.gather(db.init(), other.init())
+            await db.init()
+            emails = await db.fetchall('SELECT email FROM users ORDER BY id')
+            triggers = await db.scalar(
+                "SELECT COUNT(*) FROM pg_trigger WHERE tgname LIKE 'trg_user_counters%' AND NOT tgisinternal")
+            from pg_repositories import PostgresUserRepository
+            return emails, triggers, await PostgresUserRepository(db).dashboard_counters(), await counted(db)
+        finally:
+            await other.close()
+            await db.close()
+
+    emails, triggers, counters, expected = asyncio.run(scenario())
+    assert [row['email'] for row in emails] == [email for email, _, _ in SEED_USERS]
+    assert triggers == 2
+    assert counters == expected
+
+
+def test_init_rebuilds_missing_counters_table():
+    async def scenario():
+        db = await fresh_database()
+        try:
+            await db.init()
+            await db.execute(
+                "INSERT INTO users (email, password_hash, user_type, status, wp_user_id) "
+                "SELECT 'u' || i || '@example.com', 'hash', 'exhibitor', 'pending', NULLIF(i % 3, 0) "
+                "FROM generate_series(1, 50) AS i")
+            # Base créée avant l'ajout des compteurs : la table manque, les utilisateurs existent
+            await db.execute('DROP TABLE user_counters')
+            await db.init()
+            from pg_repositories import PostgresUserRepository
+            return await PostgresUserRepository(db).dashboard_counters(), await counted(db)
+        finally:
+            await db.close()
+
+    counters, expected = asyncio.run(scenario())
+    assert counters == expected
+    assert counters['total_users'] == len(SEED_USERS) + 50
+
+
+def test_writes_keep_dashboard_counters_exact():
+    from pg_repositories import PostgresUserRepository
+
+    async def scenario():
+        db = await fresh_database()
+        users = PostgresUserRepository(db)
+        snapshots = []
+
+        async def check():
+            snapshots.append((await users.dashboard_counters(), await counted(db)))
+
+        try:
+            await db.init()
+            # Inscriptions
+            ids = [await users.create({'email': f'reg{i}@example.com', 'password_hash': 'hash',
+                                       'user_type': ('visitor', 'exhibitor', 'partner')[i % 3],
+                                       'first_name': 'Jo', 'last_name': 'Doe', 'wp_sync_enabled': i % 2})
+                   for i in range(30)]
+            await check()
+
+            # Modération unitaire et groupée (doublons, id inconnu, filtre)
+            await users.set_status(ids[0], 'rejected')
+            await users.set_visitor_package(ids[1], 'Premium')
+            result = await users.bulk_set_status('validated', user_ids=ids[:10] + ids[:3] + [999999])
+            assert (result['updated'], result['not_found']) == (10, 1)
+            await users.bulk_set_status('rejected', filters={'status': 'pending', 'user_type': 'partner'})
+            await check()
+
+            # Import : créations, mises à jour, compte admin protégé
+            rows = [import_row(f'imp{i}@example.com', user_type='exhibitor' if i % 2 else None) for i in range(40)]
+            assert (await users.upsert_chunk(rows))['created'] == 40
+            rows = [import_row(f'imp{i}@example.com', user_type='partner', status='validated') for i in range(0, 40, 4)]
+            rows += [import_row('reg5@example.com', status='pending'),
+                     import_row('admin@siportevent.com', user_type='visitor', status='pending')]
+            result = await users.upsert_chunk(rows)
+            assert (result['created'], result['updated'], result['protected']) == (0, 11, ['admin@siportevent.com'])
+            assert (await users.get_by_email('admin@siportevent.com'))['user_type'] == 'admin'
+            await check()
+
+            # Liaison WordPress, changement sans effet, suppressions
+            await db.execute('UPDATE users SET wp_user_id = id WHERE id % 4 = 0')
+            await db.execute('UPDATE users SET wp_user_id = id + 1 WHERE id % 8 = 0')
+            await db.execute("UPDATE users SET status = status, company = 'ACME'")
+            await db.execute('DELETE FROM users WHERE id % 5 = 0')
+            await check()
+
+            # Dérive (TRUNCATE, écriture hors triggers) réparée par rebuild_counters
+            await db.execute('UPDATE user_counters SET count = count + 7')
+            total = await users.rebuild_counters()
+            await check()
+            return snapshots, total
+        finally:
+            await db.close()
+
+    snapshots, total = asyncio.run(scenario())
+    for counters, expected in snapshots:
+        assert counters == expected
+    assert total == snapshots[-1][1]['total_users']
+
+
+def _dataset():
+    rows = []
+    for i in range(1, 121):
+        rows.append({
+            'id': i, 'email': f'user{i}@example.com', 'password_hash': 'hash',
+            'user_type': ('visitor', 'exhibitor', 'partner')[i % 3],
+            'first_name': f'Prénom{i}', 'last_name': 'Nom', 'company': f'Société {i % 7}',
+            'visitor_package': ('Free', 'Premium')[i % 2], 'partnership_package': ('Gold', None)[i % 2],
+            'status': ('pending', 'validated', 'rejected')[i % 4 % 3],
+            # Peu d'horodatages distincts : beaucoup d'égalités départagées par id
+            'created_at': f'2025-03-{1 + i % 6:02d} 10:{i % 2 * 30:02d}:00',
+        })
+    return rows
+
+
+async def _pages(users, filters, package=None, limit=7):
+    pages, after = [], None
+    while True:
+        rows = await users.list(LIST_COLUMNS, filters, after, limit + 1, package)
+        page, cursor = paginate(rows, limit)
+        pages.append([dict(row) for row in page])
+        if cursor is None:
+            return pages
+        after = decode_cursor(cursor)
+
+
+async def _exported(users, filters, package=None):
+    return [dict(row) for batch in await _collect(users.iterate(LIST_COLUMNS, filters, package, batch_size=9))
+            for row in batch]
+
+
+async def _collect(iterator):
+    return [batch async for batch in iterator]
+
+
+def test_pagination_and_export_match_sqlite(tmp_path):
+    from db_pool import SQLitePool
+    from migrations import run_migrations
+    from pg_repositories import PostgresUserRepository
+    from repositories import SQLiteUserRepository
+
+    dataset = _dataset()
+    columns = list(dataset[0])
+    path = str(tmp_path / 'parity.db')
+    conn = sqlite3.connect(path)
+    conn.execute(USERS_DDL)
+    conn.executemany(f'INSERT INTO users ({", ".join(columns)}) VALUES ({", ".join("?" * len(columns))})',
+                     [tuple(row.values()) for row in dataset])
+    conn.commit()
+    run_migrations(conn)
+    conn.close()
+    pool = SQLitePool(path)
+    queries = [({}, None), ({'status': 'pending'}, None), ({'user_type': 'exhibitor', 'status': None}, None),
+               ({}, 'Gold'), ({'status': 'validated'}, 'Premium')]
+
+    async def scenario():
+        db = await fresh_database()
+        try:
+            await db.init()
+            await db.execute('DELETE FROM users')
+            await db.execute(
+                f'INSERT INTO users ({", ".join(columns)}) VALUES ({", ".join(":" + c for c in columns)})',
+                [{**row, 'created_at': datetime.fromisoformat(row['created_at'])}
+                 for row in dataset])
+            sqlite_users, pg_users = SQLiteUserRepository(pool), PostgresUserRepository(db)
+            results = []
+            for filters, package in queries:
+                results.append((await _pages(sqlite_users, filters, package), await _pages(pg_users, filters, package),
+                                await _exported(sqlite_users, filters, package),
+                                await _exported(pg_users, filters, package)))
+            return results
+        finally:
+            await db.close()
+            pool.close()
+
+    for sqlite_pages, pg_pages, sqlite_rows, pg_rows in asyncio.run(scenario()):
+        assert pg_pages == sqlite_pages
+        assert pg_rows == sqlite_rows
+        assert [row for page in sqlite_pages for row in page] == sqlite_rows
+    assert len(sqlite_rows) > 0
@@ -0,0 +1,120 @@
+"""
+Login throttle: per-account lockout and per-IP burst on both bucket
+backends, reset on success, fail-open when the backend errors, and the
+429 + Retry-After answer of the login endpoints.
+"""
+
+import asyncio
+import sqlite3
+
+import pytest
+
+from db_pool import SQLitePool
+from rate_limit import (LOGIN_LOCKOUT_MINUTES, LOGIN_MAX_ATTEMPTS, LoginThrottle, MemoryBuckets, SQLiteBuckets,
+                        install_rate_limit_buckets)
+
+ATTEMPTS = int(LOGIN_MAX_ATTEMPTS)
+# Un jeton du seau de compte revient toutes les LOCKOUT / MAX_ATTEMPTS
+ACCOUNT_REFILL_SECONDS = LOGIN_LOCKOUT_MINUTES * 60 / LOGIN_MAX_ATTEMPTS
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def throttle(request, tmp_path):
+    if request.param == 'memory':
+        yield LoginThrottle(MemoryBuckets(), enabled=True)
+        return
+    path = str(tmp_path / 'buckets.db')
+    conn = sqlite3.connect(path)
+    install_rate_limit_buckets(conn)
+    conn.close()
+    pool = SQLitePool(path)
+    yield LoginThrottle(SQLiteBuckets(pool), enabled=True)
+    pool.close()
+
+
+def attempts(throttle, count, ip, account):
+    async def scenario():
+        return [await throttle.check(ip, account) for _ in range(count)]
+    return asyncio.run(scenario())
+
+
+def test_account_locked_after_max_attempts(throttle):
+    results = attempts(throttle, ATTEMPTS + 1, '10.0.0.1', 'user@example.com')
+    assert results[:ATTEMPTS] == [0.0] * ATTEMPTS
+    assert results[-1] == pytest.approx(ACCOUNT_REFILL_SECONDS, rel=0.01)
+    # Même compte, autre casse et autre IP : toujours verrouillé
+    assert attempts(throttle, 1, '10.0.0.2', ' USER@example.com')[0] > 0
+    assert attempts(throttle, 1, '10.0.0.2', 'other@example.com') == [0.0]
+    assert (throttle.lockouts, throttle.rejected_account) == (1, 2)
+
+
+def test_success_resets_account_bucket(throttle):
+    attempts(throttle, ATTEMPTS - 1, '10.0.0.1', 'user@example.com')
+    asyncio.run(throttle.succeeded('User@Example.com'))
+    assert attempts(throttle, ATTEMPTS, '10.0.0.1', 'user@example.com') == [0.0] * ATTEMPTS
+    assert attempts(throttle, 1, '10.0.0.1', 'user@example.com')[0] > 0
+
+
+def test_ip_burst_spans_accounts(throttle):
+    burst = int(throttle.ip_limit.capacity)
+    results = [attempts(throttle, 1, '10.0.0.9', f'user{i}@example.com')[0] for i in range(burst + 1)]
+    assert results[:burst] == [0.0] * burst
+    assert results[-1] > 0
+    assert throttle.rejected_ip == 1
+    # Sans IP connue, seul le seau de compte s'applique
+    assert attempts(throttle, 1, None, 'fresh@example.com') == [0.0]
+
+
+class BrokenBuckets:
+    compactions = 0
+
+    async def take(self, key, limit):
+        raise sqlite3.OperationalError('database is locked')
+
+    async def reset(self, key):
+        raise sqlite3.OperationalError('database is locked')
+
+    def size(self):
+        return None
+
+
+def test_backend_errors_fail_open():
+    throttle = LoginThrottle(BrokenBuckets(), enabled=True)
+    assert attempts(throttle, ATTEMPTS + 2, '10.0.0.1', 'user@example.com') == [0.0] * (ATTEMPTS + 2)
+    asyncio.run(throttle.succeeded('user@example.com'))
+    assert throttle.errors == ATTEMPTS + 3
+    assert throttle.metrics()['rejected_account'] == 0
+
+
+def test_disabled_throttle_never_rejects():
+    throttle = LoginThrottle(MemoryBuckets(), enabled=False)
+    assert attempts(throttle, ATTEMPTS * 2, '10.0.0.1', 'user@example.com') == [0.0] * (ATTEMPTS * 2)
+    assert throttle.checks == 0
+
+
+class NoUsers:
+    async def get_by_email(self, email):
+        return None
+
+
+@pytest.mark.parametrize('module', ['server_production', 'server_production_wp'])
+def test_login_endpoint_answers_429_with_retry_after(module, monkeypatch, tmp_path):
+    import importlib
+    import httpx
+
+    monkeypatch.setenv('DATABASE_URL', str(tmp_path / 'test.db'))
+    server = importlib.import_module(module)
+    monkeypatch.setattr(server, 'login_throttle', LoginThrottle(MemoryBuckets(), enabled=True))
+    monkeypatch.setattr(server.repos, 'users', NoUsers())
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=server.app)
+        async with httpx.AsyncClient(transport=transport, base_url='http://test') as http:
+            credentials = {'email': 'victim@example.com', 'password': 'wrong'}
+            statuses = [(await http.post('/api/auth/login', json=credentials)).status_code for _ in range(ATTEMPTS)]
+            return statuses, await http.post('/api/auth/login', json={**credentials, 'email': 'Victim@Example.com'})
+
+    statuses, response = asyncio.run(scenario())
+    assert statuses == [401] * ATTEMPTS
+    assert response.status_code == 429
+    assert int(response.headers['retry-after']) == pytest.approx(ACCOUNT_REFILL_SECONDS, abs=1)
@@ -0,0 +1,93 @@
+"""
+Bounded in-memory chat session store: LRU eviction on the session cap,
+idle TTL (on access and by sweep), memory cap and byte accounting.
+"""
+
+import pytest
+
+import session_store
+from session_store import SESSION_OVERHEAD, MemorySessionStore, _message_size
+
+
+def run(coro):
+    """Result of a store coroutine (they never suspend), without an event loop"""
+    try:
+        coro.send(None)
+    except StopIteration as done:
+        return done.value
+    raise RuntimeError("coroutine suspended")
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(session_store.time, 'monotonic', lambda: now[0])
+    return now
+
+
+def expected_bytes(store):
+    return sum(SESSION_OVERHEAD + sum(_message_size(m['content']) for m in s.history) for s in store.sessions.values())
+
+
+def test_lru_eviction_keeps_recently_used_sessions(clock):
+    store = MemorySessionStore(max_sessions=3)
+    for session_id in ('a', 'b', 'c'):
+        run(store.append(session_id, 'user', 'bonjour'))
+    # Lire 'a' le rend le plus récent : 'b' part en premier
+    assert run(store.recent('a'))[0]['content'] == 'bonjour'
+    run(store.append('d', 'user', 'bonjour'))
+    assert list(store.sessions) == ['c', 'a', 'd']
+    run(store.append('e', 'user', 'bonjour'))
+    assert list(store.sessions) == ['a', 'd', 'e']
+    assert store.evictions == 2
+    assert run(store.recent('b')) == []
+
+
+def test_idle_sessions_expire(clock):
+    store = MemorySessionStore(idle_ttl=60)
+    run(store.append('old', 'user', 'question'))
+    run(store.append('active', 'user', 'question'))
+    clock[0] += 45
+    run(store.append('active', 'assistant', 'réponse'))
+    clock[0] += 30
+
+    # Expirée à la lecture, sans attendre le balayage
+    assert run(store.recent('old')) == []
+    assert store.expired == 1
+    assert [m['content'] for m in run(store.recent('active'))] == ['question', 'réponse']
+
+    clock[0] += 61
+    run(store.append('new', 'user', 'question'))
+    assert run(store.sweep()) == 1
+    assert list(store.sessions) == ['new']
+    assert store.expired == 2
+    assert store.bytes == expected_bytes(store)
+
+
+def test_memory_cap_evicts_least_recent(clock):
+    message = 'x' * 1000
+    per_session = SESSION_OVERHEAD + _message_size(message)
+    store = MemorySessionStore(max_bytes=per_session * 3 + 10)
+    for session_id in ('a', 'b', 'c', 'd'):
+        run(store.append(session_id, 'user', message))
+    assert list(store.sessions) == ['b', 'c', 'd']
+    assert store.bytes == expected_bytes(store) <= store.max_bytes
+
+    # Une session seule au-dessus du plafond n'est jamais évincée pendant son écriture
+    run(store.append('big', 'user', 'y' * (store.max_bytes * 2)))
+    assert list(store.sessions) == ['big']
+    assert store.evictions == 4
+
+
+def test_history_ring_buffer_and_clear_keep_byte_count_exact(clock):
+    store = MemorySessionStore(history_size=3)
+    for i in range(10):
+        run(store.append('s', 'user', f'message {i} ' + 'z' * i))
+        assert store.bytes == expected_bytes(store)
+    assert [m['content'][:9] for m in run(store.recent('s'))] == ['message 7', 'message 8', 'message 9']
+    assert len(run(store.recent('s', limit=2))) == 2
+
+    assert run(store.clear('s')) is True
+    assert run(store.clear('s')) is False
+    assert store.bytes == 0
+    assert store.metrics()['sessions'] == 0
@@ -0,0 +1,120 @@
+"""
+SQLiteWriter: queued write jobs are committed together, and a job that
+raises only loses its own writes (SAVEPOINT write_job per job).
+"""
+
+import sqlite3
+import threading
+
+import pytest
+
+from db_pool import SQLiteWriter
+
+
+@pytest.fixture
+def writer(tmp_path):
+    path = str(tmp_path / 'writer.db')
+    conn = sqlite3.connect(path)
+    conn.execute('CREATE TABLE items (id INTEGER PRIMARY KEY, label TEXT NOT NULL)')
+    conn.close()
+    writer = SQLiteWriter(path)
+    yield writer
+    writer.close()
+
+
+def labels(writer):
+    conn = sqlite3.connect(writer.database)
+    try:
+        return {row[0] for row in conn.execute('SELECT label FROM items')}
+    finally:
+        conn.close()
+
+
+def insert(conn, label):
+    return conn.execute('INSERT INTO items (label) VALUES (?)', (label,)).lastrowid
+
+
+def queue_behind_blocker(writer, jobs):
+    """Submit jobs while the writer is stuck in a first job, so they form one batch"""
+    started, release = threading.Event(), threading.Event()
+
+    def blocker(conn):
+        started.set()
+        release.wait(5)
+        return insert(conn, 'blocker')
+
+    first = writer.submit(blocker)
+    assert started.wait(5)
+    futures = [writer.submit(fn, *args) for fn, *args in jobs]
+    release.set()
+    first.result(5)
+    for future in futures:
+        future.exception(5)
+    return futures
+
+
+def test_queued_jobs_share_one_commit(writer):
+    futures = queue_behind_blocker(writer, [(insert, f'item{i}') for i in range(50)])
+    assert [future.result() for future in futures] == list(range(2, 52))
+    assert writer.batches == 2
+    assert writer.metrics()['jobs'] == 51
+    assert labels(writer) == {'blocker'} | {f'item{i}' for i in range(50)}
+
+
+def test_failing_job_rolls_back_only_its_own_writes(writer):
+    def failing(conn):
+        insert(conn, 'failed-1')
+        insert(conn, 'failed-2')
+        raise ValueError('boom')
+
+    def integrity_error(conn):
+        insert(conn, 'failed-3')
+        conn.execute('INSERT INTO items (label) VALUES (NULL)')
+
+    def rolls_back_then_writes(conn):
+        # rollback() du code appelant : annule seulement ce job, qui continue ensuite
+        insert(conn, 'undone')
+        conn.rollback()
+        insert(conn, 'after-rollback')
+        conn.commit()
+
+    futures = queue_behind_blocker(writer, [
+        (insert, 'before'), (failing,), (insert, 'between'), (integrity_error,),
+        (rolls_back_then_writes,), (insert, 'after'),
+    ])
+
+    assert writer.batches == 2
+    assert isinstance(futures[1].exception(), ValueError)
+    assert isinstance(futures[3].exception(), sqlite3.IntegrityError)
+    assert all(futures[i].exception() is None for i in (0, 2, 4, 5))
+    assert writer.metrics()['failed_jobs'] == 2
+    assert labels(writer) == {'blocker', 'before', 'between', 'after-rollback', 'after'}
+
+
+def test_transaction_control_is_refused_inside_a_job(writer):
+    futures = queue_behind_blocker(writer, [
+        (insert, 'before'),
+        (lambda conn: conn.executescript("INSERT INTO items (label) VALUES ('script'); COMMIT;"),),
+        (lambda conn: conn.execute('COMMIT'),),
+        (lambda conn: conn.execute('  savepoint other'),),
+        (insert, 'after'),
+    ])
+    assert [type(future.exception()) for future in futures] == [
+        type(None), sqlite3.ProgrammingError, sqlite3.ProgrammingError, sqlite3.ProgrammingError, type(None)]
+    assert labels(writer) == {'blocker', 'before', 'after'}
+
+
+def test_writer_survives_a_failed_batch(writer):
+    def transaction_lost(conn):
+        # Comme une transaction annulée par SQLite lui-même (SQLITE_FULL, IOERR) :
+        # le savepoint du job n'existe plus quand le writer veut le libérer
+        insert(conn, 'lost')
+        conn._conn.execute('ROLLBACK')
+
+    futures = queue_behind_blocker(writer, [(insert, 'same-batch'), (transaction_lost,), (insert, 'queued-after')])
+    assert all(isinstance(future.exception(), sqlite3.OperationalError) for future in futures)
+
+    # Le writer tourne toujours : l'écriture suivante aboutit
+    assert writer.submit(insert, 'next').result(5)
+    assert labels(writer) == {'blocker', 'next'}
+    assert writer.metrics()['failed_jobs'] == 3
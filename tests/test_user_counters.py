@@ -0,0 +1,148 @@
+"""
+Dashboard counters: after every kind of write on users (inserts, updates,
+deletes, bulk moderation, import upserts) the trigger-maintained
+user_counters table must give the same figures as COUNT(*) over users.
+"""
+
+import random
+import sqlite3
+
+import pytest
+
+from migrations import run_migrations
+from moderation import apply_bulk_status
+from user_counters import read_dashboard_counters, rebuild_user_counters
+from user_import import NO_PASSWORD_HASH, upsert_users_chunk
+
+USERS_DDL = '''
+    CREATE TABLE users (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        email TEXT UNIQUE NOT NULL,
+        password_hash TEXT NOT NULL,
+        user_type TEXT DEFAULT 'visitor',
+        first_name TEXT,
+        last_name TEXT,
+        company TEXT,
+        phone TEXT,
+        visitor_package TEXT DEFAULT 'Free',
+        partnership_package TEXT,
+        status TEXT DEFAULT 'pending',
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+'''
+
+# Mêmes chiffres que DASHBOARD_COUNTERS_QUERY, calculés en parcourant users
+COUNT_QUERY = '''
+    SELECT
+        COUNT(*) AS total_users,
+        COUNT(CASE WHEN user_type = 'visitor' THEN 1 END) AS visitors,
+        COUNT(CASE WHEN user_type = 'exhibitor' THEN 1 END) AS exhibitors,
+        COUNT(CASE WHEN user_type = 'partner' THEN 1 END) AS partners,
+        COUNT(CASE WHEN status = 'pending' THEN 1 END) AS pending,
+        COUNT(CASE WHEN status = 'validated' THEN 1 END) AS validated,
+        COUNT(CASE WHEN status = 'rejected' THEN 1 END) AS rejected,
+        COUNT(wp_user_id) AS wordpress_synced
+    FROM users
+'''
+
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(':memory:')
+    conn.row_factory = sqlite3.Row
+    conn.execute(USERS_DDL)
+    conn.executemany(
+        'INSERT INTO users (email, password_hash, user_type, status) VALUES (?, ?, ?, ?)',
+        [('admin@siportevent.com', 'hash', 'admin', 'validated'), ('old@example.com', 'hash', 'visitor', 'pending')]
+    )
+    # La migration crée les triggers et initialise les compteurs depuis les lignes existantes
+    run_migrations(conn)
+    yield conn
+    conn.close()
+
+
+def assert_counters_match(conn):
+    expected = dict(conn.execute(COUNT_QUERY).fetchone())
+    assert read_dashboard_counters(conn) == expected
+    return expected
+
+
+def import_row(email, **fields):
+    """One validated row as user_import._flush passes it to upsert_users_chunk"""
+    row = {field: fields.get(field) for field in ('first_name', 'last_name', 'company', 'phone',
+                                                  'visitor_package', 'partnership_package', 'status')}
+    row.update(email=email, password_hash=fields.get('password_hash', NO_PASSWORD_HASH),
+               explicit_user_type=fields.get('user_type'), user_type=fields.get('user_type') or 'visitor',
+               default_status='pending')
+    return row
+
+
+def test_counters_seeded_from_existing_users(conn):
+    assert assert_counters_match(conn)['total_users'] == 2
+
+
+def test_inserts_updates_and_deletes(conn):
+    rng = random.Random(4)
+    conn.executemany(
+        'INSERT INTO users (email, password_hash, user_type, status) VALUES (?, ?, ?, ?)',
+        ((f'user{i}@example.com', 'hash', rng.choice(['visitor', 'exhibitor', 'partner']),
+          rng.choice(['pending', 'validated', 'rejected'])) for i in range(300))
+    )
+    # Valeurs par défaut et NULL explicites
+    conn.execute("INSERT INTO users (email, password_hash) VALUES ('defaults@example.com', 'hash')")
+    conn.execute("INSERT INTO users (email, password_hash, user_type, status) VALUES ('null@example.com', 'hash', NULL, NULL)")
+    assert_counters_match(conn)
+
+    conn.execute("UPDATE users SET status = 'validated' WHERE id % 3 = 0")
+    conn.execute("UPDATE users SET user_type = 'partner', status = 'rejected' WHERE id % 5 = 0")
+    conn.execute("UPDATE users SET wp_user_id = id WHERE id % 7 = 0")
+    conn.execute("UPDATE users SET wp_user_id = id + 1 WHERE id % 14 = 0")
+    conn.execute("UPDATE users SET wp_user_id = NULL WHERE id % 21 = 0")
+    # Écriture sans changement de catégorie : les triggers ne doivent rien compter
+    conn.execute("UPDATE users SET status = status, company = 'ACME'")
+    conn.execute("UPDATE users SET user_type = 'exhibitor' WHERE email = 'null@example.com'")
+    assert_counters_match(conn)
+
+    conn.execute('DELETE FROM users WHERE id % 4 = 0')
+    conn.execute("DELETE FROM users WHERE email = 'defaults@example.com'")
+    assert_counters_match(conn)
+
+
+def test_bulk_moderation(conn):
+    conn.executemany('INSERT INTO users (email, password_hash) VALUES (?, ?)',
+                     ((f'user{i}@example.com', 'hash') for i in range(100)))
+    ids = [row[0] for row in conn.execute('SELECT id FROM users ORDER BY id LIMIT 40')]
+    apply_bulk_status(conn, 'validated', user_ids=ids + ids[:10] + [999999])
+    assert_counters_match(conn)
+
+    apply_bulk_status(conn, 'rejected', filters={'status': 'pending', 'user_type': 'visitor'})
+    counts = assert_counters_match(conn)
+    assert counts['pending'] == 0
+
+
+def test_import_upserts(conn):
+    rows = [import_row(f'user{i}@example.com', user_type='exhibitor' if i % 2 else None) for i in range(50)]
+    result = upsert_users_chunk(conn, rows)
+    assert result['created'] == 50
+    assert_counters_match(conn)
+
+    # Mise à jour de type / statut, création, et ligne visant le compte admin
+    rows = [import_row(f'user{i}@example.com', user_type='partner', status='validated') for i in range(0, 50, 5)]
+    rows += [import_row('new@example.com', status='rejected'),
+             import_row('admin@siportevent.com', user_type='visitor', status='pending')]
+    result = upsert_users_chunk(conn, rows)
+    assert (result['created'], result['updated'], result['protected']) == (1, 10, ['admin@siportevent.com'])
+    counts = assert_counters_match(conn)
+    assert counts['partners'] == 10
+    assert conn.execute("SELECT user_type FROM users WHERE email = 'admin@siportevent.com'").fetchone()[0] == 'admin'
+
+
+def test_rebuild_repairs_drifted_counters(conn):
+    conn.executemany('INSERT INTO users (email, password_hash, status) VALUES (?, ?, ?)',
+                     ((f'user{i}@example.com', 'hash', 'validated') for i in range(20)))
+    conn.execute('UPDATE user_counters SET count = count + 100')
+    conn.execute("DELETE FROM user_counters WHERE status = 'pending'")
+    assert read_dashboard_counters(conn) != dict(conn.execute(COUNT_QUERY).fetchone())
+
+    assert rebuild_user_counters(conn) == 22
+    assert_counters_match(conn)
@@ -0,0 +1,76 @@
+"""
+User export: CSV cells that a spreadsheet would run as formulas are
+neutralized; NDJSON keeps the raw values; a client leaving mid-export
+gives the pooled connection back at once.
+"""
+
+import asyncio
+import csv
+import io
+import json
+import sqlite3
+
+from user_export import export_chunks
+
+ROW = {'id': 7, 'email': 'a@example.com', 'first_name': '=HYPERLINK("http://x","y")', 'last_name': '@SUM(A1)',
+       'company': '-2+3', 'phone': '+33 6 12 34 56 78', 'user_type': '\tvisitor', 'visitor_package': '\rFree',
+       'partnership_package': None, 'status': 'a=b', 'created_at': ''}
+COLUMNS = list(ROW)
+
+
+async def _batches():
+    yield [ROW]
+
+
+def export(fmt):
+    async def collect():
+        return b''.join([chunk async for chunk in export_chunks(_batches(), fmt, COLUMNS)])
+    return asyncio.run(collect()).decode('utf-8-sig')
+
+
+def test_csv_formula_cells_are_prefixed():
+    header, row = list(csv.reader(io.StringIO(export('csv'))))
+    assert header == COLUMNS
+    assert dict(zip(header, row)) == {
+        'id': '7', 'email': 'a@example.com', 'first_name': '\'=HYPERLINK("http://x","y")', 'last_name': "'@SUM(A1)",
+        'company': "'-2+3", 'phone': "'+33 6 12 34 56 78", 'user_type': "'\tvisitor", 'visitor_package': "'\rFree",
+        'partnership_package': '', 'status': 'a=b', 'created_at': ''
+    }
+
+
+def test_ndjson_values_are_untouched():
+    assert json.loads(export('ndjson')) == ROW
+
+
+def test_abandoned_export_releases_its_connection(tmp_path):
+    from db_pool import SQLitePool
+    from migrations import run_migrations
+    from repositories import SQLiteUserRepository
+    from tests.test_user_counters import USERS_DDL
+
+    path = str(tmp_path / 'export.db')
+    conn = sqlite3.connect(path)
+    conn.execute(USERS_DDL)
+    conn.executemany("INSERT INTO users (email, password_hash, user_type) VALUES (?, 'hash', 'visitor')",
+                     [(f'user{i}@example.com',) for i in range(50)])
+    conn.commit()
+    run_migrations(conn)
+    conn.close()
+    pool = SQLitePool(path)
+
+    async def scenario():
+        batches = SQLiteUserRepository(pool).iterate(['id', 'email'], {}, batch_size=10)
+        chunks = export_chunks(batches, 'csv', ['id', 'email'])
+        await chunks.__anext__()
+        await chunks.__anext__()
+        busy = pool.metrics()
+        # Client parti : pas d'attente du ramasse-miettes pour rendre la connexion
+        await chunks.aclose()
+        return busy, pool.metrics()
+
+    try:
+        busy, after = asyncio.run(scenario())
+    finally:
+        pool.close()
+    assert busy['connections_open'] - busy['connections_idle'] == 1
+    assert after['connections_open'] == after['connections_idle']